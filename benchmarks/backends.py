@@ -0,0 +1,112 @@
+"""
+Сравнение драйверов MongoDB: motor и нативного асинхронного клиента PyMongo.
+
+Замеряются запись с соседями (`get_window` на одну запись), `create_one` и `get_bulk`, каждая
+запускается последовательно и пачками одновременных запросов. Для замеров создаётся
+отдельная база, которая удаляется после прогона.
+
+Запуск из корня репозитория (нужен запущенный MongoDB, параметры берутся из DB_*):
+python benchmarks/backends.py
+"""
+
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+os.environ.setdefault('DB_USER', 'benchmark')
+os.environ.setdefault('DB_PASSWORD', 'benchmark')
+os.environ.setdefault('TG_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('TG_BOT_USERNAME', 'benchmark')
+os.environ.setdefault('TG_ADMIN_IDS', '[]')
+
+import settings  # noqa: E402
+from database.client import MongoClient  # noqa: E402
+from database.models import AnimalRecordCreate, AnimalType, Sex  # noqa: E402
+from database.repositories import AnimalRecordRepository  # noqa: E402
+
+DB_NAME = 'dog_stats_benchmark'
+RECORDS = 2_000
+ROUNDS = 200
+CONCURRENCY = 50
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+
+
+def make_record(i: int) -> AnimalRecordCreate:
+    return AnimalRecordCreate(
+        animal_type=AnimalType.DOG,
+        sex=Sex.FEMALE,
+        breed='Дворняга',
+        color='Рыжий',
+        catch_date=NOW,
+        catch_place='55.7558, 37.6173',
+        created_by=i % 10 + 1,
+    )
+
+
+async def measure(operation: Callable[[], Awaitable], concurrency: int) -> float:
+    """Среднее время одной операции в миллисекундах."""
+    timings = []
+
+    for _ in range(ROUNDS // concurrency or 1):
+        start = time.perf_counter()
+        await asyncio.gather(*(operation() for _ in range(concurrency)))
+        timings.append((time.perf_counter() - start) / concurrency)
+
+    return statistics.mean(timings) * 1e3
+
+
+async def run(driver: str) -> dict[str, float]:
+    client = MongoClient(settings.db.db_dsn, DB_NAME, driver=driver, **settings.db.client_options)
+    await client.warm_up()
+    await client.client.drop_database(DB_NAME)
+
+    animals = AnimalRecordRepository(client.db)
+    await animals.add_indexes()
+    await animals.create_bulk([make_record(i) for i in range(RECORDS)])
+    target = await animals.get_one({})
+
+    async def get_3_animals():
+        # Запись и ключи её соседей, как в карточке с кнопками переключения
+        window = await animals.get_window({}, 'created_at', str(target.id), size=1, keys_only=True)
+        window.around(str(target.id))
+
+    async def create_one():
+        await animals.create_one(make_record(0))
+
+    async def get_bulk():
+        async for _ in animals.get_bulk({"created_by": 1}):
+            pass
+
+    results = {}
+    for name, operation in (
+        ('get_3_animals', get_3_animals),
+        ('create_one', create_one),
+        ('get_bulk', get_bulk),
+    ):
+        results[name] = await measure(operation, 1)
+        results[f'{name} x{CONCURRENCY}'] = await measure(operation, CONCURRENCY)
+
+    await client.client.drop_database(DB_NAME)
+    return results
+
+
+async def main() -> None:
+    motor = await run('motor')
+    pymongo = await run('pymongo')
+
+    print(f"{'Операция':<24}{'motor, мс':>12}{'pymongo, мс':>14}{'ускорение':>12}")
+    for name in motor:
+        print(
+            f"{name:<24}{motor[name]:>12.3f}{pymongo[name]:>14.3f}"
+            f"{motor[name] / pymongo[name]:>11.2f}x"
+        )
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
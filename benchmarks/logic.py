@@ -0,0 +1,104 @@
+"""
+Пропускная способность логики бота без базы данных.
+
+Логика из `bot.logic` работает поверх драйвера `memory`, поэтому замеряется только
+стоимость самого кода: репозиториев, моделей и кэшей. Каждая операция запускается
+пачками одновременных вызовов, как при наплыве обновлений от Telegram.
+
+Запуск из корня репозитория:
+python benchmarks/logic.py
+"""
+
+import asyncio
+import datetime
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+os.environ['DB_DRIVER'] = 'memory'
+os.environ.setdefault('TG_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('TG_BOT_USERNAME', 'benchmark')
+os.environ.setdefault('TG_ADMIN_IDS', '[]')
+
+from loguru import logger  # noqa: E402
+
+from bot import logic  # noqa: E402
+from database import client  # noqa: E402
+from database.models import AnimalRecordCreate, AnimalType, Sex, UserCreate, UserRole  # noqa: E402
+from database.repositories import Repositories  # noqa: E402
+
+USERS = 100
+RECORDS = 2_000
+CALLS = 1_000
+CONCURRENCY = 100
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+
+
+def make_record(i: int) -> AnimalRecordCreate:
+    return AnimalRecordCreate(
+        animal_type=AnimalType.DOG,
+        sex=Sex.FEMALE,
+        breed='Дворняга',
+        color='Рыжий',
+        catch_date=NOW,
+        catch_place='55.7558, 37.6173',
+        created_by=i % USERS + 1,
+    )
+
+
+async def measure(operation: Callable[[int], Awaitable]) -> float:
+    """Количество вызовов операции в секунду."""
+    start = time.perf_counter()
+
+    for offset in range(0, CALLS, CONCURRENCY):
+        await asyncio.gather(*(operation(offset + i) for i in range(CONCURRENCY)))
+
+    return CALLS / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    logger.remove()
+
+    repos = Repositories.from_db(client.db)
+    await logic.init_indexes(repos)
+    await repos.users.create_bulk(
+        [
+            UserCreate(tg_id=i + 1, name=f'Работник {i + 1}', role=UserRole.CATCHER)
+            for i in range(USERS)
+        ]
+    )
+    await repos.animals.create_bulk([make_record(i) for i in range(RECORDS)])
+    ids = [str(record.id) async for record in repos.animals.get_bulk({})]
+
+    async def get_user(i: int):
+        await logic.get_user(repos, i % USERS + 1)
+
+    def position(i: int) -> int:
+        # Каждый пользователь листает ленту подряд, начиная со своего места
+        return (i % USERS * (RECORDS // USERS) + i // USERS) % RECORDS
+
+    async def browse(i: int):
+        await logic.get_animal_display(repos, ids[position(i)], None, i % USERS + 1)
+
+    async def browse_cold(i: int):
+        logic.animal_windows.clear()
+        await logic.get_animal_display(repos, ids[position(i)], None, i % USERS + 1)
+
+    async def add_animal_record(i: int):
+        await logic.add_animal_record(repos, make_record(i))
+
+    print(f"{'Операция':<32}{'вызовов/с':>12}")
+    for name, operation in (
+        ('get_user', get_user),
+        ('get_animal_display', browse),
+        ('get_animal_display, без кэша', browse_cold),
+        ('add_animal_record', add_animal_record),
+    ):
+        print(f"{name:<32}{await measure(operation):>12.0f}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
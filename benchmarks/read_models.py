@@ -0,0 +1,87 @@
+"""
+Сравнение стоимости чтения документа с валидацией и без неё.
+
+Сравниваются `model_validate`, `model_construct` и `MongoBase.from_document`,
+которым пользуется BaseRepository при доверенном чтении.
+
+Запуск из корня репозитория:
+python benchmarks/read_models.py
+"""
+
+import datetime
+import os
+import sys
+import timeit
+from pathlib import Path
+
+from bson import ObjectId
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
+os.environ.setdefault('DB_USER', 'benchmark')
+os.environ.setdefault('DB_PASSWORD', 'benchmark')
+os.environ.setdefault('TG_BOT_TOKEN', 'benchmark')
+os.environ.setdefault('TG_BOT_USERNAME', 'benchmark')
+os.environ.setdefault('TG_ADMIN_IDS', '[]')
+
+from database.models import AnimalRecordRead, UserRead  # noqa: E402
+
+NUMBER = 20_000
+
+# Документы в том виде, в котором их возвращает драйвер
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+DOCUMENTS = {
+    UserRead: {
+        '_id': ObjectId(),
+        'tg_id': 123456789,
+        'name': 'Работник отлова',
+        'role': 'catcher',
+        'created_at': NOW,
+        'updated_at': NOW,
+    },
+    AnimalRecordRead: {
+        '_id': ObjectId(),
+        'animal_type': 'Собака',
+        'sex': 'Самка',
+        'breed': 'Дворняга',
+        'color': 'Рыжий с белыми пятнами',
+        'features': 'Хромает на заднюю левую лапу',
+        'chip_id': '643094100123456',
+        'catch_photo': 'AgACAgIAAxkBAAIBZ2YAAbcdEfGhIjKlMnOpQrStUvWxYz',
+        'transfer_photo': 'AgACAgIAAxkBAAIBaGYAAbcdEfGhIjKlMnOpQrStUvWxYz',
+        'is_sterilized': True,
+        'is_vaccinated': False,
+        'catch_date': NOW,
+        'catch_place': '55.7558, 37.6173',
+        'transfer_date': NOW,
+        'comment': 'Передана в приют на передержку',
+        'created_by': 123456789,
+        'created_at': NOW,
+        'updated_at': NOW,
+    },
+}
+
+
+def main() -> None:
+    print(
+        f"{'Модель':<20}{'validate, мкс':>16}{'construct, мкс':>16}"
+        f"{'from_document, мкс':>20}{'ускорение':>12}"
+    )
+
+    for model, document in DOCUMENTS.items():
+        assert model.from_document(document) == model.model_validate(document)
+
+        validate = timeit.timeit(lambda: model.model_validate(document), number=NUMBER)
+        construct = timeit.timeit(lambda: model.model_construct(**document), number=NUMBER)
+        trusted = timeit.timeit(lambda: model.from_document(document), number=NUMBER)
+
+        print(
+            f"{model.__name__:<20}"
+            f"{validate / NUMBER * 1e6:>16.2f}"
+            f"{construct / NUMBER * 1e6:>16.2f}"
+            f"{trusted / NUMBER * 1e6:>20.2f}"
+            f"{validate / trusted:>11.1f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
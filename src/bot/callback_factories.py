@@ -25,7 +25,28 @@ class ItemPaginatorCallbackFactory(CallbackData, prefix='item'):
     item_id: str
 
 
+class AnimalPageCallbackFactory(CallbackData, prefix='apage'):
+    """
+    Фабрика коллбеков для страниц списка животных.
+
+    Страница задаётся ключом записи с её края: `created_at` в миллисекундах и `_id`,
+    поэтому коллбек укладывается в 64 байта, которые разрешает Telegram.
+    В личном списке `created_by` это tg_id автора записей.
+    """
+
+    created_at: int
+    item_id: str
+    backward: bool = False
+    inclusive: bool = False
+    created_by: int | None = None
+
+
 class AnimalRecordCallbackFactory(ItemPaginatorCallbackFactory, prefix='animal'):
-    """Фабрика коллбеков для управления записями о животных."""
+    """
+    Фабрика коллбеков для управления записями о животных.
+
+    `created_by` оставляет карточки в пределах личного списка автора.
+    """
 
     action: str = 'display'
+    created_by: int | None = None
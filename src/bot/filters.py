@@ -3,13 +3,14 @@ from aiogram.types import CallbackQuery, Message
 from loguru import logger
 
 from bot.logic import is_admin
+from database.repositories import Repositories
 
 
 class AdminFilter(BaseFilter):
     """Фильтр для проверки наличия прав администратора у пользователя."""
 
-    async def __call__(self, event: Message | CallbackQuery) -> bool:
-        check = await is_admin(event.from_user.id)
+    async def __call__(self, event: Message | CallbackQuery, repos: Repositories) -> bool:
+        check = await is_admin(repos, event.from_user.id)
 
         logger.debug(f"Проверка прав администратора для {event.from_user.id}: {check}")
         return check
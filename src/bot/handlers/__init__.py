@@ -2,8 +2,12 @@ __all__ = (
     "start_router",
     "roles_router",
     "animals_router",
+    "stats_router",
+    "export_router",
 )
 
 from .animals import router as animals_router
 from .basic import router as start_router
+from .export import router as export_router
 from .roles import router as roles_router
+from .stats import router as stats_router
@@ -4,7 +4,9 @@ from aiogram import Router
 
 from .add_animal import router as add_router
 from .display_animal import router as display_router
+from .list_animals import router as list_router
 
 router = Router(name=__name__)
 router.include_router(add_router)
 router.include_router(display_router)
+router.include_router(list_router)
@@ -13,14 +13,15 @@ from bot.keyboards.animals import (
     geo_button,
 )
 from bot.keyboards.basic import (
+    build_cancel,
     build_confirm_cancel,
     build_main_keyboard,
     build_skip_cancel,
-    cancel_builder,
 )
 from bot.logic import add_animal_record
 from bot.states import AnimalAddState
 from database.models import AnimalRecordCreate, AnimalType, Sex, UserRole
+from database.repositories import Repositories
 from settings import TZINFO
 
 router = Router(name=__name__)
@@ -88,7 +89,7 @@ async def ask_for_input_catch_place(
 
     await message.answer(
         text="🗺️ Введите место отлова животного.",
-        reply_markup=cancel_builder().as_markup(),
+        reply_markup=build_cancel(),
     )
     await message.answer(
         text="📍 Или отправьте геолокацию.",
@@ -260,7 +261,7 @@ async def ask_for_input_breed(
 
     await message.answer(
         text="🐩 Введите предполагаемую породу животного.",
-        reply_markup=cancel_builder().as_markup(),
+        reply_markup=build_cancel(),
     )
 
 
@@ -295,7 +296,7 @@ async def ask_for_input_color(
 
     await message.answer(
         text="🎨 Введите цвет животного, окрас его шерсти.",
-        reply_markup=cancel_builder().as_markup(),
+        reply_markup=build_cancel(),
     )
 
 
@@ -638,6 +639,7 @@ async def handle_cb_confirmation(
 async def handle_cb_confirm(
     callback: CallbackQuery,
     state: FSMContext,
+    repos: Repositories,
 ) -> None:
     """Обработка подтверждения сохранения животного."""
     logger.debug(f"Пользователь {callback.from_user.id} подтвердил сохранение животного.")
@@ -646,7 +648,7 @@ async def handle_cb_confirm(
     data['created_by'] = callback.from_user.id
     animal = AnimalRecordCreate(**data)
 
-    record = await add_animal_record(animal)
+    record = await add_animal_record(repos, animal)
 
     await callback.answer()
     await callback.message.answer(
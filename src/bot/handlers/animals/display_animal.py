@@ -1,182 +1,247 @@
+from contextlib import suppress
+
 from aiogram import F, Router
-from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InputMediaPhoto, Message
 from aiogram.utils.media_group import MediaGroupBuilder
 from loguru import logger
 
 from bot.callback_factories import AnimalRecordCallbackFactory
-from bot.keyboards.animals import display_paginator
-from bot.logic import get_animal_display, get_user
+from bot.keyboards.animals import display_paginator, page_callback
+from bot.logic import AnimalCard, animal_cards, get_animal_display, get_author_name
 from database.models import AnimalRecordRead
+from database.repositories import Repositories
 
 router = Router(name=__name__)
 
 
+# Заголовки полей и порядок фото в карточке не меняются, считаем их один раз
+TITLES = {name: field.title for name, field in AnimalRecordRead.model_fields.items()}
+PHOTO_FIELDS = ("medical_photo", "catch_photo", "transfer_photo")
+
+# Длиннее подпись к фото быть не может, такие карточки отправляются текстом
+CAPTION_LIMIT = 1024
+
+
+def _line(field: str, value: object) -> str:
+    return f"<b>{TITLES[field]}</b>: <code>{value}</code>\n"
+
+
 async def form_animal_record_text(
+    repos: Repositories,
     animal_record: AnimalRecordRead,
 ) -> str:
     """Сформировать текст с информацией о животном."""
-    animal = animal_record.model_dump(exclude_none=True)
-    animal['created_by'] = await get_user(animal['created_by'])
-
-    text = ""
+    author = animal_record.created_by_name or await get_author_name(repos, animal_record.created_by)
 
-    text += f"<b>{AnimalRecordRead.model_fields['created_by'].title}</b>: <code>{animal['created_by'].name}</code>\n"
+    lines = [_line('created_by', author)]
 
     for field in ("animal_type", "breed", "sex", "color"):
-        text += (
-            f"<b>{AnimalRecordRead.model_fields[field].title}</b>: <code>{animal[field]}</code>\n"
-        )
+        lines.append(_line(field, getattr(animal_record, field)))
 
-    if value := animal.get('features'):
-        text += f"<b>{AnimalRecordRead.model_fields['features'].title}</b>: <code>{value}</code>\n"
+    if value := animal_record.features:
+        lines.append(_line('features', value))
 
-    text += "\n"
+    lines.append("\n")
 
-    if value := animal.get('chip_id'):
-        text += f"<b>{AnimalRecordRead.model_fields['chip_id'].title}</b>: <code>{value}</code>\n"
+    if value := animal_record.chip_id:
+        lines.append(_line('chip_id', value))
 
     for field in ("is_sterilized", "is_vaccinated"):
-        text += (
-            f"<b>{AnimalRecordRead.model_fields[field].title}</b>: "
-            f"{'✅' if animal[field] else '❌'}\n"
-        )
+        lines.append(f"<b>{TITLES[field]}</b>: {'✅' if getattr(animal_record, field) else '❌'}\n")
 
-    text += "\n"
+    lines.append("\n")
 
     for field in ("catch_date", "catch_place"):
-        text += (
-            f"<b>{AnimalRecordRead.model_fields[field].title}</b>: <code>{animal[field]}</code>\n"
-        )
+        lines.append(_line(field, getattr(animal_record, field)))
 
-    text += "\n"
+    lines.append("\n")
 
-    if value := animal.get('transfer_date'):
-        text += (
-            f"<b>{AnimalRecordRead.model_fields['transfer_date'].title}</b>: <code>{value}</code>\n"
-        )
+    if value := animal_record.transfer_date:
+        lines.append(_line('transfer_date', value))
 
-    text += "\n"
+    lines.append("\n")
 
     for field in ("return_date", "return_place"):
-        if value := animal.get(field):
-            text += f"<b>{AnimalRecordRead.model_fields[field].title}</b>: <code>{value}</code>\n"
+        if value := getattr(animal_record, field):
+            lines.append(_line(field, value))
 
-    text += "\n"
+    lines.append("\n")
 
-    if value := animal.get('euthanasia_date'):
-        text += f"<b>{AnimalRecordRead.model_fields['euthanasia_date'].title}</b>: <code>{value}</code>\n"
+    for field in ("euthanasia_date", "comment"):
+        if value := getattr(animal_record, field):
+            lines.append(_line(field, value))
 
-    if value := animal.get('comment'):
-        text += f"<b>{AnimalRecordRead.model_fields['comment'].title}</b>: <code>{value}</code>\n"
+    return "".join(lines)
 
-    return text
 
+async def get_animal_card(repos: Repositories, animal_record: AnimalRecordRead) -> AnimalCard:
+    """Получить карточку животного, используя кэш готовых карточек."""
+    key = (animal_record.id, animal_record.updated_at)
+    found, card = animal_cards.get(key)
+    if found:
+        return card
 
-async def send_animal_record(
-    update: CallbackQuery | Message,
-    state: FSMContext,
-    animal_record: AnimalRecordRead,
-    keyboard: InlineKeyboardMarkup | None = None,
-):
-    if isinstance(update, CallbackQuery):
-        update.answer()
-        message = update.message
-    else:
-        message = update
-
-    photos = animal_record.model_dump(
-        include={"catch_photo", "transfer_photo", "medical_photo"},
-        exclude_none=True,
+    card = AnimalCard(
+        text=await form_animal_record_text(repos, animal_record),
+        media=tuple(photo for field in PHOTO_FIELDS if (photo := getattr(animal_record, field))),
     )
-
-    if photos:
-        media = MediaGroupBuilder()
-
-        for field, value in photos.items():
-            if value:
-                media.add_photo(
-                    media=value,
-                )
-
-        media_msgs = await message.answer_media_group(
-            media=media.build(),
-        )
-
-        await state.update_data(media=[msg.message_id for msg in media_msgs])
-
-    await message.answer(
-        text=await form_animal_record_text(animal_record),
-        parse_mode="HTML",
-        reply_markup=keyboard,
+    animal_cards.set(key, card)
+
+    return card
+
+
+def _as_photo(card: AnimalCard) -> bool:
+    """Показывать ли карточку фотографией с подписью, а не текстовым сообщением."""
+    return bool(card.media) and len(card.text) <= CAPTION_LIMIT
+
+
+def card_keyboard(
+    card: AnimalCard,
+    animals: dict[str, AnimalRecordRead | None],
+    created_by: int | None = None,
+) -> InlineKeyboardMarkup:
+    """
+    Клавиатура карточки: переключение записей, альбом, если фото не уместились,
+    и возврат к странице списка, которая начинается с этой записи.
+    С `created_by` всё это в пределах личного списка автора.
+    """
+    shown = 1 if _as_photo(card) else 0
+    return display_paginator(
+        title=str(animals['target'].id),
+        prev_item=str(animals['prev'].id) if animals['prev'] else None,
+        next_item=str(animals['next'].id) if animals['next'] else None,
+        photos=len(card.media) if len(card.media) > shown else 0,
+        back_to_list=page_callback(animals['target'], inclusive=True, created_by=created_by),
+        created_by=created_by,
     )
 
 
-@router.message(F.text == "🐾 Список животных")
-async def handle_msg_animal_list(
+async def send_animal_record(
     message: Message,
-    state: FSMContext,
+    card: AnimalCard,
+    keyboard: InlineKeyboardMarkup | None = None,
 ) -> None:
-    """Обработка кнопки меню Список Животных."""
+    """Отправить карточку новым сообщением."""
+    if _as_photo(card):
+        await message.answer_photo(
+            photo=card.media[0],
+            caption=card.text,
+            parse_mode="HTML",
+            reply_markup=keyboard,
+        )
+    else:
+        await message.answer(
+            text=card.text,
+            parse_mode="HTML",
+            reply_markup=keyboard,
+        )
 
-    logger.debug(f"Пользователь {message.from_user.id} запросил общий список животных.")
-    await state.clear()
 
-    animals = await get_animal_display(animal_id=None, user_filter=None)
+async def edit_animal_record(
+    message: Message,
+    card: AnimalCard,
+    keyboard: InlineKeyboardMarkup | None = None,
+) -> None:
+    """
+    Показать карточку в том же сообщении.
+
+    Текст меняется на текст, а фото на фото одним запросом. Если вид карточки
+    поменялся или сообщение уже нельзя изменить, оно удаляется и карточка
+    отправляется заново.
+    """
+    try:
+        if _as_photo(card) and message.photo:
+            if message.photo[-1].file_id == card.media[0]:
+                await message.edit_caption(
+                    caption=card.text,
+                    parse_mode="HTML",
+                    reply_markup=keyboard,
+                )
+            else:
+                await message.edit_media(
+                    media=InputMediaPhoto(
+                        media=card.media[0],
+                        caption=card.text,
+                        parse_mode="HTML",
+                    ),
+                    reply_markup=keyboard,
+                )
+            return
 
-    if animals['target'] is None:
-        await message.answer("🙀 Список животных пуст.")
-        return
+        if not _as_photo(card) and message.text:
+            await message.edit_text(
+                text=card.text,
+                parse_mode="HTML",
+                reply_markup=keyboard,
+            )
+            return
 
-    keyboard = display_paginator(
-        title=animals['target'].model_dump(include={"id"})["id"],
-        prev_item=None,
-        next_item=animals['next'].model_dump(include={"id"})["id"] if animals['next'] else None,
-    )
+    except TelegramBadRequest as e:
+        if "message is not modified" in e.message:
+            return
+        logger.warning(f"Не удалось изменить карточку в сообщении {message.message_id}: {e}")
 
-    await send_animal_record(
-        message,
-        state,
-        animal_record=animals['target'],
-        keyboard=keyboard,
-    )
+    with suppress(TelegramBadRequest):
+        await message.delete()
+    await send_animal_record(message, card, keyboard)
 
 
 @router.callback_query(AnimalRecordCallbackFactory.filter(F.action == "display"))
 async def handle_cb_animal_display(
     callback: CallbackQuery,
     callback_data: AnimalRecordCallbackFactory,
-    state: FSMContext,
+    repos: Repositories,
 ) -> None:
     """Обработка коллбека на отображение карточки животного."""
     animal_id = callback_data.item_id
     logger.debug(f"Пользователь {callback.from_user.id} запросил животное {animal_id}.")
 
-    animals = await get_animal_display(animal_id=animal_id, user_filter=None)
+    animals = await get_animal_display(
+        repos,
+        animal_id=animal_id,
+        user_filter=callback_data.created_by,
+        viewer_id=callback.from_user.id,
+    )
     logger.debug(animals)
 
     if animals['target'] is None:
         await callback.answer("🙀 Запись не найдена.")
         return
 
-    keyboard = display_paginator(
-        title=animals['target'].model_dump(include={"id"})["id"],
-        prev_item=animals['prev'].model_dump(include={"id"})["id"] if animals['prev'] else None,
-        next_item=animals['next'].model_dump(include={"id"})["id"] if animals['next'] else None,
-    )
+    await callback.answer()
+    card = await get_animal_card(repos, animals['target'])
+    keyboard = card_keyboard(card, animals, callback_data.created_by)
+    await edit_animal_record(callback.message, card, keyboard)
 
-    msgs = [callback.message.message_id]
-    if media := await state.get_value('media'):
-        msgs += media
 
-    await callback.bot.delete_messages(
-        callback.from_user.id,
-        msgs,
+@router.callback_query(AnimalRecordCallbackFactory.filter(F.action == "album"))
+async def handle_cb_animal_album(
+    callback: CallbackQuery,
+    callback_data: AnimalRecordCallbackFactory,
+    repos: Repositories,
+) -> None:
+    """Обработка коллбека на отправку всех фото животного альбомом."""
+    animals = await get_animal_display(
+        repos,
+        animal_id=callback_data.item_id,
+        user_filter=callback_data.created_by,
+        viewer_id=callback.from_user.id,
     )
 
-    await send_animal_record(
-        callback,
-        state,
-        animal_record=animals['target'],
-        keyboard=keyboard,
+    if animals['target'] is None:
+        await callback.answer("🙀 Запись не найдена.")
+        return
+
+    await callback.answer()
+    card = await get_animal_card(repos, animals['target'])
+
+    media = MediaGroupBuilder()
+    for photo in card.media:
+        media.add_photo(
+            media=photo,
+        )
+
+    await callback.message.answer_media_group(
+        media=media.build(),
     )
@@ -0,0 +1,136 @@
+from contextlib import suppress
+from html import escape
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+from bson import ObjectId
+from loguru import logger
+
+from bot.callback_factories import AnimalPageCallbackFactory
+from bot.keyboards.animals import build_animal_page
+from bot.logic import DELETED_USER_NAME, get_animal_page, get_animals_count
+from database.models import AnimalType
+from database.repositories import AnimalPage, Repositories
+from utils import from_milliseconds
+
+router = Router(name=__name__)
+
+TYPE_ICONS = {AnimalType.DOG: "🐕", AnimalType.CAT: "🐈", AnimalType.OTHER: "🦕"}
+
+
+def form_animal_page_text(page: AnimalPage, title: str, with_author: bool = True) -> str:
+    """Сформировать текст страницы списка: по строке на запись."""
+    lines = [f"{title}\n"]
+
+    for number, record in enumerate(page.records, start=1):
+        line = (
+            f"<b>{number}.</b> {TYPE_ICONS.get(record.animal_type, '🐾')} "
+            f"{escape(record.breed)}, {escape(record.color)}, {record.sex}, "
+            f"{record.catch_date:%d.%m.%Y}"
+        )
+        if with_author:
+            line += f" <i>({escape(record.created_by_name or DELETED_USER_NAME)})</i>"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+async def form_page_title(repos: Repositories, created_by: int | None) -> str:
+    """Заголовок общего списка или личного списка автора с числом его записей."""
+    if created_by is None:
+        return "🐾 <b>Список животных</b>"
+
+    return f"🐾 <b>Мои животные</b> ({await get_animals_count(repos, created_by)})"
+
+
+@router.message(F.text == "🐾 Список животных")
+async def handle_msg_animal_list(
+    message: Message,
+    state: FSMContext,
+    repos: Repositories,
+) -> None:
+    """Обработка кнопки меню Список Животных."""
+
+    logger.debug(f"Пользователь {message.from_user.id} запросил общий список животных.")
+    await state.clear()
+
+    page = await get_animal_page(repos, key=None, user_filter=None)
+
+    if not page.records:
+        await message.answer("🙀 Список животных пуст.")
+        return
+
+    await message.answer(
+        text=form_animal_page_text(page, await form_page_title(repos, None)),
+        parse_mode="HTML",
+        reply_markup=build_animal_page(page),
+    )
+
+
+@router.message(F.text == "🐾 Мои животные")
+async def handle_msg_my_animals(
+    message: Message,
+    state: FSMContext,
+    repos: Repositories,
+) -> None:
+    """Обработка кнопки меню Мои Животные: записи, которые внёс пользователь."""
+    tg_id = message.from_user.id
+
+    logger.debug(f"Пользователь {tg_id} запросил свой список животных.")
+    await state.clear()
+
+    page = await get_animal_page(repos, key=None, user_filter=tg_id)
+
+    if not page.records:
+        await message.answer("🙀 Вы ещё не добавили ни одного животного.")
+        return
+
+    await message.answer(
+        text=form_animal_page_text(page, await form_page_title(repos, tg_id), with_author=False),
+        parse_mode="HTML",
+        reply_markup=build_animal_page(page, created_by=tg_id),
+    )
+
+
+@router.callback_query(AnimalPageCallbackFactory.filter())
+async def handle_cb_animal_page(
+    callback: CallbackQuery,
+    callback_data: AnimalPageCallbackFactory,
+    repos: Repositories,
+) -> None:
+    """Обработка коллбека на переключение страницы списка животных."""
+    logger.debug(f"Пользователь {callback.from_user.id} запросил страницу {callback_data}.")
+
+    page = await get_animal_page(
+        repos,
+        key=(from_milliseconds(callback_data.created_at), ObjectId(callback_data.item_id)),
+        user_filter=callback_data.created_by,
+        backward=callback_data.backward,
+        inclusive=callback_data.inclusive,
+    )
+
+    if not page.records:
+        await callback.answer("🙀 Записей больше нет.")
+        return
+
+    await callback.answer()
+    created_by = callback_data.created_by
+    text = form_animal_page_text(
+        page,
+        await form_page_title(repos, created_by),
+        with_author=created_by is None,
+    )
+    keyboard = build_animal_page(page, created_by=created_by)
+
+    # Со страницы списка на страницу переходим правкой, а с карточки с фото
+    # (кнопка «К списку») текст на место фото не поставить
+    if callback.message.text:
+        with suppress(TelegramBadRequest):
+            await callback.message.edit_text(text=text, parse_mode="HTML", reply_markup=keyboard)
+        return
+
+    with suppress(TelegramBadRequest):
+        await callback.message.delete()
+    await callback.message.answer(text=text, parse_mode="HTML", reply_markup=keyboard)
@@ -7,12 +7,18 @@ from loguru import logger
 from bot.keyboards.basic import build_main_keyboard
 from bot.logic import check_invite, create_user
 from database.models import UserCreate, UserRole
+from database.repositories import Repositories
 
 router = Router(name=__name__)
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, user_role: UserRole | None, command: CommandObject):
+async def cmd_start(
+    message: Message,
+    user_role: UserRole | None,
+    command: CommandObject,
+    repos: Repositories,
+):
     """Обработка команды /start."""
     logger.debug(f"Обработка команды /start от юзера {message.from_user.id}")
     if user_role:
@@ -23,14 +29,14 @@ async def cmd_start(message: Message, user_role: UserRole | None, command: Comma
         )
         return
 
-    if command.args and (invite := await check_invite(command.args)):
+    if command.args and (invite := await check_invite(repos, command.args)):
         # Создаем нового пользователя
         model = UserCreate(
             tg_id=message.from_user.id,
             name=invite.username,
             role=invite.role,
         )
-        await create_user(model)
+        await create_user(repos, model)
 
         # Отвечаем пользователю
         await message.answer(
@@ -0,0 +1,112 @@
+import asyncio
+import tempfile
+from html import escape
+from pathlib import Path
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+from loguru import logger
+
+from bot.filters import AdminFilter
+from bot.logic import commit_delta_export, export_animal_delta, export_animal_records
+from database.repositories import Repositories
+from export import ExportQuery
+from utils import get_utc_now
+
+router = Router(name=__name__)
+router.message.filter(AdminFilter())
+
+# Выгрузки идут по одной, чтобы несколько больших отчётов не заняли всю память
+export_lock = asyncio.Lock()
+
+EXPORT_HELP = (
+    "📤 <b>Выгрузка записей о животных</b>\n\n"
+    "<code>/export [csv|xlsx] [ДД.ММ.ГГГГ[-ДД.ММ.ГГГГ]] [вид] [tg_id автора]</code>\n\n"
+    "Аргументы в любом порядке, все необязательны. Период задаётся по дате отлова.\n"
+    "Например: <code>/export xlsx 01.05.2025-31.05.2025 Собака</code>\n\n"
+    "<code>/export delta [csv|xlsx]</code> выгружает только записи, изменённые или "
+    "удалённые после вашей прошлой такой выгрузки. Первая выгрузка содержит всё."
+)
+
+
+async def send_export(
+    message: Message,
+    repos: Repositories,
+    query: ExportQuery,
+    directory: Path,
+) -> None:
+    """Выгрузить записи под условия запроса и отправить файлом."""
+    filename = f"animals_{get_utc_now():%Y-%m-%d_%H-%M}.{query.format}"
+    path = directory / filename
+    count = await export_animal_records(repos, query, path)
+
+    if not count:
+        await message.answer("🙀 Под эти условия не подошло ни одной записи.")
+        return
+
+    await message.answer_document(
+        document=FSInputFile(path, filename=filename),
+        caption=f"📤 Записей: {count}",
+    )
+
+
+async def send_delta_export(
+    message: Message,
+    repos: Repositories,
+    query: ExportQuery,
+    directory: Path,
+) -> None:
+    """
+    Выгрузить изменения после прошлой разностной выгрузки пользователя и отправить файлом.
+
+    Отметка сдвигается только после отправки: если файл не дошёл, следующая выгрузка
+    повторит те же изменения.
+    """
+    consumer = str(message.from_user.id)
+    filename = f"animals_delta_{get_utc_now():%Y-%m-%d_%H-%M}.{query.format}"
+    path = directory / filename
+    delta = await export_animal_delta(repos, consumer, query.format, path)
+
+    if not delta.count:
+        await message.answer("🙀 С прошлой выгрузки записи не менялись.")
+        return
+
+    await message.answer_document(
+        document=FSInputFile(path, filename=filename),
+        caption=f"📤 Изменений: {delta.count}",
+    )
+    await commit_delta_export(repos, consumer, delta)
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject, repos: Repositories) -> None:
+    """Обработка команды /export: выгрузка записей о животных файлом."""
+    try:
+        query = ExportQuery.parse(command.args)
+    except ValueError as e:
+        await message.answer(
+            text=f"🙀 Неверный аргумент: <code>{escape(str(e))}</code>\n\n{EXPORT_HELP}",
+            parse_mode="HTML",
+        )
+        return
+
+    if export_lock.locked():
+        await message.answer("⏳ Уже готовится другая выгрузка, попробуйте чуть позже.")
+        return
+
+    logger.info(f"Пользователь {message.from_user.id} запросил выгрузку {query}.")
+
+    async with export_lock:
+        await message.answer("⏳ Готовлю выгрузку...")
+
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                if query.delta:
+                    await send_delta_export(message, repos, query, Path(directory))
+                else:
+                    await send_export(message, repos, query, Path(directory))
+            except Exception:
+                # Недописанный файл не отправляется, а отметка разностной выгрузки не сдвигается
+                logger.exception(f"Ошибка при выгрузке {query} для {message.from_user.id}.")
+                await message.answer("🙀 Выгрузка не удалась, попробуйте позже.")
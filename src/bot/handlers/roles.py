@@ -6,16 +6,17 @@ from loguru import logger
 
 from bot.callback_factories import UserListAction, UserListCallbackFactory
 from bot.filters import AdminFilter
-from bot.keyboards.basic import build_confirm_cancel, cancel_builder
+from bot.keyboards.basic import build_cancel, build_confirm_cancel
 from bot.keyboards.roles import (
     build_choose_role,
     build_role_control,
     build_user_list_delete,
     build_user_list_menu,
 )
-from bot.logic import create_invite, get_users_by_role, user_delete
+from bot.logic import create_invite, get_users_by_role, users_delete
 from bot.states import InviteUserState, UserDeleteState
 from database.models import UserFlag, UserRole
+from database.repositories import Repositories
 from utils import generate_invite_link
 
 router = Router(name=__name__)
@@ -46,6 +47,7 @@ async def handle_cb_msg_role_control(update: CallbackQuery | Message, state: FSM
 async def handle_cb_user_list_display(
     callback: CallbackQuery,
     callback_data: UserListCallbackFactory,
+    repos: Repositories,
 ):
     """Обработка открытия списка пользователей."""
     logger.debug(f"Пользователь {callback.from_user.id} запросил список {callback_data.role}.")
@@ -56,7 +58,7 @@ async def handle_cb_user_list_display(
     }
 
     role = UserRole(callback_data.role)
-    user_list = await get_users_by_role(role)
+    user_list = await get_users_by_role(repos, role)
     if not user_list:
         await callback.answer(f"🤷‍♂️ Список {translated[role.name]} пуст.")
         return
@@ -100,7 +102,7 @@ async def handle_st_input_role(callback: CallbackQuery, state: FSMContext):
     await callback.message.delete()
     await callback.message.answer(
         text="Введите имя для нового пользователя. Это имя будет использоваться во всём сервисе.",
-        reply_markup=cancel_builder().as_markup(),
+        reply_markup=build_cancel(),
     )
 
 
@@ -123,10 +125,14 @@ async def handle_st_invite_user_input_name(message: Message, state: FSMContext):
 
 
 @router.callback_query(InviteUserState.confirm, F.data == "confirm")
-async def handle_st_invite_user_confirm(callback: CallbackQuery, state: FSMContext):
+async def handle_st_invite_user_confirm(
+    callback: CallbackQuery,
+    state: FSMContext,
+    repos: Repositories,
+):
     """Команда для подтверждения приглашения нового пользователя."""
     data = await state.get_data()
-    invite = await create_invite(**data)
+    invite = await create_invite(repos, **data)
     link = generate_invite_link(invite.password)
 
     await state.clear()
@@ -151,10 +157,11 @@ async def handle_cb_user_list_delete(
     callback: CallbackQuery,
     callback_data: UserListCallbackFactory,
     state: FSMContext,
+    repos: Repositories,
 ):
     """Обработка коллбэк фабрики user_list::delete."""
     role = UserRole(callback_data.role)
-    user_list = await get_users_by_role(role)
+    user_list = await get_users_by_role(repos, role)
     user_list = [UserFlag(**user.model_dump()) for user in user_list]
 
     await state.set_state(UserDeleteState.select)
@@ -199,19 +206,17 @@ async def handle_cb_user_list_delete_selected(
     callback: CallbackQuery,
     callback_data: UserListCallbackFactory,
     state: FSMContext,
+    repos: Repositories,
 ):
     """Обработка состояния выбора пользователей на удаление."""
     data = await state.get_data()
     user_list = data['user_list']
     user_list = [UserFlag(**user) for user in data['user_list']]
 
-    deleted = False
-    for user in user_list:
-        if user.is_selected:
-            deleted = True
-            await user_delete(user.tg_id)
+    selected = [user.tg_id for user in user_list if user.is_selected]
 
-    if deleted:
+    if selected:
+        await users_delete(repos, selected)
         await callback.answer()
         await callback.message.delete()
         await callback.message.answer("✅ Пользователи успешно удалены.")
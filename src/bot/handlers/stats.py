@@ -0,0 +1,112 @@
+from contextlib import suppress
+from html import escape
+
+from aiogram import F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+from loguru import logger
+
+from bot.filters import AdminFilter
+from bot.keyboards.stats import build_stats_keyboard
+from bot.logic import DELETED_USER_NAME, get_stats, get_user_names, rebuild_stats
+from database.models import AnimalOutcome, AnimalType, Sex, StatDimension
+from database.repositories import Repositories
+
+router = Router(name=__name__)
+router.message.filter(AdminFilter())
+router.callback_query.filter(AdminFilter())
+
+# Сколько последних месяцев и лучших работников отлова показывать
+MONTHS_SHOWN = 12
+CATCHERS_SHOWN = 10
+
+
+def _section(title: str, rows: list[tuple[str, int]]) -> str:
+    lines = [f"\n<b>{title}</b>"]
+    lines.extend(f"{name}: <code>{count}</code>" for name, count in rows)
+    return "\n".join(lines)
+
+
+def _flag_section(title: str, counts: dict[str, int]) -> str:
+    yes, no = counts.get("true", 0), counts.get("false", 0)
+    return f"\n<b>{title}</b>: ✅ <code>{yes}</code> ❌ <code>{no}</code>"
+
+
+async def form_stats_text(repos: Repositories) -> str:
+    """Сформировать текст статистики из готовых счётчиков."""
+    stats = await get_stats(repos)
+
+    total = stats[StatDimension.TOTAL].get("", 0)
+    if not total:
+        return "📊 <b>Статистика</b>\n\n🙀 Записей о животных пока нет."
+
+    months = sorted(stats[StatDimension.MONTH].items(), reverse=True)[:MONTHS_SHOWN]
+    catchers = sorted(
+        stats[StatDimension.CATCHER].items(),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:CATCHERS_SHOWN]
+    names = await get_user_names(repos, [int(tg_id) for tg_id, _ in catchers])
+
+    parts = [
+        "📊 <b>Статистика</b>\n",
+        f"Всего записей: <code>{total}</code>",
+        _section(
+            "Вид животного",
+            [(kind, stats[StatDimension.ANIMAL_TYPE].get(kind, 0)) for kind in AnimalType],
+        ),
+        _section("Пол", [(sex, stats[StatDimension.SEX].get(sex, 0)) for sex in Sex]),
+        _section(
+            "Исход",
+            [(outcome, stats[StatDimension.OUTCOME].get(outcome, 0)) for outcome in AnimalOutcome],
+        ),
+        _flag_section("Стерилизовано", stats[StatDimension.STERILIZED]),
+        _flag_section("Вакцинировано", stats[StatDimension.VACCINATED]),
+        _section("Отловы по месяцам", months),
+        _section(
+            "Работники отлова",
+            [
+                (escape(names.get(int(tg_id), DELETED_USER_NAME)), count)
+                for tg_id, count in catchers
+            ],
+        ),
+    ]
+
+    return "\n".join(parts)
+
+
+@router.message(F.text == "📊 Статистика")
+async def handle_msg_stats(message: Message, state: FSMContext, repos: Repositories) -> None:
+    """Обработка кнопки меню Статистика."""
+    logger.debug(f"Пользователь {message.from_user.id} запросил статистику.")
+    await state.clear()
+
+    await message.answer(
+        text=await form_stats_text(repos),
+        parse_mode="HTML",
+        reply_markup=build_stats_keyboard(),
+    )
+
+
+@router.callback_query(F.data == "stats_rebuild")
+async def handle_cb_stats_rebuild(callback: CallbackQuery, repos: Repositories) -> None:
+    """Обработка коллбека на пересчёт статистики по всем записям."""
+    logger.info(f"Пользователь {callback.from_user.id} запустил пересчёт статистики.")
+    await callback.answer("⏳ Статистика пересчитывается...")
+
+    try:
+        await rebuild_stats(repos)
+    except Exception:
+        logger.exception("Ошибка при пересчёте статистики.")
+        await callback.message.answer(
+            "🙀 Пересчитать статистику не удалось, прежние счётчики сохранены."
+        )
+        return
+
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(
+            text=await form_stats_text(repos),
+            parse_mode="HTML",
+            reply_markup=build_stats_keyboard(),
+        )
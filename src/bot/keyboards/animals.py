@@ -1,11 +1,20 @@
-from aiogram.types import InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+)
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
-from bot.callback_factories import AnimalRecordCallbackFactory
+from bot.callback_factories import AnimalPageCallbackFactory, AnimalRecordCallbackFactory
 from bot.keyboards.basic import build_skip_cancel, cancel_builder
-from database.models import AnimalType, Sex
+from bot.keyboards.registry import precomputed
+from database.models import AnimalRecordRead, AnimalRecordSummary, AnimalType, Sex
+from database.repositories import AnimalPage
+from utils import to_milliseconds
 
 
+@precomputed()
 def geo_button() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
 
@@ -39,6 +48,7 @@ def build_input_date(current_dt: str, skip_callback: str | None = None) -> Inlin
     return builder.as_markup()
 
 
+@precomputed(variants=[(None,), *((animal_type,) for animal_type in AnimalType)])
 def build_choose_animal_type(selected: AnimalType | None = None) -> InlineKeyboardMarkup:
     """Формирует клавиатуру выбора типа животного."""
     builder = InlineKeyboardBuilder()
@@ -63,6 +73,7 @@ def build_choose_animal_type(selected: AnimalType | None = None) -> InlineKeyboa
     return builder.as_markup()
 
 
+@precomputed(variants=[(None,), *((sex,) for sex in Sex)])
 def build_choose_sex(selected: Sex | None = None) -> InlineKeyboardMarkup:
     """Формирует клавиатуру выбора пола животного."""
     builder = InlineKeyboardBuilder()
@@ -87,18 +98,87 @@ def build_choose_sex(selected: Sex | None = None) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def page_callback(
+    record: AnimalRecordSummary | AnimalRecordRead,
+    backward: bool = False,
+    inclusive: bool = False,
+    created_by: int | None = None,
+) -> AnimalPageCallbackFactory:
+    """Коллбек страницы списка, которая начинается (или заканчивается) у записи."""
+    return AnimalPageCallbackFactory(
+        created_at=to_milliseconds(record.created_at),
+        item_id=str(record.id),
+        backward=backward,
+        inclusive=inclusive,
+        created_by=created_by,
+    )
+
+
+def build_animal_page(page: AnimalPage, created_by: int | None = None) -> InlineKeyboardMarkup:
+    """
+    Формирует клавиатуру страницы списка: номера записей и переключение страниц.
+
+    С `created_by` кнопки остаются в личном списке автора.
+    """
+    builder = InlineKeyboardBuilder()
+
+    for number, record in enumerate(page.records, start=1):
+        builder.button(
+            text=str(number),
+            callback_data=AnimalRecordCallbackFactory(
+                item_id=str(record.id),
+                created_by=created_by,
+            ),
+        )
+
+    builder.adjust(5)
+
+    navigation = []
+    if page.has_before:
+        navigation.append(
+            InlineKeyboardButton(
+                text="⬅️",
+                callback_data=page_callback(
+                    page.records[0],
+                    backward=True,
+                    created_by=created_by,
+                ).pack(),
+            )
+        )
+    if page.has_after:
+        navigation.append(
+            InlineKeyboardButton(
+                text="➡️",
+                callback_data=page_callback(page.records[-1], created_by=created_by).pack(),
+            )
+        )
+    if navigation:
+        builder.row(*navigation)
+
+    return builder.as_markup()
+
+
 def display_paginator(
     title: str,
     prev_item: str | None,
     next_item: str | None,
+    photos: int = 0,
+    back_to_list: AnimalPageCallbackFactory | None = None,
+    created_by: int | None = None,
 ) -> InlineKeyboardMarkup:
-    """Формирует клавиатуру для переключения карточек."""
+    """
+    Формирует клавиатуру для переключения карточек.
+
+    Если передано число фото, добавляет кнопку, которая присылает их все альбомом,
+    а с `back_to_list` кнопку возврата к списку. С `created_by` карточки
+    переключаются только среди записей этого автора.
+    """
     builder = InlineKeyboardBuilder()
 
     if prev_item:
         builder.button(
             text="⬅️",
-            callback_data=AnimalRecordCallbackFactory(item_id=prev_item),
+            callback_data=AnimalRecordCallbackFactory(item_id=prev_item, created_by=created_by),
         )
 
     builder.button(
@@ -109,8 +189,24 @@ def display_paginator(
     if next_item:
         builder.button(
             text="➡️",
-            callback_data=AnimalRecordCallbackFactory(item_id=next_item),
+            callback_data=AnimalRecordCallbackFactory(item_id=next_item, created_by=created_by),
         )
 
     builder.adjust(3)
+
+    if photos:
+        builder.row(
+            InlineKeyboardButton(
+                text=f"🖼 Все фото ({photos})",
+                callback_data=AnimalRecordCallbackFactory(
+                    item_id=title,
+                    action='album',
+                    created_by=created_by,
+                ).pack(),
+            )
+        )
+
+    if back_to_list:
+        builder.row(InlineKeyboardButton(text="📋 К списку", callback_data=back_to_list.pack()))
+
     return builder.as_markup()
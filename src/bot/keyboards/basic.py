@@ -2,6 +2,7 @@ from aiogram.filters.callback_data import CallbackData
 from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
+from bot.keyboards.registry import precomputed
 from database.models import UserRole
 
 
@@ -27,6 +28,13 @@ def cancel_builder(callback: str | CallbackData = 'cancel') -> InlineKeyboardBui
     return builder
 
 
+@precomputed()
+def build_cancel(callback: str | CallbackData = 'cancel') -> InlineKeyboardMarkup:
+    """Формирует клавиатуру с кнопкой отмены."""
+    return cancel_builder(callback).as_markup()
+
+
+@precomputed()
 def build_confirm_cancel(
     confirm_callback: str | CallbackData = 'confirm',
     cancel_callback: str | CallbackData = 'cancel',
@@ -41,6 +49,7 @@ def build_confirm_cancel(
     return builder.as_markup()
 
 
+@precomputed()
 def build_skip_cancel(
     skip_callback: str | CallbackData = 'skip',
     cancel_callback: str | CallbackData = 'cancel',
@@ -55,6 +64,7 @@ def build_skip_cancel(
     return builder.as_markup()
 
 
+@precomputed(variants=[(role,) for role in UserRole])
 def build_main_keyboard(role: UserRole) -> ReplyKeyboardMarkup:
     """Формирует основную клавиатуру."""
     builder = ReplyKeyboardBuilder()
@@ -77,9 +87,16 @@ def build_main_keyboard(role: UserRole) -> ReplyKeyboardMarkup:
             text="👥 Пользователи",
         )
 
+        builder.button(
+            text="📊 Статистика",
+        )
+
     builder.adjust(1)
 
-    if role in (UserRole.CATCHER, UserRole.ADMIN):
+    if role == UserRole.CATCHER:
         builder.adjust(2, 1)
 
+    if role == UserRole.ADMIN:
+        builder.adjust(2, 1, 2)
+
     return builder.as_markup(one_time_keyboard=True, resize_keyboard=True)
@@ -0,0 +1,76 @@
+import functools
+import inspect
+from typing import Any, Callable, Hashable, Iterable
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+type Markup = InlineKeyboardMarkup | ReplyKeyboardMarkup
+
+
+class FrozenList(list):
+    """Список, который нельзя изменить: ряды и кнопки общих клавиатур."""
+
+    def _readonly(self, *args: Any, **kwargs: Any):
+        raise TypeError("Общую клавиатуру нельзя изменять, соберите новую через builder")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+
+def freeze[M: Markup](markup: M) -> M:
+    """Копия клавиатуры, в которой нельзя изменить ни ряды, ни сами кнопки."""
+    field = 'inline_keyboard' if isinstance(markup, InlineKeyboardMarkup) else 'keyboard'
+    rows = FrozenList(FrozenList(row) for row in getattr(markup, field))
+    return markup.model_copy(update={field: rows})
+
+
+def _packed(value: Any) -> Any:
+    """CallbackData в виде строки: модель нельзя хешировать, а кнопка примет и строку."""
+    return value.pack() if isinstance(value, CallbackData) else value
+
+
+def precomputed[**P, M: Markup](
+    variants: Iterable[tuple] = ((),),
+) -> Callable[[Callable[P, M]], Callable[P, M]]:
+    """
+    Реестр готовых клавиатур для функции, которая строит клавиатуру по аргументам.
+
+    Клавиатуры для `variants` (кортежи позиционных аргументов) строятся при импорте,
+    остальные при первом вызове. Все вызовы с одинаковыми аргументами получают один и тот
+    же замороженный объект, поэтому аргументы должны быть хешируемыми. CallbackData
+    упаковывается в строку до построения, так что фабрики колбэков тоже подходят.
+
+    Использование:
+    @precomputed(variants=[(role,) for role in UserRole])
+    def build_main_keyboard(role: UserRole) -> ReplyKeyboardMarkup: ...
+    """
+
+    def decorator(build: Callable[P, M]) -> Callable[P, M]:
+        signature = inspect.signature(build)
+        markups: dict[Hashable, M] = {}
+
+        @functools.wraps(build)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> M:
+            args = tuple(_packed(arg) for arg in args)
+            kwargs = {name: _packed(value) for name, value in kwargs.items()}
+            key = (args, tuple(kwargs.items())) if kwargs else args
+            markup = markups.get(key)
+            if markup is None:
+                # Один и тот же вариант можно задать по-разному: позиционно, по имени
+                # или значением по умолчанию, а строится он всё равно один раз
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                markup = markups.get(bound.args)
+                if markup is None:
+                    markup = markups[bound.args] = freeze(build(*bound.args))
+                markups[key] = markup
+
+            return markup
+
+        for arguments in variants:
+            wrapper(*arguments)
+
+        return wrapper
+
+    return decorator
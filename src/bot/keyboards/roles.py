@@ -5,9 +5,19 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from bot.callback_factories import UserListAction, UserListCallbackFactory
 from bot.keyboards.basic import back_builder, cancel_builder
+from bot.keyboards.registry import precomputed
 from database.models import UserFlag, UserRole
 
 
+class UserRoleButtons(enum.StrEnum):
+    """Кнопки выбора роли доступа."""
+
+    ADMIN = "💼 Админ"
+    CATCHER = "🔦 Работник отлова"
+    GUEST = "👀 Гость"
+
+
+@precomputed()
 def build_role_control() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
@@ -33,16 +43,10 @@ def build_role_control() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@precomputed()
 def build_choose_role() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    class UserRoleButtons(enum.StrEnum):
-        """Роли доступа."""
-
-        ADMIN = "💼 Админ"
-        CATCHER = "🔦 Работник отлова"
-        GUEST = "👀 Гость"
-
     for role in UserRole:
         builder.button(
             text=UserRoleButtons[role.name].value,
@@ -54,6 +58,7 @@ def build_choose_role() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@precomputed(variants=[(role,) for role in UserRole])
 def build_user_list_menu(role: UserRole) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
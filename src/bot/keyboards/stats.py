@@ -0,0 +1,17 @@
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from bot.keyboards.registry import precomputed
+
+
+@precomputed()
+def build_stats_keyboard() -> InlineKeyboardMarkup:
+    """Формирует клавиатуру под статистикой."""
+    builder = InlineKeyboardBuilder()
+
+    builder.button(
+        text="🔄 Пересчитать",
+        callback_data="stats_rebuild",
+    )
+
+    return builder.as_markup()
@@ -1,77 +1,212 @@
+import asyncio
+import datetime
 import secrets
-from typing import AsyncGenerator
+from collections import Counter
+from pathlib import Path
+from typing import AsyncGenerator, Coroutine, Iterable, NamedTuple
 
+from bson import ObjectId
 from loguru import logger
 
 import settings
-from database.client import client
+from cache import TTLCache
 from database.models import (
+    AnimalOutcome,
     AnimalRecordCreate,
     AnimalRecordRead,
     InviteCreate,
     InviteRead,
+    StatDimension,
     TgUserID,
     UserCreate,
     UserRead,
     UserRole,
 )
-from database.repositories import AnimalRecordRepository, InviteRepository, UserRepository
+from database.repositories import (
+    AnimalPage,
+    AnimalRecordRepository,
+    AnimalWindow,
+    Repositories,
+    StatKey,
+    UserRepository,
+)
+from database.watcher import ChangeEvent, watcher
+from export import (
+    DELTA_HEADER_ROW,
+    HEADER_ROW,
+    WRITERS,
+    DeltaOperation,
+    ExportFormat,
+    ExportQuery,
+    Rows,
+    record_row,
+    record_rows,
+    tombstone_row,
+)
+from utils import get_utc_now
+
+# Имя автора в записях о животных, если автор удалён
+DELETED_USER_NAME = "Удалённый пользователь"
+
+# Отметка о заполнении имени автора в старых записях, см. backfill_author_names
+AUTHOR_NAMES_MIGRATION = "author_names"
+
+# Отметка о заведении счётчиков животных у старых пользователей, см. backfill_animals_counts
+ANIMALS_COUNT_MIGRATION = "animals_count"
+
+# Справочник пользователей, общий для UserRoleMiddleware и AdminFilter.
+# Кэшируются и отсутствующие пользователи (None), поэтому все изменения в коллекции
+# пользователей должны явно сбрасывать соответствующую запись.
+user_cache: TTLCache[int, UserRead | None] = TTLCache(
+    maxsize=settings.cache.users_maxsize,
+    ttl=settings.cache.users_ttl,
+)
+
+
+# Поля пользователя, которые меняются вместе с записями о животных. Они читаются
+# мимо кэша, поэтому их обновления не сбрасывают кэш на репликах
+COUNTER_FIELDS = frozenset({'animals_count'})
+
+
+def _on_users_change(event: ChangeEvent) -> None:
+    """Сбрасывает кэш пользователей при изменениях в другой реплике бота."""
+    if event.updated_fields is not None and event.updated_fields <= COUNTER_FIELDS:
+        return
+
+    if event.document and 'tg_id' in event.document:
+        user_cache.invalidate(event.document['tg_id'])
+    else:
+        # Для удалений известен только _id, поэтому сбрасываем кэш целиком
+        user_cache.clear()
+
+    # Карточки животных не сбрасываются: имя автора хранится в самой записи, и его
+    # замена через refresh_author_names сдвигает updated_at, а с ним и ключ карточки
+
+
+# Окна пагинации по записям о животных для каждого пользователя и фильтра
+animal_windows: TTLCache[tuple[TgUserID, TgUserID | None], AnimalWindow] = TTLCache(
+    maxsize=settings.cache.animal_windows_maxsize,
+    ttl=settings.cache.animal_windows_ttl,
+)
+
+
+def _on_animal_records_change(event: ChangeEvent) -> None:
+    """Сбрасывает окна пагинации при изменениях в другой реплике бота."""
+    animal_windows.clear()
+
+
+class AnimalCard(NamedTuple):
+    """Готовая карточка животного: HTML-текст и file_id фотографий."""
+
+    text: str
+    media: tuple[str, ...]
+
 
+# Карточки по (_id, updated_at) записи: после правки у записи новый ключ, а старая
+# карточка вытесняется из LRU сама
+animal_cards: TTLCache[tuple[object, datetime.datetime], AnimalCard] = TTLCache(
+    maxsize=settings.cache.animal_cards_maxsize,
+    ttl=settings.cache.animal_cards_ttl,
+)
+
+caches: dict[str, TTLCache] = {
+    'users': user_cache,
+    'animal_windows': animal_windows,
+    'animal_cards': animal_cards,
+}
+
+
+watcher.subscribe(UserRepository.collection, _on_users_change)
+watcher.subscribe(AnimalRecordRepository.collection, _on_animal_records_change)
+
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора до завершения
+background_tasks: set[asyncio.Task] = set()
 
-async def init_indexes() -> None:
-    """Инициализация индексов в базе данных."""
-    repo = UserRepository(client.db)
-    await repo.add_indexes()
 
-    repo = InviteRepository(client.db)
-    await repo.add_indexes()
+def run_in_background(coroutine: Coroutine) -> asyncio.Task:
+    """Запустить корутину в фоне, не дожидаясь её завершения."""
+    task = asyncio.create_task(coroutine)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 
-async def is_admin(tg_id: int) -> bool:
+async def log_cache_stats(interval: float) -> None:
+    """Периодически выводить в лог счётчики локальных кэшей. Работает до отмены задачи."""
+    while True:
+        await asyncio.sleep(interval)
+        for name, cache in caches.items():
+            logger.info(f"Кэш {name}: {cache.stats}")
+
+
+async def init_indexes(repos: Repositories) -> None:
+    """
+    Инициализация индексов в базе данных.
+
+    Запускается в фоне: пока индексы строятся, бот уже обрабатывает сообщения.
+    """
+    for repo in repos:
+        try:
+            await repo.add_indexes()
+        except Exception:
+            logger.exception(f"Ошибка при создании индексов коллекции {repo.collection}.")
+
+
+async def is_admin(repos: Repositories, tg_id: int) -> bool:
     """Проверяет, является ли пользователь администратором."""
-    repo = UserRepository(client.db)
-    return await repo.is_admin(tg_id)
+    user = await get_user(repos, tg_id)
+    return user is not None and user.role == UserRole.ADMIN
 
 
-async def get_users_by_role(role: UserRole) -> list[UserRead]:
+async def get_users_by_role(repos: Repositories, role: UserRole) -> list[UserRead]:
     """Получает список пользователей по роли."""
-    repo = UserRepository(client.db)
+    repo = repos.users
     return [user async for user in repo.get_bulk({"role": role.value})]
 
 
-async def get_admins() -> list[UserRead]:
+async def get_admins(repos: Repositories) -> list[UserRead]:
     """Получает список администраторов."""
-    repo = UserRepository(client.db)
+    repo = repos.users
     return [admin async for admin in await repo.get_admins()]
 
 
-async def get_user(tg_id: int) -> UserRead | None:
-    """Получает пользователя по tg_id."""
-    repo = UserRepository(client.db)
-    return await repo.get_by_tg_id(tg_id)
+async def get_user(repos: Repositories, tg_id: int) -> UserRead | None:
+    """Получает пользователя по tg_id, используя кэш."""
+    found, user = user_cache.get(tg_id)
+    if found:
+        return user
 
+    # Сброс, пришедший во время чтения, означает, что прочитанный пользователь устарел
+    generation = user_cache.generation(tg_id)
+    repo = repos.users
+    user = await repo.get_by_tg_id(tg_id)
+    user_cache.set(tg_id, user, generation)
 
-async def check_invite(password: str) -> InviteRead | None:
-    """Проверить приглашение."""
-    repo = InviteRepository(client.db)
-    invite = await repo.get_one({"password": password})
+    return user
 
-    if invite is None or invite.is_expired:
-        return None
 
-    await repo.expire(password)
-    return invite
+async def check_invite(repos: Repositories, password: str) -> InviteRead | None:
+    """Проверить и погасить приглашение."""
+    repo = repos.invites
+    return await repo.redeem(password)
 
 
-async def create_user(UserCreate: UserCreate) -> UserRead:
+async def create_user(repos: Repositories, UserCreate: UserCreate) -> UserRead:
     """Создать нового пользователя."""
-    repo = UserRepository(client.db)
-    return await repo.create_one(UserCreate)
+    repo = repos.users
+    user = await repo.create_one(UserCreate)
+    user_cache.invalidate(UserCreate.tg_id)
+
+    # Пользователь мог быть удалён и вернуться по новому приглашению под другим именем
+    run_in_background(refresh_author_names(repos, [UserCreate.tg_id]))
 
+    return user
 
-async def create_invite(role: UserRole, username: str) -> InviteRead:
+
+async def create_invite(repos: Repositories, role: UserRole, username: str) -> InviteRead:
     """Создать новое приглашение."""
-    repo = InviteRepository(client.db)
+    repo = repos.invites
 
     model = InviteCreate(
         password=secrets.token_urlsafe(6),
@@ -82,51 +217,365 @@ async def create_invite(role: UserRole, username: str) -> InviteRead:
     return await repo.create_one(model)
 
 
-async def add_superadmins_from_venv() -> None:
+async def add_superadmins_from_venv(repos: Repositories) -> None:
     """Добавление суперадминов из переменных окружения."""
-    repo = UserRepository(client.db)
+    repo = repos.users
 
     for _id in settings.tg.admin_ids:
-        user = await repo.get_by_tg_id(_id)
-
-        if user is None:
+        if not await repo.exists(_id):
             model = UserCreate(
                 tg_id=_id,
                 role=UserRole.ADMIN,
                 name="Администратор",
             )
             await repo.create_one(model)
+            user_cache.invalidate(_id)
+            run_in_background(refresh_author_names(repos, [_id]))
             logger.success(f"Суперадмин {_id} добавлен.")
         else:
             logger.info(f"Суперадмин {_id} уже существует.")
 
 
-async def user_delete(tg_id: int) -> None:
-    """Удалить пользователя."""
-    repo = UserRepository(client.db)
-    result = await repo.delete_one({"tg_id": tg_id})
-    if result:
-        logger.success(f"Пользователь {tg_id} был удален.")
+async def users_delete(repos: Repositories, tg_ids: list[int]) -> int:
+    """Удалить нескольких пользователей одним запросом."""
+    repo = repos.users
+    deleted = await repo.delete_bulk({"tg_id": {"$in": tg_ids}})
+
+    for tg_id in tg_ids:
+        user_cache.invalidate(tg_id)
+    run_in_background(refresh_author_names(repos, tg_ids))
+
+    if deleted == len(tg_ids):
+        logger.success(f"Пользователи {tg_ids} были удалены.")
     else:
-        logger.error(f"Пользователь {tg_id} не был удален.")
+        logger.error(f"Удалено {deleted} из {len(tg_ids)} пользователей {tg_ids}.")
+
+    return deleted
+
+
+async def get_user_names(repos: Repositories, tg_ids: Iterable[TgUserID]) -> dict[TgUserID, str]:
+    """Получить имена пользователей одним запросом. Удалённых в результате нет."""
+    query = {"tg_id": {"$in": list(tg_ids)}}
+    return {user.tg_id: user.name async for user in repos.users.get_bulk(query)}
+
+
+async def get_author_name(repos: Repositories, tg_id: TgUserID) -> str:
+    """Получить имя автора записей или заглушку, если пользователь удалён."""
+    user = await get_user(repos, tg_id)
+    return user.name if user is not None else DELETED_USER_NAME
+
+
+async def refresh_author_names(repos: Repositories, tg_ids: Iterable[TgUserID]) -> bool:
+    """
+    Переписать имя автора в записях о животных после удаления или появления авторов.
 
+    Ошибка по одному автору не мешает остальным. Возвращает `True`, если имя удалось
+    переписать у всех авторов.
+    """
+    repo = repos.animals
+    tg_ids = list(tg_ids)
+    users = await get_user_names(repos, tg_ids)
 
-async def add_animal_record(model: AnimalRecordCreate) -> AnimalRecordRead:
+    updated = 0
+    failed = 0
+    for tg_id in tg_ids:
+        try:
+            updated += await repo.set_author_name(tg_id, users.get(tg_id, DELETED_USER_NAME))
+        except Exception:
+            failed += 1
+            logger.exception(f"Ошибка при обновлении имени автора {tg_id} в записях о животных.")
+
+    if updated:
+        # В окнах пагинации лежат записи со старым именем
+        animal_windows.clear()
+
+    return not failed
+
+
+async def backfill_author_names(repos: Repositories) -> None:
+    """
+    Заполнить имя автора в записях, созданных до появления этого поля.
+
+    Поиск таких записей проходит по всей коллекции, поэтому выполняется один раз:
+    после успешного заполнения в базе остаётся отметка миграции. Новые записи
+    получают имя автора при создании.
+    """
+    if await repos.migrations.is_applied(AUTHOR_NAMES_MIGRATION):
+        return
+
+    tg_ids = await repos.animals.get_unnamed_authors()
+    if tg_ids:
+        logger.info(f"Заполнение имени автора в записях {len(tg_ids)} авторов...")
+        if not await refresh_author_names(repos, tg_ids):
+            logger.warning("Имя автора заполнено не везде, повтор при следующем запуске.")
+            return
+
+    await repos.migrations.mark_applied(AUTHOR_NAMES_MIGRATION)
+
+
+async def add_animal_record(repos: Repositories, model: AnimalRecordCreate) -> AnimalRecordRead:
     """Добавить запись о животном."""
-    repo = AnimalRecordRepository(client.db)
-    return await repo.create_one(model)
+    repo = repos.animals
+    if model.created_by_name is None:
+        model = model.model_copy(
+            update={'created_by_name': await get_author_name(repos, model.created_by)}
+        )
+    record = await repo.create_one(model)
+
+    # Новая запись могла попасть внутрь или на край любого из окон
+    animal_windows.clear()
+
+    try:
+        await repos.users.add_animals(model.created_by)
+    except Exception:
+        # Запись уже сохранена, а неверный счётчик лучше, чем потерянная запись
+        logger.exception(f"Счётчик животных пользователя {model.created_by} не обновлён.")
+
+    try:
+        await repos.stats.add(animal_stat_keys(record))
+    except Exception:
+        logger.exception(f"Статистика по записи {record.id} не обновлена.")
+
+    return record
+
+
+async def get_animals_count(repos: Repositories, tg_id: TgUserID) -> int:
+    """
+    Получить количество записей о животных, которые внёс пользователь.
+
+    Обычно это поле пользователя, прочитанное по индексу на tg_id. Кэш пользователей
+    здесь не используется: счётчик меняет каждая новая запись, и ради него пришлось бы
+    сбрасывать кэш на всех репликах. Пока у пользователя нет счётчика, записи считаются
+    в базе, а сам счётчик здесь не заводится: запись, добавленная между подсчётом
+    и сохранением, навсегда потерялась бы в нём.
+    """
+    user = await repos.users.get_partial({"tg_id": tg_id}, ("animals_count",))
+    if user is not None and user.get("animals_count") is not None:
+        return user["animals_count"]
+
+    return await repos.animals.count_by_author(tg_id)
+
+
+async def backfill_animals_counts(repos: Repositories) -> None:
+    """
+    Завести счётчики животных у пользователей, появившихся раньше счётчика.
+
+    Выполняется один раз при запуске до начала обработки обновлений, чтобы между
+    подсчётом записей пользователя и сохранением счётчика он не успел добавить новую.
+    Другие реплики в это время не должны принимать записи о животных.
+    """
+    if await repos.migrations.is_applied(ANIMALS_COUNT_MIGRATION):
+        return
+
+    tg_ids = [
+        user["tg_id"]
+        async for user in repos.users.get_bulk_partial(
+            {"animals_count": {"$exists": False}}, ("tg_id",)
+        )
+    ]
+    for tg_id in tg_ids:
+        await repos.users.init_animals_count(tg_id, await repos.animals.count_by_author(tg_id))
+
+    logger.info(f"Счётчики животных заведены у {len(tg_ids)} пользователей.")
+    await repos.migrations.mark_applied(ANIMALS_COUNT_MIGRATION)
+
+
+async def get_animal_page(
+    repos: Repositories,
+    key: tuple[datetime.datetime, ObjectId] | None,
+    user_filter: TgUserID | None,
+    backward: bool = False,
+    inclusive: bool = False,
+) -> AnimalPage:
+    """Получить страницу списка животных, начиная с ключа записи на краю соседней."""
+    repo = repos.animals
+    _filter = {"created_by": user_filter} if user_filter else {}
+
+    return await repo.get_page(
+        filter=_filter,
+        key=key,
+        backward=backward,
+        inclusive=inclusive,
+        size=settings.tg.animal_page_size,
+    )
 
 
 async def get_animal_display(
+    repos: Repositories,
     animal_id: str | None,
     user_filter: TgUserID | None,
+    viewer_id: TgUserID,
 ) -> dict[str, AnimalRecordRead | None]:
-    """Получить запись о животном."""
-    repo = AnimalRecordRepository(client.db)
+    """
+    Получить запись о животном.
+
+    Запись и её соседи берутся из окна, сохранённого для пользователя при прошлом
+    просмотре. В базу идёт запрос, только если запись вышла за край окна.
+    """
+    key = (viewer_id, user_filter)
+    found, window = animal_windows.get(key)
+
+    if found and (animals := window.around(animal_id)):
+        return animals
+
+    repo = repos.animals
     _filter = {"created_by": user_filter} if user_filter else {}
 
-    return await repo.get_3_animals(
+    window = await repo.get_window(
         filter=_filter,
         sort_field='created_at',
         target_id=animal_id,
+        size=settings.cache.animal_window_size,
     )
+    animal_windows.set(key, window)
+
+    return window.around(animal_id) or {'prev': None, 'target': None, 'next': None}
+
+
+def animal_outcome(record: AnimalRecordRead) -> AnimalOutcome:
+    """Чем закончилась история животного по датам в записи."""
+    if record.euthanasia_date:
+        return AnimalOutcome.EUTHANIZED
+    if record.return_date:
+        return AnimalOutcome.RETURNED
+    return AnimalOutcome.IN_SHELTER
+
+
+def animal_stat_keys(record: AnimalRecordRead) -> list[StatKey]:
+    """Счётчики статистики, в которые попадает запись. Общие для записи и пересчёта."""
+    return [
+        (StatDimension.TOTAL, ""),
+        (StatDimension.ANIMAL_TYPE, str(record.animal_type)),
+        (StatDimension.SEX, str(record.sex)),
+        (StatDimension.MONTH, f"{record.catch_date:%Y-%m}"),
+        (StatDimension.CATCHER, str(record.created_by)),
+        (StatDimension.STERILIZED, str(record.is_sterilized).lower()),
+        (StatDimension.VACCINATED, str(record.is_vaccinated).lower()),
+        (StatDimension.OUTCOME, str(animal_outcome(record))),
+    ]
+
+
+async def rebuild_stats(repos: Repositories) -> int:
+    """
+    Пересчитать статистику заново по всем записям о животных.
+
+    Записи читаются пачками, поэтому в памяти находятся только счётчики. Записи,
+    добавленные во время пересчёта, могут не попасть в него, и тогда их учтёт
+    следующий пересчёт.
+
+    Счётчики заменяются только после чтения всех записей: `replace_all` удаляет
+    счётчики, которых нет в пересчёте, поэтому неполный пересчёт стёр бы статистику.
+    Ошибка чтения пробрасывается, и старые счётчики остаются как были.
+    """
+    counts: Counter[StatKey] = Counter()
+    records = 0
+
+    try:
+        async for batch in repos.animals.get_batches({}):
+            for record in batch:
+                counts.update(animal_stat_keys(record))
+            records += len(batch)
+    except Exception:
+        logger.error(f"Пересчёт статистики прерван после {records} записей, счётчики не изменены.")
+        raise
+
+    result = await repos.stats.replace_all(counts)
+    if not result.ok:
+        logger.error(f"Статистика пересчитана с ошибками: {result.summary}.")
+    else:
+        logger.success(f"Статистика пересчитана по {records} записям.")
+
+    return records
+
+
+async def backfill_stats(repos: Repositories) -> None:
+    """Посчитать статистику, если её ещё нет, а записи о животных уже есть."""
+    if await repos.stats.get_partial({}, ("_id",)) is not None:
+        return
+
+    if await repos.animals.get_partial({}, ("_id",)) is not None:
+        logger.info("Статистики ещё нет, пересчёт по всем записям о животных...")
+        try:
+            await rebuild_stats(repos)
+        except Exception:
+            # Запускается в фоне, где исключение никто не ждёт
+            logger.exception("Статистика не посчитана, повтор при следующем запуске.")
+
+
+async def get_stats(repos: Repositories) -> dict[StatDimension, dict[str, int]]:
+    """Получить счётчики статистики, сгруппированные по разрезам."""
+    stats: dict[StatDimension, dict[str, int]] = {dimension: {} for dimension in StatDimension}
+    for stat in await repos.stats.get_all():
+        stats[StatDimension(stat.dimension)][stat.value] = stat.count
+
+    return stats
+
+
+async def export_animal_records(repos: Repositories, query: ExportQuery, path: Path) -> int:
+    """
+    Выгрузить записи о животных в файл. Возвращает число выгруженных записей.
+
+    Записи читаются пачками по дате отлова и сразу пишутся в файл, так что в памяти
+    находится только одна пачка. Ошибка чтения пробрасывается: недописанный файл
+    нельзя выдавать за выгрузку.
+    """
+    batches = repos.animals.get_batches(query.filter, sort_field="catch_date")
+    count = await WRITERS[query.format](record_rows(batches), path, HEADER_ROW)
+    logger.info(f"Выгружено {count} записей о животных в {path.name}.")
+
+    return count
+
+
+type ExportKey = tuple[datetime.datetime, ObjectId]
+
+
+class DeltaExport(NamedTuple):
+    """Итог разностной выгрузки: число строк и ключи последних выгруженных документов."""
+
+    count: int
+    records: ExportKey | None
+    tombstones: ExportKey | None
+
+
+async def export_animal_delta(
+    repos: Repositories,
+    consumer: str,
+    format: ExportFormat,
+    path: Path,
+) -> DeltaExport:
+    """
+    Выгрузить в файл записи, изменённые после отметки получателя, и отметки об удалении.
+
+    Документы читаются по индексу (`updated_at`, `_id`) от ключа в отметке, поэтому
+    выгрузка стоит столько, сколько было изменений. Сама отметка не сдвигается:
+    это делает `commit_delta_export`, когда получатель уже получил файл. Если выгрузка
+    прервётся, следующая начнётся с той же отметки.
+    """
+    mark = await repos.watermarks.get(consumer)
+    keys: dict[str, ExportKey | None] = {"records": None, "tombstones": None}
+    if mark is not None:
+        if mark.records_at is not None:
+            keys["records"] = (mark.records_at, mark.records_id)
+        if mark.tombstones_at is not None:
+            keys["tombstones"] = (mark.tombstones_at, mark.tombstones_id)
+
+    until = get_utc_now() - datetime.timedelta(seconds=settings.db.delta_export_lag)
+
+    async def rows() -> Rows:
+        async for batch in repos.animals.get_changed(keys["records"], until):
+            keys["records"] = (batch[-1].updated_at, batch[-1].id)
+            yield [[DeltaOperation.UPSERT, *record_row(record)] for record in batch]
+
+        async for batch in repos.tombstones.get_changed(keys["tombstones"], until):
+            keys["tombstones"] = (batch[-1].updated_at, batch[-1].id)
+            yield [tombstone_row(tombstone) for tombstone in batch]
+
+    count = await WRITERS[format](rows(), path, DELTA_HEADER_ROW)
+    logger.info(f"Разностная выгрузка для {consumer}: {count} изменений в {path.name}.")
+
+    return DeltaExport(count, keys["records"], keys["tombstones"])
+
+
+async def commit_delta_export(repos: Repositories, consumer: str, delta: DeltaExport) -> None:
+    """Сдвинуть отметку получателя после того, как он получил разностную выгрузку."""
+    await repos.watermarks.commit(consumer, delta.records, delta.tombstones)
@@ -5,6 +5,7 @@ from aiogram.types import TelegramObject, Update
 from loguru import logger
 
 from bot.logic import get_user
+from database.repositories import Repositories
 
 
 class LoggerMiddleware(BaseMiddleware):
@@ -63,6 +64,21 @@ class LoggerMiddleware(BaseMiddleware):
         return await handler(update, data)
 
 
+class RepositoryMiddleware(BaseMiddleware):
+    def __init__(self, repos: Repositories):
+        self.repos = repos
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        """Добавляет репозитории в data."""
+        data["repos"] = self.repos
+        return await handler(event, data)
+
+
 class UserRoleMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -75,7 +91,7 @@ class UserRoleMiddleware(BaseMiddleware):
         user = data.get("event_from_user")
 
         if user:
-            _user = await get_user(user.id)
+            _user = await get_user(data["repos"], user.id)
             data["user_role"] = _user.role if _user else None
 
         logger.debug(f"UserRoleMiddleware: {user.id}: {data['user_role']}")
@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+_MISSING = object()
+
+
+class TTLCache[K: Hashable, V]:
+    """
+    Ограниченный по размеру LRU-кэш с временем жизни записей.
+
+    Использование:
+    cache = TTLCache(maxsize=1024, ttl=60)
+    cache.set(key, value)
+    found, value = cache.get(key)
+
+    Если значение читается из базы, а сброс может прийти, пока идёт чтение:
+    generation = cache.generation(key)
+    value = await read()
+    cache.set(key, value, generation)
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        # Счётчики сбросов по ключам и всего кэша для `generation`
+        self._generations: OrderedDict[K, int] = OrderedDict()
+        self._epoch = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key)[0]
+
+    def get(self, key: K) -> tuple[bool, V | None]:
+        """
+        Получить значение из кэша.
+
+        Возвращает пару (найдено ли значение, значение), так как `None` тоже может быть
+        закэшировано.
+        """
+        item = self._data.get(key, _MISSING)
+
+        if item is _MISSING:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return False, None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def generation(self, key: K) -> tuple[int, int]:
+        """Версия ключа. Меняется при каждом сбросе ключа или всего кэша."""
+        return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key: K, value: V, generation: tuple[int, int] | None = None) -> bool:
+        """
+        Положить значение в кэш, вытеснив самое старое при переполнении.
+
+        С `generation` значение не кладётся, если ключ сбросили после получения версии:
+        оно было прочитано до изменения и уже устарело. Возвращает, положено ли значение.
+        """
+        if generation is not None and generation != self.generation(key):
+            return False
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+        return True
+
+    def invalidate(self, key: K) -> None:
+        """Удалить значение из кэша."""
+        self._data.pop(key, None)
+
+        self._generations[key] = self._generations.get(key, 0) + 1
+        self._generations.move_to_end(key)
+        if len(self._generations) > self.maxsize:
+            # Без счётчика версия ключа вернулась бы к прежней, поэтому меняем версии всех
+            self._generations.popitem(last=False)
+            self._epoch += 1
+
+    def clear(self) -> None:
+        """Очистить кэш."""
+        self._data.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def stats(self) -> dict[str, int | float]:
+        """Счётчики работы кэша."""
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hit_ratio, 3),
+        }
@@ -1,8 +1,39 @@
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable
+
+from aiogram.fsm.storage.base import BaseStorage
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.asynchronous.database import AsyncDatabase
 
 import settings
 
+from .memory import MemoryClient, MemoryCollection, MemoryDatabase
+from .sqlite import SqliteClient
+
+# Драйверы с одинаковым API: motor (поверх синхронного PyMongo в пуле потоков),
+# нативный асинхронный клиент PyMongo и встроенные хранилища в памяти процесса
+# и в файле SQLite (наследники Memory*)
+Client = AsyncIOMotorClient | AsyncMongoClient | MemoryClient
+Database = AsyncIOMotorDatabase | AsyncDatabase | MemoryDatabase
+Collection = AsyncIOMotorCollection | AsyncCollection | MemoryCollection
+
+
+async def resolve[T](value: T | Awaitable[T]) -> T:
+    """
+    Получить результат вызова, который в одном драйвере синхронный, а в другом корутина.
+
+    Например, `aggregate()` и `watch()` в motor сразу возвращают курсор, а в PyMongo
+    их нужно дожидаться.
+    """
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
 
 class MongoClient:
     """
@@ -14,22 +45,33 @@ class MongoClient:
     await client.aiogram_fsm.collection.find_one()
     """
 
-    def __init__(self, dsn: str, db_name: str):
+    drivers: dict[str, type[Client]] = {
+        'motor': AsyncIOMotorClient,
+        'pymongo': AsyncMongoClient,
+        'memory': MemoryClient,
+        'sqlite': SqliteClient,
+    }
+    # Встроенные хранилища доступны только одному процессу, слушать изменения в них незачем
+    embedded: frozenset[str] = frozenset({'memory', 'sqlite'})
+
+    def __init__(self, dsn: str, db_name: str, driver: str = 'motor', **options: Any):
         self.dsn = dsn
         self._db = db_name
+        self.driver = driver
+        self.options = options
         self.client = self._init_client()
 
-    def _init_client(self) -> AsyncIOMotorClient:
+    def _init_client(self) -> Client:
         try:
-            client = AsyncIOMotorClient(self.dsn)
+            client = self.drivers[self.driver](self.dsn, **self.options)
         except Exception:
             logger.exception(f"Не получилось осуществить подключение к {self.dsn}")
 
         return client
 
-    @property
-    def db(self) -> AsyncIOMotorDatabase:
-        """Получить соединение с основной базой данных."""
+    @functools.cached_property
+    def db(self) -> Database:
+        """Получить соединение с основной базой данных. Создаётся один раз."""
         try:
             client = self.client[self._db]
             logger.success(f"Подключение к {self.dsn}/{self._db} прошло успешно")
@@ -38,9 +80,13 @@ class MongoClient:
 
         return client
 
-    @property
-    def aiogram_fsm(self) -> AsyncIOMotorDatabase:
-        """Получить соединение с базой данных для хранения состояний в aiogram."""
+    @functools.cached_property
+    def aiogram_fsm(self) -> Database:
+        """
+        Получить соединение с базой данных для хранения состояний в aiogram.
+
+        Создаётся один раз.
+        """
         try:
             client = self.client['aiogram_fsm']
             logger.success(f"Подключение к {self.dsn}/aiogram_fsm прошло успешно")
@@ -51,8 +97,42 @@ class MongoClient:
 
         return client
 
+    def fsm_storage(self) -> BaseStorage:
+        """Хранилище состояний aiogram для выбранного драйвера."""
+        if self.driver == 'memory':
+            from aiogram.fsm.storage.memory import MemoryStorage
+
+            return MemoryStorage()
+
+        # Хранилище PyMongo ждёт асинхронный API, как у клиента SQLite, и для SQLite
+        # состояния сохраняются в тот же файл
+        if self.driver in ('pymongo', 'sqlite'):
+            from aiogram.fsm.storage.pymongo import PyMongoStorage
+
+            return PyMongoStorage(self.client)
+
+        from aiogram.fsm.storage.mongo import MongoStorage
+
+        return MongoStorage(self.client)
+
+    async def warm_up(self, connections: int | None = None) -> None:
+        """
+        Заранее открыть соединения в пуле.
+
+        Одновременные ping занимают разные соединения, поэтому после прогрева в пуле
+        остаётся не меньше `connections` открытых соединений (по умолчанию minPoolSize).
+        """
+        connections = connections or self.options.get('minPoolSize') or 1
+        try:
+            await asyncio.gather(*(self.client.admin.command('ping') for _ in range(connections)))
+            logger.success(f"Пул соединений с {self.dsn} прогрет ({connections} шт.)")
+        except Exception:
+            logger.exception(f"Не получилось прогреть пул соединений с {self.dsn}")
+
 
 client = MongoClient(
     settings.db.db_dsn,
     'dog_stats_db',
+    driver=settings.db.driver,
+    **settings.db.client_options,
 )
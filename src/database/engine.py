@@ -0,0 +1,672 @@
+import copy
+import datetime
+import heapq
+import operator
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from typing import Any
+
+import bson
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+# Движок запросов MongoDB над документами Python: порядок значений BSON, фильтры,
+# выражения, обновления, проекции и агрегация. Им пользуются драйверы `memory`
+# и `sqlite`, которые сами отвечают только за хранение документов.
+
+Document = dict[str, Any]
+
+MISSING = object()  # Поля нет в документе
+
+# Коды ошибок сервера, которые повторяет хранилище
+DUPLICATE_KEY = 11000
+BAD_VALUE = 2
+TYPE_MISMATCH = 14
+INDEX_OPTIONS_CONFLICT = 85
+UNRECOGNIZED_STAGE = 40324
+
+
+def normalize(document: Mapping[str, Any]) -> Document:
+    """
+    Привести документ к виду, в котором его вернул бы драйвер.
+
+    Кортежи становятся списками, даты переводятся в UTC без часового пояса, а результат
+    не разделяет вложенные объекты с исходным документом.
+    """
+    return bson.decode(bson.encode(document))
+
+
+# --- Доступ к полям по пути ---
+
+
+def get_path(document: Any, path: str) -> Any:
+    """Значение поля по пути через точку или `MISSING`, если поля нет."""
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, Mapping):
+            value = value.get(part, MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return MISSING
+
+        if value is MISSING:
+            return MISSING
+
+    return value
+
+
+def set_path(document: Document, path: str, value: Any) -> None:
+    """Записать значение поля по пути через точку, создавая вложенные документы."""
+    *parents, last = path.split('.')
+    for part in parents:
+        document = document.setdefault(part, {})
+        if not isinstance(document, dict):
+            raise OperationFailure(f"Cannot create field '{part}' in {path}", code=BAD_VALUE)
+
+    document[last] = value
+
+
+def unset_path(document: Document, path: str) -> None:
+    """Удалить поле по пути через точку."""
+    *parents, last = path.split('.')
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+
+    document.pop(last, None)
+
+
+# --- Порядок значений BSON ---
+
+_RANKS = {
+    type(None): 1,
+    int: 2,
+    float: 2,
+    bson.Int64: 2,
+    str: 3,
+    dict: 4,
+    list: 5,
+    bytes: 6,
+    ObjectId: 7,
+    bool: 8,
+    datetime.datetime: 9,
+}
+
+
+def _type_rank(value: Any) -> int:
+    """Место типа значения в порядке сравнения BSON."""
+    rank = _RANKS.get(value.__class__)
+    if rank is not None:
+        return rank
+
+    if value is MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, Mapping):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, datetime.datetime):
+        return 9
+    return 10
+
+
+def sort_key(value: Any) -> tuple:
+    """Ключ, упорядочивающий значения так же, как Mongo."""
+    rank = _type_rank(value)
+
+    match rank:
+        case 1:
+            return (1, 0)
+        case 4:
+            return (4, tuple((key, sort_key(item)) for key, item in value.items()))
+        case 5:
+            return (5, tuple(sort_key(item) for item in value))
+        case 9:
+            # Mongo хранит даты в UTC с точностью до миллисекунд
+            if value.tzinfo is not None:
+                value = value.astimezone(datetime.UTC).replace(tzinfo=None)
+            return (9, value.replace(microsecond=value.microsecond // 1000 * 1000))
+        case 10:
+            return (10, repr(value))
+
+    return (rank, value)
+
+
+def _field_sort_key(value: Any, direction: int) -> tuple:
+    """
+    Ключ сортировки документов по значению поля.
+
+    Массив, как в Mongo, стоит на месте своего наименьшего элемента при сортировке
+    по возрастанию и наибольшего при сортировке по убыванию, а пустой массив идёт
+    раньше null.
+    """
+    if not isinstance(value, list):
+        return sort_key(value)
+    if not value:
+        return (0,)
+
+    keys = [sort_key(item) for item in value]
+    return min(keys) if direction > 0 else max(keys)
+
+
+def sort_items(sort: Any) -> list[tuple[str, int]]:
+    """Привести описание сортировки к списку пар (поле, направление)."""
+    if not sort:
+        return []
+    if isinstance(sort, str):
+        return [(sort, 1)]
+    if isinstance(sort, Mapping):
+        return list(sort.items())
+
+    return [(item, 1) if isinstance(item, str) else tuple(item) for item in sort]
+
+
+def sort_documents(
+    documents: Iterable[Document],
+    sort: Any,
+    limit: int | None = None,
+) -> list[Document]:
+    """
+    Отсортировать документы по описанию сортировки Mongo.
+
+    С `limit` при одинаковом направлении всех полей выбираются только первые документы
+    через кучу, без сортировки всей выборки.
+    """
+    items = sort_items(sort)
+    getters = [(_getter(field), direction) for field, direction in items]
+
+    if limit and len({direction for _, direction in items}) == 1:
+        select = heapq.nsmallest if items[0][1] > 0 else heapq.nlargest
+        return select(
+            limit,
+            documents,
+            key=lambda document: tuple(
+                _field_sort_key(get(document), direction) for get, direction in getters
+            ),
+        )
+
+    documents = list(documents)
+    # Устойчивая сортировка по ключам в обратном порядке даёт сортировку по составному ключу
+    for get, direction in reversed(getters):
+        documents.sort(
+            key=lambda document: _field_sort_key(get(document), direction),
+            reverse=direction < 0,
+        )
+
+    return documents[:limit] if limit else documents
+
+
+# --- Фильтры запросов ---
+#
+# Фильтры, выражения и конвейеры агрегации один раз компилируются в функции, которые
+# затем вызываются для каждого документа. Функции принимают документ и переменные
+# конвейера (`$$name`), которые нужны в `$lookup`.
+
+Predicate = Callable[[Mapping, Mapping], bool]
+Expression = Callable[[Any, Mapping], Any]
+
+_PLAIN_TYPES = frozenset({int, float, str, bool, ObjectId, datetime.datetime})
+
+_COMPARISONS = {
+    '$eq': operator.eq,
+    '$ne': operator.ne,
+    '$lt': operator.lt,
+    '$lte': operator.le,
+    '$gt': operator.gt,
+    '$gte': operator.ge,
+}
+
+
+def _getter(path: str) -> Callable[[Any], Any]:
+    """Функция, достающая поле по пути из документа."""
+    if '.' in path:
+        return lambda document: get_path(document, path)
+
+    def get(document: Any) -> Any:
+        try:
+            return document.get(path, MISSING)
+        except AttributeError:
+            return MISSING
+
+    return get
+
+
+def _candidates(value: Any) -> list[Any]:
+    """Значения, с которыми сравнивается условие: само поле и элементы массива."""
+    if isinstance(value, list):
+        return [value, *value]
+    return [value]
+
+
+def is_operator(condition: Any) -> bool:
+    return (
+        isinstance(condition, Mapping) and bool(condition) and next(iter(condition)).startswith('$')
+    )
+
+
+def _compile_equals(expected: Any) -> Callable[[Any], bool]:
+    if expected is None:
+        return lambda value: (
+            value is MISSING or value is None or (isinstance(value, list) and None in value)
+        )
+
+    key = sort_key(expected)
+    # Значение того же класса, что и искомое, можно сравнить напрямую
+    plain, plain_class = key[1], key[1].__class__ if key[0] in (2, 3, 7, 8, 9) else None
+
+    def equals(value: Any) -> bool:
+        if value.__class__ is plain_class:
+            return value == plain
+        if isinstance(value, list):
+            return any(sort_key(item) == key for item in (value, *value))
+        return value is not MISSING and sort_key(value) == key
+
+    return equals
+
+
+def _compile_comparison(name: str, argument: Any) -> Callable[[Any], bool]:
+    # Сравниваются только значения одного типа, как в Mongo
+    compare, expected = _COMPARISONS[name], sort_key(argument)
+    rank = expected[0]
+
+    def comparison(value: Any) -> bool:
+        for item in _candidates(value):
+            if (
+                item is not MISSING
+                and (key := sort_key(item))[0] == rank
+                and compare(key, expected)
+            ):
+                return True
+        return False
+
+    return comparison
+
+
+def _compile_operator(name: str, argument: Any) -> Callable[[Any], bool]:
+    match name:
+        case '$eq':
+            return _compile_equals(argument)
+        case '$ne':
+            equals = _compile_equals(argument)
+            return lambda value: not equals(value)
+        case '$in':
+            tests = [_compile_equals(item) for item in argument]
+            return lambda value: any(test(value) for test in tests)
+        case '$nin':
+            tests = [_compile_equals(item) for item in argument]
+            return lambda value: not any(test(value) for test in tests)
+        case '$lt' | '$lte' | '$gt' | '$gte':
+            return _compile_comparison(name, argument)
+        case '$exists':
+            return lambda value: (value is not MISSING) == bool(argument)
+        case '$not':
+            test = compile_condition(argument)
+            return lambda value: not test(value)
+        case _:
+            raise OperationFailure(f"unknown operator: {name}", code=BAD_VALUE)
+
+
+def compile_condition(condition: Any) -> Callable[[Any], bool]:
+    """Скомпилировать условие на значение одного поля."""
+    if not is_operator(condition):
+        return _compile_equals(condition)
+
+    tests = [_compile_operator(name, argument) for name, argument in condition.items()]
+    if len(tests) == 1:
+        return tests[0]
+
+    return lambda value: all(test(value) for test in tests)
+
+
+def compile_filter(filter: Mapping | None) -> Predicate:
+    """Скомпилировать фильтр запроса Mongo в функцию от документа и переменных."""
+    tests: list[Predicate] = []
+
+    for key, condition in (filter or {}).items():
+        match key:
+            case '$and':
+                predicates = [compile_filter(item) for item in condition]
+                tests.append(
+                    lambda document, variables, predicates=predicates: all(
+                        predicate(document, variables) for predicate in predicates
+                    )
+                )
+            case '$or':
+                predicates = [compile_filter(item) for item in condition]
+                tests.append(
+                    lambda document, variables, predicates=predicates: any(
+                        predicate(document, variables) for predicate in predicates
+                    )
+                )
+            case '$expr':
+                expression = compile_expression(condition)
+                tests.append(
+                    lambda document, variables, expression=expression: _truthy(
+                        expression(document, variables)
+                    )
+                )
+            case _ if key.startswith('$'):
+                raise OperationFailure(f"unknown top level operator: {key}", code=BAD_VALUE)
+            case _:
+                tests.append(
+                    lambda document, variables, get=_getter(key), test=compile_condition(
+                        condition
+                    ): (test(get(document)))
+                )
+
+    if not tests:
+        return lambda document, variables: True
+    if len(tests) == 1:
+        return tests[0]
+
+    return lambda document, variables: all(test(document, variables) for test in tests)
+
+
+def match(document: Mapping, filter: Mapping | None, variables: Mapping | None = None) -> bool:
+    """Проверить, подходит ли документ под фильтр запроса Mongo."""
+    return compile_filter(filter)(document, variables or {})
+
+
+def equality_fields(filter: Mapping | None) -> Document:
+    """Поля фильтра, заданные точным значением. Из них собирается документ при upsert."""
+    fields = {}
+
+    for key, condition in (filter or {}).items():
+        if key == '$and':
+            for item in condition:
+                fields.update(equality_fields(item))
+        elif key.startswith('$'):
+            continue
+        elif not is_operator(condition):
+            fields[key] = condition
+        elif '$eq' in condition:
+            fields[key] = condition['$eq']
+
+    return fields
+
+
+# --- Выражения агрегации ---
+#
+# Выражения нужны только для условий `$expr` в `$lookup`: ссылки на поля и переменные,
+# сравнения, `$and` и `$or`.
+
+
+def _truthy(value: Any) -> bool:
+    return value is not MISSING and value is not None and value is not False and value != 0
+
+
+def compile_expression(expression: Any) -> Expression:
+    """Скомпилировать выражение агрегации в функцию от документа и переменных."""
+    if isinstance(expression, str):
+        if expression.startswith('$$'):
+            name, _, path = expression[2:].partition('.')
+            get = _getter(path) if path else None
+
+            def variable(document: Any, variables: Mapping) -> Any:
+                if name in ('ROOT', 'CURRENT'):
+                    value = document
+                else:
+                    value = variables.get(name, MISSING)
+                return get(value) if get else value
+
+            return variable
+
+        if expression.startswith('$'):
+            get = _getter(expression[1:])
+            return lambda document, variables: get(document)
+
+        return lambda document, variables: expression
+
+    if is_operator(expression) and len(expression) == 1:
+        return _compile_expression_operator(*next(iter(expression.items())))
+
+    if isinstance(expression, (Mapping, list)):
+        raise OperationFailure(f"Unsupported expression: {expression!r}", code=BAD_VALUE)
+
+    if isinstance(expression, datetime.datetime):
+        expression = sort_key(expression)[1]
+    return lambda document, variables: expression
+
+
+def _compile_expression_operator(name: str, arguments: Any) -> Expression:
+    if not isinstance(arguments, list):
+        arguments = [arguments]
+    items = [compile_expression(argument) for argument in arguments]
+
+    match name:
+        case '$eq' | '$ne' | '$lt' | '$lte' | '$gt' | '$gte':
+            # В выражениях, в отличие от фильтров, сравниваются значения любых типов
+            compare = _COMPARISONS[name]
+            left, right = items
+
+            def comparison(document: Any, variables: Mapping) -> bool:
+                a, b = left(document, variables), right(document, variables)
+                if _directly_comparable(a, b):
+                    return compare(a, b)
+                return compare(sort_key(a), sort_key(b))
+
+            return comparison
+        case '$and':
+            return lambda document, variables: all(
+                _truthy(item(document, variables)) for item in items
+            )
+        case '$or':
+            return lambda document, variables: any(
+                _truthy(item(document, variables)) for item in items
+            )
+
+    raise OperationFailure(f"Unrecognized expression '{name}'", code=168)
+
+
+def _directly_comparable(a: Any, b: Any) -> bool:
+    """Можно ли сравнить значения без ключа сортировки: один простой тип и часовой пояс."""
+    return (
+        a.__class__ is b.__class__
+        and a.__class__ in _PLAIN_TYPES
+        and (a.__class__ is not datetime.datetime or (a.tzinfo is None) == (b.tzinfo is None))
+    )
+
+
+# --- Обновления и проекции ---
+
+
+def apply_update(document: Document, update: Mapping, inserting: bool = False) -> Document:
+    """Применить операторы обновления к копии документа."""
+    if not update or not all(key.startswith('$') for key in update):
+        raise ValueError("update only works with $ operators")
+
+    document = copy.deepcopy(document)
+
+    for name, fields in update.items():
+        for path, argument in fields.items():
+            match name:
+                case '$set':
+                    set_path(document, path, argument)
+                case '$setOnInsert':
+                    if inserting:
+                        set_path(document, path, argument)
+                case '$unset':
+                    unset_path(document, path)
+                case '$inc':
+                    current = get_path(document, path)
+                    if current is MISSING:
+                        current = 0
+                    elif _type_rank(current) != 2:
+                        raise OperationFailure(
+                            f"Cannot apply $inc to a value of non-numeric type at {path}",
+                            code=TYPE_MISMATCH,
+                        )
+                    set_path(document, path, current + argument)
+                case _:
+                    raise OperationFailure(f"Unknown modifier: {name}", code=9)
+
+    return document
+
+
+def compile_projection(projection: Any) -> Callable[[Mapping], Document]:
+    """Скомпилировать проекцию, включающую или исключающую поля по пути."""
+    if not projection:
+        return dict
+    if not isinstance(projection, Mapping):
+        projection = dict.fromkeys(projection, 1)
+
+    include_id = projection.get('_id', 1)
+    fields = [path for path, value in projection.items() if path != '_id' and value]
+    excluded = [path for path, value in projection.items() if path != '_id' and not value]
+
+    if fields and excluded:
+        raise OperationFailure("Cannot do exclusion on field in inclusion projection", code=31254)
+
+    if not fields:
+
+        def exclude(document: Mapping) -> Document:
+            result = copy.deepcopy(dict(document))
+            for path in excluded:
+                unset_path(result, path)
+            if not include_id:
+                result.pop('_id', None)
+            return result
+
+        return exclude
+
+    getters = {path: _getter(path) for path in fields}
+
+    def include(document: Mapping) -> Document:
+        result = {}
+        if include_id and '_id' in document:
+            result['_id'] = document['_id']
+        for path, get in getters.items():
+            value = get(document)
+            if value is not MISSING:
+                set_path(result, path, value)
+        return result
+
+    return include
+
+
+def project(document: Mapping, projection: Any) -> Document:
+    """Применить проекцию к документу."""
+    return compile_projection(projection)(document)
+
+
+# --- Агрегация ---
+#
+# Поддерживаются только стадии, из которых репозитории собирают окна пагинации:
+# `$match`, `$sort`, `$limit`, `$project` и `$lookup` с `let` и `pipeline`.
+
+Stage = Callable[[list[Document], Mapping], list[Document]]
+
+
+def _compile_stage(
+    name: str,
+    argument: Any,
+    database: Any,
+    limit: int | None,
+) -> Stage:
+    match name:
+        case '$match':
+            predicate = compile_filter(argument)
+            return lambda documents, variables: [
+                document for document in documents if predicate(document, variables)
+            ]
+
+        case '$sort':
+            return lambda documents, variables: sort_documents(documents, argument, limit)
+
+        case '$limit':
+            return lambda documents, variables: documents[:argument]
+
+        case '$project':
+            projection = compile_projection(argument)
+            return lambda documents, variables: [projection(document) for document in documents]
+
+        case '$lookup' if 'pipeline' in argument:
+            target = argument['as']
+            let = {key: compile_expression(value) for key, value in argument.get('let', {}).items()}
+            subpipeline = compile_pipeline(argument['pipeline'], database)
+            query = leading_query(argument['pipeline'])
+
+            def lookup(documents: list[Document], variables: Mapping) -> list[Document]:
+                collection = database[argument['from']]
+                result = []
+                for document in documents:
+                    scope = {
+                        **variables,
+                        **{key: value(document, variables) for key, value in let.items()},
+                    }
+                    foreign = collection._scan(*query, variables=scope)
+                    result.append({**document, target: subpipeline(foreign, scope)})
+                return result
+
+            return lookup
+
+        case _:
+            raise OperationFailure(
+                f"Unrecognized pipeline stage name: '{name}'", code=UNRECOGNIZED_STAGE
+            )
+
+
+def leading_query(pipeline: Sequence[Mapping]) -> tuple[Mapping | None, Any, int | None]:
+    """
+    Фильтр, сортировка и лимит из начальных стадий конвейера.
+
+    Их хранилище может применить уже при чтении документов, например, через индекс.
+    """
+    filters, sort, limit = [], None, None
+
+    for stage in pipeline:
+        (name, argument), *_ = stage.items()
+        if name == '$match' and sort is None:
+            filters.append(argument)
+        elif name == '$sort' and sort is None:
+            sort = argument
+        elif name == '$limit':
+            limit = argument
+            break
+        else:
+            break
+
+    filter = {'$and': filters} if len(filters) > 1 else (filters[0] if filters else None)
+    return filter, sort, limit
+
+
+def index_spec(model: IndexModel) -> Document:
+    """Описание индекса в том виде, в котором его хранит сервер."""
+    spec = dict(model.document)
+    spec['key'] = dict(spec['key'])
+    spec.setdefault('name', '_'.join(f"{field}_{order}" for field, order in spec['key'].items()))
+    return spec
+
+
+def compile_pipeline(
+    pipeline: Sequence[Mapping],
+    database: Any,
+) -> Callable[[Iterable[Document], Mapping], list[Document]]:
+    """
+    Скомпилировать конвейер агрегации.
+
+    Исходные документы не изменяются: стадии собирают новые документы поверх них.
+    `$sort`, за которым сразу идёт `$limit`, выбирает только нужное число документов.
+    Коллекции для `$lookup` берутся из базы драйвера `database` и читаются через `_scan`.
+    """
+    stages = []
+    for index, stage in enumerate(pipeline):
+        (name, argument), *_ = stage.items()
+        following = pipeline[index + 1] if index + 1 < len(pipeline) else {}
+        stages.append(_compile_stage(name, argument, database, following.get('$limit')))
+
+    def run(documents: Iterable[Document], variables: Mapping) -> list[Document]:
+        documents = list(documents)
+        for stage in stages:
+            documents = stage(documents, variables)
+        return documents
+
+    return run
@@ -0,0 +1,719 @@
+import copy
+import datetime
+import itertools
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from typing import Any
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, IndexModel, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+from pymongo.write_concern import WriteConcern
+
+from .engine import (
+    DUPLICATE_KEY,
+    INDEX_OPTIONS_CONFLICT,
+    MISSING,
+    Document,
+    apply_update,
+    compile_filter,
+    compile_pipeline,
+    compile_projection,
+    equality_fields,
+    get_path,
+    index_spec,
+    is_operator,
+    leading_query,
+    match,
+    normalize,
+    project,
+    sort_documents,
+    sort_key,
+)
+
+# Размер пачки курсора по умолчанию, как у первой пачки MongoDB
+BATCH_SIZE = 101
+
+# Mongo удаляет документы по TTL-индексу не сразу, а фоновой задачей раз в минуту
+TTL_MONITOR_INTERVAL = 60
+
+
+# --- Курсоры ---
+
+
+class _BaseCursor:
+    """
+    Асинхронный курсор, который читает результаты из хранилища пачками.
+
+    Запрос выполняется при первом чтении вместе с первой пачкой, а следующие документы
+    достаются по мере надобности, так что в памяти курсора находится одна пачка.
+    """
+
+    def __init__(self, collection: "MemoryCollection", batch_size: int = 0):
+        self.collection = collection
+        self._batch_size = batch_size or BATCH_SIZE
+        self._results: Iterator[Document] | None = None
+        self._buffer: deque[Document] = deque()
+
+    def _load(self) -> Iterable[Document]:
+        raise NotImplementedError
+
+    async def _fetch(self, length: int | None) -> list[Document]:
+        """Прочитать из хранилища следующие `length` документов или все оставшиеся."""
+        if self._results is not None:
+            return await self.collection._fetch(self._results, length)
+
+        def first() -> list[Document]:
+            self._results = iter(self._load())
+            return list(itertools.islice(self._results, length))
+
+        return await self.collection._run(first)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Document:
+        if not self._buffer:
+            self._buffer.extend(await self._fetch(self._batch_size))
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.popleft()
+
+    async def to_list(self, length: int | None = None) -> list[Document]:
+        """Получить следующие `length` документов или все оставшиеся."""
+        if length is None:
+            documents = [*self._buffer, *await self._fetch(None)]
+            self._buffer.clear()
+            return documents
+
+        documents = [self._buffer.popleft() for _ in range(min(length, len(self._buffer)))]
+        if len(documents) < length:
+            documents.extend(await self._fetch(length - len(documents)))
+        return documents
+
+    async def close(self) -> None:
+        self._results = iter(())
+        self._buffer.clear()
+
+
+class MemoryCursor(_BaseCursor):
+    """Курсор по результатам `find`."""
+
+    def __init__(
+        self,
+        collection: "MemoryCollection",
+        filter: Mapping | None = None,
+        projection: Any = None,
+        sort: Any = None,
+        limit: int = 0,
+        batch_size: int = 0,
+        **kwargs: Any,
+    ):
+        super().__init__(collection, batch_size)
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = sort
+        self._limit = limit
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+
+    def _load(self) -> Iterable[Document]:
+        return self.collection._find(self._filter, self._projection, self._sort, self._limit)
+
+
+class MemoryCommandCursor(_BaseCursor):
+    """Курсор по результатам `aggregate`."""
+
+    def __init__(
+        self,
+        collection: "MemoryCollection",
+        pipeline: Sequence[Mapping],
+        batch_size: int = 0,
+    ):
+        super().__init__(collection, batch_size)
+        self._pipeline = list(pipeline)
+
+    def _load(self) -> Iterable[Document]:
+        return self.collection._aggregate(self._pipeline)
+
+
+# --- Хранилище ---
+
+
+class CollectionState:
+    """Данные коллекции, общие для всех её представлений с разными настройками записи."""
+
+    def __init__(self):
+        self.documents: dict[tuple, Document] = {}
+        self.indexes: dict[str, Document] = {}
+        # Уникальные индексы: имя -> ключ документа в индексе -> ключ его `_id`
+        self.entries: dict[str, dict[tuple, tuple]] = {}
+        self.purged_at = time.monotonic()
+
+
+class MemoryCollection:
+    """
+    Коллекция MongoDB в памяти процесса.
+
+    Повторяет ту часть API коллекции motor/PyMongo, которой пользуются репозитории
+    и хранилище состояний aiogram, и ничего сверх неё:
+    - фильтры: равенство, `$ne`, `$in`, `$nin`, `$lt`/`$lte`/`$gt`/`$gte`, `$exists`,
+      `$not`, `$and`, `$or` и `$expr` со сравнениями;
+    - сортировка, лимит и проекция, включающая или исключающая поля;
+    - обновления `$set`, `$setOnInsert`, `$unset` и `$inc`, замена документа и upsert;
+    - пакетная запись с ошибками по операциям;
+    - агрегация из `$match`, `$sort`, `$limit`, `$project` и `$lookup` с `pipeline`.
+
+    Уникальные индексы соблюдаются, а документы по TTL-индексам удаляются раз в
+    `TTL_MONITOR_INTERVAL`, как это делает Mongo. Остальные индексы только запоминаются.
+    Неизвестные операторы и стадии вызывают `OperationFailure`.
+    Документы проходят через BSON, поэтому на выходе они такие же, как от драйвера.
+
+    Все операции выполняются через `_run`, который наследники могут переопределить,
+    например, чтобы выполнять их в отдельном потоке.
+    """
+
+    def __init__(
+        self,
+        database: "MemoryDatabase",
+        name: str,
+        write_concern: WriteConcern | None = None,
+        state: CollectionState | None = None,
+    ):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self.write_concern = write_concern or WriteConcern()
+        self._state = state or CollectionState()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.full_name!r})"
+
+    def with_options(self, write_concern: WriteConcern | None = None, **kwargs: Any):
+        """Представление той же коллекции с другими гарантиями записи."""
+        return type(self)(
+            self.database, self.name, write_concern or self.write_concern, self._state
+        )
+
+    async def _run[T](self, function: Callable[..., T], *args: Any) -> T:
+        """Выполнить операцию над данными коллекции."""
+        return function(*args)
+
+    async def _fetch(self, results: Iterator[Document], length: int | None) -> list[Document]:
+        """Прочитать следующие документы из результатов курсора."""
+        return list(itertools.islice(results, length))
+
+    @property
+    def _acknowledged(self) -> bool:
+        return self.write_concern.acknowledged
+
+    # --- Примитивы хранения, которые могут переопределять наследники ---
+
+    def _all(self) -> list[Document]:
+        """Все документы коллекции."""
+        self._purge_expired()
+        return list(self._state.documents.values())
+
+    def _get(self, _id: Any) -> Document | None:
+        """Документ по `_id`."""
+        return self._state.documents.get(sort_key(_id))
+
+    def _scan(
+        self,
+        filter: Mapping | None,
+        sort: Any = None,
+        limit: int | None = None,
+        variables: Mapping | None = None,
+    ) -> Iterable[Document]:
+        """
+        Документы, среди которых нужно искать подходящие под фильтр.
+
+        Хранилище может вернуть и лишние документы: вызывающий код всегда проверяет
+        документы сам. Лимит хранилище применяет, только если точно выполнило фильтр,
+        а сортировку, если может, всегда, и тогда подтверждает её через `_ordered`.
+        """
+        self._purge_expired()
+        if filter and '_id' in filter and not is_operator(filter['_id']):
+            document = self._get(filter['_id'])
+            return [document] if document else []
+
+        return list(self._state.documents.values())
+
+    def _ordered(self, sort: Any) -> bool:
+        """Идут ли документы из последнего `_scan` уже в порядке `sort`."""
+        return False
+
+    def _put(self, document: Document, previous: Document | None = None) -> None:
+        """Записать новый документ или заменить существующий с тем же `_id`."""
+        self._check_unique(document, previous)
+        if previous is not None:
+            self._update_entries(previous, remove=True)
+        self._state.documents[sort_key(document['_id'])] = document
+        self._update_entries(document)
+
+    def _remove(self, document: Document) -> None:
+        """Удалить документ."""
+        del self._state.documents[sort_key(document['_id'])]
+        self._update_entries(document, remove=True)
+
+    def _clear(self) -> None:
+        self._state.documents.clear()
+        self._state.indexes.clear()
+        self._state.entries.clear()
+
+    def _expired(self, path: str, deadline: datetime.datetime) -> list[Document]:
+        """Документы, у которых дата в поле `path` не позже `deadline`."""
+        return [
+            document
+            for document in self._state.documents.values()
+            if isinstance(value := get_path(document, path), datetime.datetime)
+            and value <= deadline
+        ]
+
+    # --- Индексы ---
+
+    def _index_key(self, spec: Mapping, document: Mapping) -> tuple | None:
+        """Ключ документа в индексе или `None`, если документ в индекс не попадает."""
+        values = [get_path(document, field) for field in spec['key']]
+        if spec.get('sparse') and all(value is MISSING for value in values):
+            return None
+        if 'partialFilterExpression' in spec and not match(
+            document, spec['partialFilterExpression']
+        ):
+            return None
+
+        return tuple(sort_key(value) for value in values)
+
+    def _unique_entries(self, spec: Mapping) -> dict[tuple, tuple]:
+        """Ключи уникального индекса по записанным документам, если они не повторяются."""
+        entries = {}
+        for document in self._all():
+            index_key = self._index_key(spec, document)
+            if index_key is None:
+                continue
+            if index_key in entries:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} "
+                    f"index: {spec['name']}",
+                    code=DUPLICATE_KEY,
+                )
+            entries[index_key] = sort_key(document['_id'])
+
+        return entries
+
+    def _update_entries(self, document: Document, remove: bool = False) -> None:
+        """Добавить документ в уникальные индексы или убрать его оттуда."""
+        for name, entries in self._state.entries.items():
+            index_key = self._index_key(self._state.indexes[name], document)
+            if index_key is None:
+                continue
+            if remove:
+                entries.pop(index_key, None)
+            else:
+                entries[index_key] = sort_key(document['_id'])
+
+    def _check_unique(self, document: Document, previous: Document | None = None) -> None:
+        """Проверить, что новый документ не повторяет ключи уникальных индексов."""
+        if previous is None and self._get(document['_id']) is not None:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_ "
+                f"dup key: {{ _id: {document['_id']!r} }}",
+                code=DUPLICATE_KEY,
+            )
+
+        _id = sort_key(document['_id'])
+        for name, entries in self._state.entries.items():
+            index_key = self._index_key(self._state.indexes[name], document)
+            if index_key is not None and entries.get(index_key, _id) != _id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} index: {name}",
+                    code=DUPLICATE_KEY,
+                )
+
+    def _build_index(self, spec: Document) -> None:
+        """Построить новый индекс по описанию."""
+        if spec.get('unique'):
+            self._state.entries[spec['name']] = self._unique_entries(spec)
+        self._state.indexes[spec['name']] = spec
+
+    def _purge_expired(self) -> None:
+        """Удалить документы по TTL-индексам, если с прошлой проверки прошла минута."""
+        if time.monotonic() - self._state.purged_at < TTL_MONITOR_INTERVAL:
+            return
+        self._state.purged_at = time.monotonic()
+
+        now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        for spec in list(self._state.indexes.values()):
+            if 'expireAfterSeconds' not in spec:
+                continue
+            deadline = now - datetime.timedelta(seconds=spec['expireAfterSeconds'])
+            for document in self._expired(next(iter(spec['key'])), deadline):
+                self._remove(document)
+
+    def _create_indexes(self, models: Sequence[IndexModel]) -> list[str]:
+        names = []
+        for model in models:
+            spec = index_spec(model)
+            name = spec['name']
+
+            existing = self._state.indexes.get(name)
+            if existing is None:
+                self._build_index(spec)
+            elif existing != spec:
+                raise OperationFailure(
+                    f"An existing index has the same name as the requested index: {name}",
+                    code=INDEX_OPTIONS_CONFLICT,
+                )
+
+            names.append(name)
+
+        return names
+
+    def _index_information(self) -> dict[str, Document]:
+        information = {'_id_': {'v': 2, 'key': [('_id', 1)]}}
+        for name, spec in self._state.indexes.items():
+            information[name] = {
+                'v': 2,
+                'key': list(spec['key'].items()),
+                **{
+                    option: value for option, value in spec.items() if option not in ('key', 'name')
+                },
+            }
+
+        return information
+
+    # --- Операции ---
+
+    def _find(
+        self,
+        filter: Mapping | None,
+        projection: Any = None,
+        sort: Any = None,
+        limit: int = 0,
+    ) -> Iterable[Document]:
+        documents = self._select(filter, sort, limit)
+        project_document = compile_projection(projection)
+        return (normalize(project_document(document)) for document in documents)
+
+    def _aggregate(self, pipeline: Sequence[Mapping]) -> Iterable[Document]:
+        documents = self._scan(*leading_query(pipeline))
+        run = compile_pipeline(pipeline, self.database)
+        return (normalize(document) for document in run(documents, {}))
+
+    def _insert(self, document: Document) -> Any:
+        # Как и драйвер, добавляем `_id` в переданный документ
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+
+        self._put(normalize(document))
+        return document['_id']
+
+    def _update(self, filter: Mapping, update: Any, upsert: bool, multi: bool):
+        """Обновить или заменить документы. Возвращает сырой результат, как сервер."""
+        replace = not any(key.startswith('$') for key in update)
+        documents = self._find_raw(filter, limit=0 if multi else 1)
+
+        result = {'n': 0, 'nModified': 0, 'ok': 1.0}
+        for document in documents:
+            if replace:
+                updated = normalize({'_id': document['_id'], **update})
+            else:
+                updated = normalize(apply_update(document, update))
+            if updated.get('_id') != document['_id']:
+                raise OperationFailure(
+                    "Performing an update on the path '_id' would modify the immutable field '_id'",
+                    code=66,
+                )
+
+            result['n'] += 1
+            if updated != document:
+                self._put(updated, document)
+                result['nModified'] += 1
+
+        if not documents and upsert:
+            seed = equality_fields(filter)
+            if replace:
+                # Из фильтра при замене, как и в Mongo, берётся только _id
+                document = dict(update)
+                if '_id' in seed:
+                    document.setdefault('_id', seed['_id'])
+            else:
+                document = apply_update(seed, update, inserting=True)
+            document.setdefault('_id', ObjectId())
+            self._put(normalize(document))
+            result['n'] = 1
+            result['upserted'] = document['_id']
+
+        return result
+
+    def _select(self, filter: Mapping, sort: Any = None, limit: int = 0) -> Iterable[Document]:
+        """Хранимые документы под фильтр без копирования, по мере чтения из хранилища."""
+        predicate = compile_filter(filter)
+        documents = self._scan(filter, sort, limit or None)
+        documents = (document for document in documents if predicate(document, {}))
+        if sort and not self._ordered(sort):
+            return sort_documents(documents, sort, limit or None)
+
+        return itertools.islice(documents, limit or None)
+
+    def _find_raw(self, filter: Mapping, sort: Any = None, limit: int = 0) -> list[Document]:
+        """Хранимые документы под фильтр без копирования."""
+        return list(self._select(filter, sort, limit))
+
+    def _delete(self, filter: Mapping, multi: bool) -> dict[str, Any]:
+        documents = self._find_raw(filter, limit=0 if multi else 1)
+        for document in documents:
+            self._remove(document)
+
+        return {'n': len(documents), 'ok': 1.0}
+
+    def _find_one_and_modify(
+        self,
+        filter: Mapping,
+        update: Mapping | None,
+        projection: Any,
+        upsert: bool,
+        return_document: bool,
+    ) -> Document | None:
+        documents = self._find_raw(filter, limit=1)
+        before = documents[0] if documents else None
+
+        if update is None:
+            if before is not None:
+                self._remove(before)
+            after = None
+        else:
+            result = self._update(
+                filter if before is None else {'_id': before['_id']}, update, upsert, False
+            )
+            _id = before['_id'] if before is not None else result.get('upserted')
+            after = self._get(_id) if _id is not None else None
+
+        document = after if return_document else before
+        return normalize(project(document, projection)) if document is not None else None
+
+    def _bulk_write(self, operations: Sequence[Any], ordered: bool) -> dict[str, Any]:
+        details = {
+            'writeErrors': [],
+            'writeConcernErrors': [],
+            'nInserted': 0,
+            'nUpserted': 0,
+            'nMatched': 0,
+            'nModified': 0,
+            'nRemoved': 0,
+            'upserted': [],
+        }
+
+        for index, operation in enumerate(operations):
+            try:
+                match operation:
+                    case InsertOne():
+                        self._insert(operation._doc)
+                        details['nInserted'] += 1
+                    case UpdateOne() | UpdateMany() | ReplaceOne():
+                        result = self._update(
+                            operation._filter,
+                            operation._doc,
+                            operation._upsert,
+                            multi=isinstance(operation, UpdateMany),
+                        )
+                        if 'upserted' in result:
+                            details['nUpserted'] += 1
+                            details['upserted'].append({'index': index, '_id': result['upserted']})
+                        else:
+                            details['nMatched'] += result['n']
+                            details['nModified'] += result['nModified']
+                    case DeleteOne() | DeleteMany():
+                        result = self._delete(operation._filter, isinstance(operation, DeleteMany))
+                        details['nRemoved'] += result['n']
+                    case _:
+                        raise TypeError(f"{operation!r} is not a valid request")
+
+            except OperationFailure as e:
+                details['writeErrors'].append(
+                    {'index': index, 'code': e.code, 'errmsg': str(e), 'op': operation}
+                )
+                if ordered:
+                    break
+
+        return details
+
+    # --- API коллекции ---
+
+    async def insert_one(self, document: Document, **kwargs: Any) -> InsertOneResult:
+        inserted_id = await self._run(self._insert, document)
+        return InsertOneResult(inserted_id, self._acknowledged)
+
+    async def insert_many(
+        self, documents: Iterable[Document], ordered: bool = True, **kwargs: Any
+    ) -> InsertManyResult:
+        documents = list(documents)
+        for document in documents:
+            document.setdefault('_id', ObjectId())
+
+        await self.bulk_write([InsertOne(document) for document in documents], ordered=ordered)
+        return InsertManyResult([document['_id'] for document in documents], self._acknowledged)
+
+    def find(self, filter: Mapping | None = None, *args: Any, **kwargs: Any) -> MemoryCursor:
+        return MemoryCursor(self, filter, *args, **kwargs)
+
+    async def find_one(self, filter: Mapping | None = None, *args: Any, **kwargs: Any):
+        documents = await self.find(filter, *args, **kwargs).limit(1).to_list()
+        return documents[0] if documents else None
+
+    async def find_one_and_update(
+        self,
+        filter: Mapping,
+        update: Mapping,
+        projection: Any = None,
+        upsert: bool = False,
+        return_document: bool = False,
+        **kwargs: Any,
+    ) -> Document | None:
+        return await self._run(
+            self._find_one_and_modify, filter, update, projection, upsert, return_document
+        )
+
+    async def find_one_and_delete(
+        self, filter: Mapping, projection: Any = None, **kwargs: Any
+    ) -> Document | None:
+        return await self._run(self._find_one_and_modify, filter, None, projection, False, False)
+
+    async def update_one(
+        self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs: Any
+    ) -> UpdateResult:
+        result = await self._run(self._update, filter, update, upsert, False)
+        return UpdateResult(result, self._acknowledged)
+
+    async def update_many(
+        self, filter: Mapping, update: Mapping, upsert: bool = False, **kwargs: Any
+    ) -> UpdateResult:
+        result = await self._run(self._update, filter, update, upsert, True)
+        return UpdateResult(result, self._acknowledged)
+
+    async def delete_one(self, filter: Mapping, **kwargs: Any) -> DeleteResult:
+        return DeleteResult(await self._run(self._delete, filter, False), self._acknowledged)
+
+    async def delete_many(self, filter: Mapping, **kwargs: Any) -> DeleteResult:
+        return DeleteResult(await self._run(self._delete, filter, True), self._acknowledged)
+
+    async def bulk_write(
+        self, requests: Sequence[Any], ordered: bool = True, **kwargs: Any
+    ) -> BulkWriteResult:
+        details = await self._run(self._bulk_write, list(requests), ordered)
+        if details['writeErrors'] and self._acknowledged:
+            raise BulkWriteError(details)
+
+        return BulkWriteResult(details, self._acknowledged)
+
+    async def count_documents(self, filter: Mapping, **kwargs: Any) -> int:
+        return len(await self._run(self._find_raw, filter))
+
+    async def distinct(self, key: str, filter: Mapping | None = None, **kwargs: Any) -> list:
+        values = {}
+        for document in await self._run(self._find_raw, filter or {}):
+            value = get_path(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not MISSING:
+                    values.setdefault(sort_key(item), item)
+
+        return copy.deepcopy(list(values.values()))
+
+    def aggregate(self, pipeline: Sequence[Mapping], **kwargs: Any) -> MemoryCommandCursor:
+        return MemoryCommandCursor(self, pipeline, kwargs.get('batchSize', 0))
+
+    async def create_indexes(self, indexes: Sequence[IndexModel], **kwargs: Any) -> list[str]:
+        return await self._run(self._create_indexes, list(indexes))
+
+    async def index_information(self, **kwargs: Any) -> dict[str, Document]:
+        return await self._run(self._index_information)
+
+
+class MemoryDatabase:
+    """База данных MongoDB в памяти процесса."""
+
+    collection_class = MemoryCollection
+
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: dict[str, MemoryCollection] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = self.collection_class(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    async def drop_collection(self, name: str, **kwargs: Any) -> None:
+        collection = self._collections.pop(name, None)
+        if collection is not None:
+            await collection._run(collection._clear)
+
+    async def command(self, command: str | Mapping, **kwargs: Any) -> Document:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == 'ping':
+            return {'ok': 1.0}
+
+        raise OperationFailure(f"no such command: '{name}'", code=59)
+
+
+class MemoryClient:
+    """
+    Клиент MongoDB, который хранит данные в памяти процесса.
+
+    Нужен для тестов, бенчмарков и нагрузочных прогонов логики бота без сервера. Данные
+    живут, пока жив процесс. Change streams не поддерживаются, поэтому слушатель
+    изменений с этим драйвером не запускается.
+
+    Использование:
+    client = MemoryClient()
+    await client['dog_stats_db']['users'].find_one({"tg_id": 1})
+    """
+
+    database_class = MemoryDatabase
+
+    def __init__(self, host: str | None = None, **options: Any):
+        self.host = host
+        self.options = options
+        self._databases: dict[str, MemoryDatabase] = {}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = self.database_class(self, name)
+        return self._databases[name]
+
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+    async def drop_database(self, name_or_database: str | MemoryDatabase, **kwargs: Any) -> None:
+        name = getattr(name_or_database, 'name', name_or_database)
+        database = self._databases.pop(name, None)
+        if database is not None:
+            for collection in list(database._collections):
+                await database.drop_collection(collection)
+
+    async def close(self) -> None:
+        pass
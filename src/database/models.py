@@ -1,12 +1,13 @@
 import abc
 import datetime
 import enum
-from typing import Annotated
+import functools
+from typing import Annotated, Any, Callable, Mapping, Self
 
 from bson import ObjectId
 from pydantic import BaseModel, ConfigDict, Field, field_serializer
 
-from utils import get_utc_now
+from utils import get_invite_expiration, get_utc_now
 
 TgFileID = str
 TgUserID = Annotated[int, Field(gt=0)]
@@ -17,6 +18,51 @@ class MongoBase(BaseModel, abc.ABC):
 
     model_config = ConfigDict(use_enum_values=True)
 
+    @classmethod
+    def from_document(cls, document: Mapping[str, Any]) -> Self:
+        """
+        Собрать модель из документа базы без валидации.
+
+        Только для документов, записанных через модели MongoCreate/MongoUpdate. В отличие от
+        `model_construct`, разбор полей модели выполняется один раз на класс, поэтому сборка
+        заметно быстрее валидации (см. benchmarks/read_models.py).
+        """
+        defaults, factories, aliases, fields = _trusted_spec(cls)
+
+        values = {**defaults, **document}
+        for alias, name in aliases:
+            if alias in values:
+                values[name] = values.pop(alias)
+        for name, factory in factories:
+            if name not in values:
+                values[name] = factory()
+
+        model = object.__new__(cls)
+        object.__setattr__(model, '__dict__', values)
+        object.__setattr__(model, '__pydantic_fields_set__', set(fields))
+        object.__setattr__(model, '__pydantic_extra__', None)
+        object.__setattr__(model, '__pydantic_private__', None)
+        return model
+
+
+@functools.cache
+def _trusted_spec(
+    model: type[BaseModel],
+) -> tuple[dict[str, Any], list[tuple[str, Callable]], list[tuple[str, str]], frozenset[str]]:
+    """Разобрать поля модели для `MongoBase.from_document`."""
+    defaults, factories, aliases = {}, [], []
+
+    for name, field in model.model_fields.items():
+        if field.default_factory is not None:
+            factories.append((name, field.default_factory))
+        elif not field.is_required():
+            defaults[name] = field.default
+
+        if field.alias and field.alias != name:
+            aliases.append((field.alias, name))
+
+    return defaults, factories, aliases, frozenset(model.model_fields)
+
 
 class MongoRead(MongoBase, abc.ABC):
     """Абстрактная модель для чтения документов MongoDB."""
@@ -81,13 +127,18 @@ class UserBase(MongoBase):
 class UserRead(UserBase, MongoRead):
     """Модель для чтения пользователя."""
 
-    pass
+    # Счётчик записей о животных, которые внёс пользователь. None у пользователей,
+    # появившихся раньше счётчика, пока его не заведёт logic.backfill_animals_counts.
+    # В кэше пользователей счётчик может отставать, актуальный даёт logic.get_animals_count
+    animals_count: int | None = None
 
 
 class UserCreate(UserBase, MongoCreate):
     """Модель для чтения пользователя."""
 
-    pass
+    # Счётчик заводится вместе с пользователем, поэтому ни одна его запись о животном
+    # не проходит мимо счётчика
+    animals_count: int = 0
 
 
 class UserUpdate(MongoUpdate):
@@ -123,18 +174,28 @@ class InviteRead(InviteBase, MongoRead):
     """Базовая модель для приглашения."""
 
     is_expired: bool
+    expires_at: datetime.datetime | None = None
 
 
 class InviteCreate(InviteBase, MongoCreate):
     """Базовая модель для приглашения."""
 
     is_expired: bool = False
+    expires_at: datetime.datetime = Field(
+        default_factory=get_invite_expiration,
+        title="Дата, после которой приглашение будет удалено",
+    )
 
 
 class InviteUpdate(MongoUpdate):
     """Базовая модель для приглашения."""
 
     is_expired: bool = True
+    # Использованное приглашение больше не нужно, его удалит TTL-индекс
+    expires_at: datetime.datetime = Field(
+        default_factory=get_utc_now,
+        title="Дата, после которой приглашение будет удалено",
+    )
 
 
 # * ================================================================================================
@@ -160,6 +221,13 @@ class Sex(enum.StrEnum):
 class AnimalRecordBase(MongoBase):
     """Базовая модель для записи о животном."""
 
+    # Копия имени автора, чтобы карточки и списки читались без запроса к пользователям.
+    # Обновляется в фоне при удалении или повторной регистрации автора
+    created_by_name: str | None = Field(
+        None,
+        title="Имя автора",
+    )
+
     features: str | None = Field(
         None,
         title="Особенности",
@@ -243,6 +311,30 @@ class AnimalRecordRead(AnimalRecordBase, MongoRead):
     )
 
 
+class AnimalRecordKey(MongoBase):
+    """Облегчённая модель записи о животном, когда нужен только её ключ."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    id: ObjectId = Field(alias="_id")
+
+
+class AnimalRecordSummary(MongoBase):
+    """Облегчённая модель записи о животном для строки в списке."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    id: ObjectId = Field(alias="_id")
+    created_at: datetime.datetime
+    animal_type: AnimalType
+    sex: Sex
+    breed: str
+    color: str
+    catch_date: datetime.datetime
+    created_by: TgUserID
+    created_by_name: str | None = None
+
+
 class AnimalRecordCreate(AnimalRecordBase, MongoCreate):
     """Модель для создания записи о животном."""
 
@@ -316,3 +408,81 @@ class AnimalRecordUpdate(AnimalRecordBase, MongoUpdate):
         None,
         title="Место отлова",
     )
+
+
+# * ================================================================================================
+# * ================================================================================================
+
+
+class StatDimension(enum.StrEnum):
+    """Разрезы статистики по записям о животных."""
+
+    TOTAL = "total"
+    ANIMAL_TYPE = "animal_type"
+    SEX = "sex"
+    MONTH = "month"
+    CATCHER = "catcher"
+    STERILIZED = "is_sterilized"
+    VACCINATED = "is_vaccinated"
+    OUTCOME = "outcome"
+
+
+class AnimalOutcome(enum.StrEnum):
+    """Чем закончилась история животного."""
+
+    RETURNED = "Выпущено"
+    EUTHANIZED = "Эвтаназия"
+    IN_SHELTER = "В приюте"
+
+
+class StatRead(MongoRead):
+    """
+    Модель для чтения счётчика статистики.
+
+    `_id` это строка `<разрез>:<значение>`, поэтому счётчик увеличивается одним
+    upsert без предварительного поиска.
+    """
+
+    id: str = Field(alias="_id")
+    dimension: StatDimension
+    value: str
+    count: int
+
+
+# * ================================================================================================
+# * ================================================================================================
+
+
+class AnimalTombstoneRead(MongoRead):
+    """
+    Модель для чтения отметки об удалении записи о животном.
+
+    `_id` совпадает с `_id` удалённой записи, `updated_at` это время удаления.
+    """
+
+    pass
+
+
+class ExportWatermarkRead(MongoRead):
+    """
+    Модель для чтения отметки разностной выгрузки.
+
+    Отметка это ключ (`updated_at`, `_id`) последней выгруженной записи и последней
+    отметки об удалении. `_id` это имя получателя выгрузки.
+    """
+
+    id: str = Field(alias="_id")
+    records_at: datetime.datetime | None = None
+    records_id: ObjectId | None = None
+    tombstones_at: datetime.datetime | None = None
+    tombstones_id: ObjectId | None = None
+
+
+class MigrationRead(MongoRead):
+    """
+    Модель для чтения отметки о выполненной разовой миграции данных.
+
+    `_id` это имя миграции, `created_at` это время её выполнения.
+    """
+
+    id: str = Field(alias="_id")
@@ -1,30 +1,117 @@
 import abc
-from typing import Any, AsyncGenerator, Mapping, Sequence, Type
+import datetime
+import enum
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, ClassVar, Iterable, Iterator, Mapping, Sequence, Type
 
-from bson import ObjectId
+import bson
 import pymongo
+from bson import ObjectId
 from loguru import logger
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from pymongo import ReturnDocument
-from pymongo.errors import ConnectionFailure, OperationFailure
-from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+from pydantic import BaseModel
+from pymongo import (
+    DeleteMany,
+    DeleteOne,
+    IndexModel,
+    InsertOne,
+    ReplaceOne,
+    ReturnDocument,
+    UpdateMany,
+    UpdateOne,
+)
+from pymongo.errors import BulkWriteError, ConnectionFailure, CursorNotFound, OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+from pymongo.write_concern import WriteConcern
+
+import settings
+from utils import get_utc_now
 
+from .client import Collection, Database, resolve
 from .models import (
+    AnimalRecordKey,
     AnimalRecordRead,
+    AnimalRecordSummary,
+    AnimalRecordUpdate,
+    AnimalTombstoneRead,
+    ExportWatermarkRead,
     InviteRead,
     InviteUpdate,
+    MigrationRead,
+    MongoBase,
     MongoCreate,
 )
 from .models import MongoRead as _MongoRead
-from .models import (
-    MongoUpdate,
-    TgUserID,
-    UserCreate,
-    UserRead,
-    UserRole,
-)
+from .models import MongoUpdate, StatDimension, StatRead, TgUserID, UserCreate, UserRead, UserRole
 
 MongoDict = Mapping[str, Any]  # * Часть сырого документа Mongo
+WriteOperation = InsertOne | UpdateOne | UpdateMany | ReplaceOne | DeleteOne | DeleteMany
+
+
+class WriteProfile(enum.StrEnum):
+    """Профили гарантий записи."""
+
+    DEFAULT = "default"  # Настройки клиента
+    FAST = "fast"  # Подтверждение от primary без ожидания журнала
+    DURABLE = "durable"  # Подтверждение большинством с записью в журнал
+    UNACKNOWLEDGED = "unacknowledged"  # Без подтверждения, для некритичных данных
+
+
+WRITE_CONCERNS = {
+    WriteProfile.FAST: WriteConcern(w=1, j=False),
+    WriteProfile.DURABLE: WriteConcern(w='majority', j=True),
+    WriteProfile.UNACKNOWLEDGED: WriteConcern(w=0),
+}
+
+
+def _projection(fields: Sequence[str]) -> dict[str, int]:
+    """Проекция Mongo, включающая только указанные поля."""
+    projection = dict.fromkeys(fields, 1)
+    projection.setdefault("_id", 0)
+    return projection
+
+
+def _as_stored(document: MongoDict) -> dict[str, Any]:
+    """
+    Документ в том виде, в котором его вернёт база.
+
+    Даты становятся UTC без часового пояса с точностью до миллисекунд, а кортежи списками,
+    поэтому модель из записанных данных совпадает с моделью, прочитанной из базы.
+    """
+    return bson.decode(bson.encode(document))
+
+
+def _after_key(field: str, value: Any, _id: Any) -> MongoDict:
+    """Фильтр документов строго после ключа (`field`, `_id`) в порядке возрастания."""
+    return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": _id}}]}
+
+
+# Параметры индекса, которые сравниваются с описанием в репозитории
+INDEX_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+
+def _index_drift(spec: MongoDict, info: MongoDict) -> dict[str, tuple[Any, Any]]:
+    """Найти расхождения между описанием индекса и индексом в базе."""
+    drift = {}
+
+    declared_key = list(spec['key'].items())
+    existing_key = [tuple(item) for item in info['key']]
+    if declared_key != existing_key:
+        drift['key'] = (declared_key, existing_key)
+
+    for option in INDEX_OPTIONS:
+        declared, existing = spec.get(option), info.get(option)
+        if option in ('unique', 'sparse'):
+            declared, existing = bool(declared), bool(existing)
+        if declared != existing:
+            drift[option] = (declared, existing)
+
+    return drift
 
 
 class BaseRepository[MongoRead: _MongoRead](abc.ABC):
@@ -33,44 +120,122 @@ class BaseRepository[MongoRead: _MongoRead](abc.ABC):
     # _bulk_limit = 100  # Ограничение на количество документов в bulk-запросах
     collection: str
     read_model: Type[MongoRead]
+    indexes: ClassVar[Sequence[IndexModel]] = ()  # Описание индексов коллекции
+    # Документы в базе пишутся только через модели MongoCreate/MongoUpdate, поэтому при чтении
+    # их можно не валидировать повторно
+    trusted_reads: ClassVar[bool] = settings.db.trusted_reads
 
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: Database):
         """Инициализация репозитория."""
         self.client = db[self.collection]
+        self._writers: dict[WriteProfile, Collection] = {WriteProfile.DEFAULT: self.client}
 
-    @abc.abstractmethod
     async def add_indexes(self) -> None:
-        """Добавление индексов в таблицу."""
-        ...
+        """
+        Приведение индексов в таблице к описанию из `indexes`.
 
-    async def create_one(self, data: MongoCreate) -> MongoRead:
-        """Создать один документ."""
+        Недостающие индексы строятся одним запросом, а расхождения с описанием только
+        логируются: удалять или перестраивать индексы на рабочей базе нужно вручную.
+        """
+        existing = await self.client.index_information()
+        missing = []
+
+        for index in self.indexes:
+            spec = index.document
+            name = spec['name']
+
+            if name not in existing:
+                missing.append(index)
+            elif drift := _index_drift(spec, existing[name]):
+                logger.warning(
+                    f"Индекс {name} в коллекции {self.collection} отличается от описания: "
+                    f"{drift}."
+                )
+            else:
+                logger.info(f"Индекс {name} в коллекции {self.collection} уже существует.")
+
+        declared = {index.document['name'] for index in self.indexes}
+        for name in existing.keys() - declared - {'_id_'}:
+            logger.warning(f"Индекс {name} в коллекции {self.collection} не описан в репозитории.")
+
+        if missing:
+            names = await self.client.create_indexes(missing)
+            logger.success(f"Индексы {names} в коллекции {self.collection} созданы.")
+
+    def to_model[Model: BaseModel](
+        self,
+        document: MongoDict,
+        model: Type[Model] | None = None,
+    ) -> Model:
+        """
+        Преобразовать документ из базы в модель для чтения.
+
+        Доверенные документы собираются в модель без валидации, иначе документ проходит
+        полную валидацию.
+        """
+        model = model or self.read_model
+        if self.trusted_reads and issubclass(model, MongoBase):
+            return model.from_document(document)
+
+        return model.model_validate(document)
+
+    def writer(self, profile: WriteProfile | None = None) -> Collection:
+        """Получить коллекцию с гарантиями записи из профиля."""
+        profile = profile or WriteProfile.DEFAULT
+        if profile not in self._writers:
+            self._writers[profile] = self.client.with_options(write_concern=WRITE_CONCERNS[profile])
+
+        return self._writers[profile]
+
+    async def create_one(
+        self,
+        data: MongoCreate,
+        profile: WriteProfile | None = None,
+        verify: bool = False,
+    ) -> MongoRead:
+        """
+        Создать один документ.
+
+        Модель для чтения собирается из записанных данных без повторного запроса к базе.
+        С `verify=True` документ перечитывается из базы после записи.
+        """
+        document = data.model_dump(exclude_none=True)
         try:
-            response: InsertOneResult = await self.client.insert_one(
-                data.model_dump(exclude_none=True)
-            )
+            response: InsertOneResult = await self.writer(profile).insert_one(document)
         except Exception:
             logger.exception(f"Ошибка при записи {data} в {self.client}")
+            raise
 
-        document = await self.get_one({"_id": response.inserted_id})
-        if document:
-            logger.success(f"Был создан документ {document}.")
-            return document
+        if verify:
+            model = await self.get_one({"_id": response.inserted_id})
+            if model is None:
+                logger.error(
+                    f"Ошибка при получении документа {response.inserted_id} после его создания."
+                )
+                raise OperationFailure("Ошибка при получении документа после его создания.")
         else:
-            logger.error(
-                f"Ошибка при получении документа {response.inserted_id}" f"после его создания."
-            )
-            raise OperationFailure("Ошибка при получении документа после его создания.")
+            document['_id'] = response.inserted_id
+            model = self.to_model(_as_stored(document))
 
-    async def create_bulk(self, data: Sequence[MongoCreate]) -> int:
+        logger.success(f"Был создан документ {response.inserted_id}.")
+        return model
+
+    async def create_bulk(
+        self,
+        data: Sequence[MongoCreate],
+        profile: WriteProfile | None = None,
+        ordered: bool = True,
+    ) -> int:
         """Создать несколько документов."""
         try:
-            response: InsertManyResult = await self.client.insert_many(
-                [document.model_dump(exclude_none=True) for document in data]
+            response: InsertManyResult = await self.writer(profile).insert_many(
+                [document.model_dump(exclude_none=True) for document in data],
+                ordered=ordered,
             )
             logger.success(f"Документы созданы успешно. Количество: {len(response.inserted_ids)}.")
         except Exception:
             logger.exception(f"Ошибка при записи документов в {self.client}")
+            raise
 
         return len(response.inserted_ids)
 
@@ -89,39 +254,132 @@ class BaseRepository[MongoRead: _MongoRead](abc.ABC):
 
         if document:
             logger.success(f"Получен документ {document.get('_id')}.")
-            return self.read_model.model_validate(document)
+            return self.to_model(document)
         else:
             logger.info(f"Документ с параметрами {filter} не был найден")
 
+    async def get_partial[Partial: BaseModel](
+        self,
+        filter: MongoDict,
+        fields: Sequence[str],
+        model: Type[Partial] | None = None,
+    ) -> Partial | MongoDict | None:
+        """
+        Получить только указанные поля одного документа.
+
+        Без `model` возвращается сырой документ, иначе облегчённая модель из `fields`.
+        Поле `_id` возвращается, только если оно указано в `fields`.
+        """
+        try:
+            document = await self.client.find_one(filter, projection=_projection(fields))
+        except Exception:
+            logger.exception(
+                f"Ошибка при получении полей {fields} документа с параметрами {filter} "
+                f"из {self.client}."
+            )
+            raise
+
+        if document is None:
+            logger.info(f"Документ с параметрами {filter} не был найден")
+            return None
+
+        return self.to_model(document, model) if model else document
+
+    async def get_bulk_partial[Partial: BaseModel](
+        self,
+        filter: MongoDict,
+        fields: Sequence[str],
+        model: Type[Partial] | None = None,
+    ) -> AsyncGenerator[Partial | MongoDict, None]:
+        """Получить только указанные поля всех документов, удовлетворяющих фильтрам."""
+        cursor = self.client.find(filter, projection=_projection(fields))
+        async for document in cursor:
+            yield self.to_model(document, model) if model else document
+
     async def get_bulk(self, filter: MongoDict) -> AsyncGenerator[MongoRead, None]:
         """Получить все документы, удовлетворяющие фильтрам."""
+        async for batch in self.get_batches(filter):
+            for document in batch:
+                yield document
+
+    async def get_batches(
+        self,
+        filter: MongoDict,
+        batch_size: int | None = None,
+        sort_field: str | None = None,
+    ) -> AsyncGenerator[list[MongoRead], None]:
+        """
+        Получить все документы, удовлетворяющие фильтрам, пачками по `batch_size`.
+
+        В памяти одновременно находится только одна пачка. Документы идут по возрастанию
+        `_id` (или `sort_field` и `_id`, для него нужен такой индекс): если курсор истёк
+        на сервере, пока потребитель обрабатывал пачку, чтение продолжается с ключа
+        последнего полученного документа без `skip`. Остальные ошибки чтения логируются
+        и пробрасываются: потребитель получает либо все документы, либо исключение.
+        """
+        batch_size = batch_size or settings.db.batch_size
+        sort = [(sort_field, 1), ("_id", 1)] if sort_field else [("_id", 1)]
         counter = 0
+        last = None
+
         try:
-            cursor = self.client.find(filter)
-            async for document in cursor:
-                logger.debug(f"Получен документ {document}")
-                validated_document = self.read_model.model_validate(document)
-                counter += 1
-                yield validated_document
+            while True:
+                query = filter
+                if last is not None and sort_field:
+                    after = _after_key(sort_field, last.get(sort_field), last["_id"])
+                    query = {"$and": [filter, after]}
+                elif last is not None:
+                    query = {"$and": [filter, {"_id": {"$gt": last["_id"]}}]}
+                cursor = self.client.find(query, sort=sort, batch_size=batch_size)
+
+                try:
+                    while batch := await cursor.to_list(length=batch_size):
+                        last = batch[-1]
+                        counter += len(batch)
+                        logger.debug("Получена пачка из {} документов.", len(batch))
+                        yield [self.to_model(document) for document in batch]
+                    break
+
+                except CursorNotFound:
+                    logger.warning(f"Курсор истёк после {counter} документов, продолжаем чтение.")
 
         except ConnectionFailure:
             logger.exception(
-                f"Ошибка при получении документов с параметрами {filter} " f"из {self.client}."
+                f"Ошибка при получении документов с параметрами {filter} из {self.client}. "
+                f"Было получено {counter} документов."
             )
+            raise
 
         except Exception:
             logger.exception(f"Ошибка в работе генератора. Было получено {counter} документов.")
+            raise
 
         logger.info(f"Генератор документов завершил работу. Получено {counter} документов.")
 
+    def get_changed(
+        self,
+        after: tuple[datetime.datetime, ObjectId] | None,
+        until: datetime.datetime,
+    ) -> AsyncGenerator[list[MongoRead], None]:
+        """
+        Получить пачками документы, изменённые после ключа (`updated_at`, `_id`) и раньше
+        `until`, в порядке изменения. Нужен индекс на (`updated_at`, `_id`).
+        """
+        query: MongoDict = {"updated_at": {"$lt": until}}
+        if after is not None:
+            query = {"$and": [query, _after_key("updated_at", *after)]}
+
+        return self.get_batches(query, sort_field="updated_at")
+
     async def update_one(
         self,
         filter: MongoDict,
         data: MongoUpdate,
+        profile: WriteProfile | None = None,
     ) -> MongoRead | None:
         """Обновить один документ."""
         try:
-            document = await self.client.find_one_and_update(
+            document = await self.writer(profile).find_one_and_update(
                 filter,
                 {"$set": data.model_dump(exclude_none=True)},
                 return_document=ReturnDocument.AFTER,
@@ -131,18 +389,24 @@ class BaseRepository[MongoRead: _MongoRead](abc.ABC):
                 f"Ошибка при обновлении документа с параметрами {filter} "
                 f"данными {data} в {self.client}."
             )
+            raise
 
         if document:
             logger.success(f"Документ {document.get('_id')} обновлен.")
             logger.debug(f"Обновлённые данные: {document}")
-            return self.read_model.model_validate(document)
+            return self.to_model(document)
         else:
             logger.warning(f"Документ с параметрами {filter} не был найден.")
 
-    async def update_bulk(self, filter: MongoDict, data: MongoUpdate) -> int:
+    async def update_bulk(
+        self,
+        filter: MongoDict,
+        data: MongoUpdate,
+        profile: WriteProfile | None = None,
+    ) -> int:
         """Обновить несколько документов."""
         try:
-            response: UpdateResult = await self.client.update_many(
+            response: UpdateResult = await self.writer(profile).update_many(
                 filter,
                 {"$set": data.model_dump(exclude_none=True)},
             )
@@ -151,6 +415,7 @@ class BaseRepository[MongoRead: _MongoRead](abc.ABC):
                 f"Ошибка при обновлении документов с параметрами {filter} "
                 f"данными {data} в {self.client}."
             )
+            raise
 
         if response.modified_count > 0:
             logger.success(f"Обновлено {response.modified_count} документов.")
@@ -174,31 +439,150 @@ class BaseRepository[MongoRead: _MongoRead](abc.ABC):
         else:
             logger.info(f"Документ с параметрами {filter} не был найден.")
 
+    async def delete_bulk(self, filter: MongoDict, profile: WriteProfile | None = None) -> int:
+        """Удалить несколько документов."""
+        try:
+            response: DeleteResult = await self.writer(profile).delete_many(filter)
+        except Exception:
+            logger.exception(
+                f"Ошибка при удалении документов с параметрами {filter} в {self.client}."
+            )
+            raise
 
-class UserRepository(BaseRepository):
-    """Репозиторий для работы с пользователями."""
+        if response.deleted_count > 0:
+            logger.success(f"Удалено {response.deleted_count} документов.")
+        else:
+            logger.info(f"Документы с параметрами {filter} не были найдены.")
 
-    collection = "users"
-    read_model = UserRead
+        return response.deleted_count
 
-    async def add_indexes(self) -> None:
+    async def bulk_write(
+        self,
+        operations: Sequence[WriteOperation],
+        ordered: bool = True,
+        profile: WriteProfile | None = None,
+    ) -> "BulkResult":
         """
-        Добавление индексов в таблицу.
+        Выполнить несколько операций записи за один запрос.
 
-        Добавляет уникальные индексы для поля `tg_id`.
+        В упорядоченном режиме выполнение останавливается на первой ошибке, и следующие
+        операции помечаются как пропущенные. В неупорядоченном режиме выполняются все
+        операции, а ошибки возвращаются для каждой из них отдельно.
         """
-        name = f"UQ_{self.collection}_tg_id"
-        indexes = await self.client.index_information()
-        if indexes.get(name) is None:
-            await self.client.create_index(
-                [('tg_id', pymongo.ASCENDING)],
-                unique=True,
-                sparse=True,
-                name=name,
+        if not operations:
+            return BulkResult()
+
+        try:
+            response: BulkWriteResult = await self.writer(profile).bulk_write(
+                list(operations),
+                ordered=ordered,
             )
-            logger.success(f"Индекс tg_id в коллекции {self.collection} создан.")
+        except BulkWriteError as e:
+            details = e.details
+            logger.warning(
+                f"Часть операций в {self.client} завершилась ошибкой: "
+                f"{len(details['writeErrors'])} из {len(operations)}."
+            )
+        except Exception:
+            logger.exception(f"Ошибка при пакетной записи в {self.client}.")
+            raise
         else:
-            logger.info(f"Индекс tg_id в коллекции {self.collection} уже существует.")
+            if not response.acknowledged:
+                logger.info(f"Отправлено {len(operations)} операций без подтверждения.")
+                return BulkResult(
+                    operations=[
+                        BulkOperationResult(index, BulkStatus.UNACKNOWLEDGED)
+                        for index in range(len(operations))
+                    ]
+                )
+            details = response.bulk_api_result
+
+        errors = {error['index']: error['errmsg'] for error in details.get('writeErrors', [])}
+        first_error = min(errors, default=len(operations))
+
+        results = []
+        for index in range(len(operations)):
+            if index in errors:
+                results.append(BulkOperationResult(index, BulkStatus.ERROR, errors[index]))
+            elif ordered and index > first_error:
+                results.append(BulkOperationResult(index, BulkStatus.SKIPPED))
+            else:
+                results.append(BulkOperationResult(index, BulkStatus.OK))
+
+        result = BulkResult(
+            inserted=details.get('nInserted', 0),
+            matched=details.get('nMatched', 0),
+            modified=details.get('nModified', 0),
+            deleted=details.get('nRemoved', 0),
+            upserted=details.get('nUpserted', 0),
+            operations=results,
+        )
+        logger.success(f"Пакетная запись в {self.client.name} выполнена: {result.summary}.")
+
+        return result
+
+
+class BulkStatus(enum.StrEnum):
+    """Статус операции в пакетной записи."""
+
+    OK = "ok"
+    ERROR = "error"
+    SKIPPED = "skipped"  # Не выполнялась из-за ошибки в упорядоченном режиме
+    UNACKNOWLEDGED = "unacknowledged"  # Отправлена без подтверждения
+
+
+@dataclass(slots=True)
+class BulkOperationResult:
+    """Результат одной операции в пакетной записи."""
+
+    index: int
+    status: BulkStatus
+    error: str | None = None
+
+
+@dataclass(slots=True)
+class BulkResult:
+    """Результат пакетной записи."""
+
+    inserted: int = 0
+    matched: int = 0
+    modified: int = 0
+    deleted: int = 0
+    upserted: int = 0
+    operations: list[BulkOperationResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Выполнены ли все операции без ошибок."""
+        return all(operation.status != BulkStatus.ERROR for operation in self.operations)
+
+    @property
+    def summary(self) -> str:
+        """Краткое описание результата для логов."""
+        return (
+            f"добавлено {self.inserted}, найдено {self.matched}, изменено {self.modified}, "
+            f"удалено {self.deleted}, вставлено при обновлении {self.upserted}"
+        )
+
+
+class UserRepository(BaseRepository):
+    """Репозиторий для работы с пользователями."""
+
+    collection = "users"
+    read_model = UserRead
+
+    indexes = (
+        IndexModel(
+            [('tg_id', pymongo.ASCENDING)],
+            unique=True,
+            sparse=True,
+            name=f"UQ_{collection}_tg_id",
+        ),
+        IndexModel(
+            [('role', pymongo.ASCENDING)],
+            name=f"IX_{collection}_role",
+        ),
+    )
 
     async def get_by_tg_id(self, tg_id: TgUserID) -> UserRead | None:
         """Получить пользователя по tg_id."""
@@ -208,11 +592,9 @@ class UserRepository(BaseRepository):
         """Получить список всех админов."""
         return self.get_bulk({"role": UserRole.ADMIN.value})
 
-    async def is_admin(self, tg_id: TgUserID) -> bool:
-        """Проверить, обладает ли пользователь правами админа."""
-        user = await self.get_by_tg_id(tg_id)
-
-        return user is not None and user.role == UserRole.ADMIN
+    async def exists(self, tg_id: TgUserID) -> bool:
+        """Проверить, есть ли пользователь в базе."""
+        return await self.get_partial({"tg_id": tg_id}, ("_id",)) is not None
 
     async def add_admin_access(self, tg_id: TgUserID) -> UserRead:
         """Добавить доступ администратору."""
@@ -227,6 +609,42 @@ class UserRepository(BaseRepository):
 
         await self.update_one({"tg_id": tg_id}, MongoUpdate(role=UserRole.ADMIN.value))
 
+    async def add_animals(self, tg_id: TgUserID, count: int = 1) -> bool:
+        """
+        Увеличить счётчик записей о животных пользователя.
+
+        Счётчик меняется, только если он уже заведён: записи пользователя без счётчика
+        посчитает целиком `logic.backfill_animals_counts`.
+        """
+        try:
+            response: UpdateResult = await self.client.update_one(
+                {"tg_id": tg_id, "animals_count": {"$exists": True}},
+                {"$inc": {"animals_count": count}},
+            )
+        except Exception:
+            logger.exception(f"Ошибка при обновлении счётчика животных пользователя {tg_id}.")
+            raise
+
+        return response.modified_count > 0
+
+    async def init_animals_count(self, tg_id: TgUserID, count: int) -> bool:
+        """
+        Завести счётчик записей о животных пользователя, если его ещё нет.
+
+        Между подсчётом записей и этим вызовом пользователь не должен добавлять записи:
+        их увеличение счётчика не применится, а `count` их не учтёт.
+        """
+        try:
+            response: UpdateResult = await self.client.update_one(
+                {"tg_id": tg_id, "animals_count": {"$exists": False}},
+                {"$set": {"animals_count": count}},
+            )
+        except Exception:
+            logger.exception(f"Ошибка при записи счётчика животных пользователя {tg_id}.")
+            raise
+
+        return response.modified_count > 0
+
 
 class AnimalRecordRepository(BaseRepository):
     """Репозиторий для работы с записями о животных."""
@@ -234,58 +652,302 @@ class AnimalRecordRepository(BaseRepository):
     collection = "animal_records"
     read_model = AnimalRecordRead
 
-    async def add_indexes(self) -> None: ...
+    indexes = (
+        # Пагинация по всем записям
+        IndexModel(
+            [('created_at', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+            name=f"IX_{collection}_created_at__id",
+        ),
+        # Пагинация по записям одного автора
+        IndexModel(
+            [
+                ('created_by', pymongo.ASCENDING),
+                ('created_at', pymongo.ASCENDING),
+                ('_id', pymongo.ASCENDING),
+            ],
+            name=f"IX_{collection}_created_by_created_at__id",
+        ),
+        # Выгрузка за период по дате отлова
+        IndexModel(
+            [('catch_date', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+            name=f"IX_{collection}_catch_date__id",
+        ),
+        # Разностная выгрузка записей, изменённых после отметки
+        IndexModel(
+            [('updated_at', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+            name=f"IX_{collection}_updated_at__id",
+        ),
+        # Поиск по чипу, записи без чипа в индекс не попадают
+        IndexModel(
+            [('chip_id', pymongo.ASCENDING)],
+            partialFilterExpression={'chip_id': {'$type': 'string'}},
+            name=f"IX_{collection}_chip_id",
+        ),
+    )
+
+    def __init__(self, db: Database):
+        super().__init__(db)
+        self.tombstones = AnimalTombstoneRepository(db)
+
+    async def get_unnamed_authors(self) -> list[TgUserID]:
+        """Получить авторов, в записях которых ещё нет имени автора."""
+        return await self.client.distinct("created_by", {"created_by_name": None})
+
+    # Удаления оставляют отметки для разностной выгрузки. Отметки пишутся до удаления:
+    # если удаление не дойдёт, выгрузка сообщит об удалении живой записи, и её следующее
+    # изменение вернёт запись получателю, а удаление без отметки потерялось бы навсегда
+
+    async def delete_one(self, filter: MongoDict) -> MongoDict | None:
+        """Удалить одну запись о животном, оставив отметку об удалении."""
+        document = await self.get_partial(filter, ("_id",))
+        if document is None:
+            logger.info(f"Документ с параметрами {filter} не был найден.")
+            return None
+
+        await self.tombstones.add(document["_id"])
+        return await super().delete_one({"_id": document["_id"]})
+
+    async def delete_bulk(self, filter: MongoDict, profile: WriteProfile | None = None) -> int:
+        """Удалить записи о животных, оставив отметки об удалении."""
+        record_ids = [document["_id"] async for document in self.get_bulk_partial(filter, ("_id",))]
+        if not record_ids:
+            logger.info(f"Документы с параметрами {filter} не были найдены.")
+            return 0
+
+        await self.tombstones.add_many(record_ids)
+        return await super().delete_bulk({"_id": {"$in": record_ids}}, profile)
+
+    async def count_by_author(self, tg_id: TgUserID) -> int:
+        """Посчитать записи автора. Идёт по индексу на `created_by`."""
+        return await self.client.count_documents({"created_by": tg_id})
+
+    async def set_author_name(self, tg_id: TgUserID, name: str) -> int:
+        """Переписать имя автора во всех его записях."""
+        return await self.update_bulk(
+            {"created_by": tg_id, "created_by_name": {"$ne": name}},
+            AnimalRecordUpdate(created_by_name=name),
+        )
 
-    async def get_3_animals(
+    async def get_page(
+        self,
+        filter: MongoDict,
+        key: tuple[datetime.datetime, ObjectId] | None = None,
+        backward: bool = False,
+        inclusive: bool = False,
+        size: int = 10,
+    ) -> "AnimalPage":
+        """
+        Получает страницу из `size` записей для списка.
+
+        Страница начинается сразу после ключа (`created_at`, `_id`) записи с края соседней
+        страницы (или с самой записи при `inclusive`), а с `backward=True` заканчивается
+        перед ним. Это один запрос по индексу без `skip`, и достаются только поля
+        для строки списка. Берётся на одну запись больше, чтобы знать, есть ли следующая
+        страница.
+        """
+        operator, direction = ("$lt", -1) if backward else ("$gt", 1)
+        query = filter
+        if key is not None:
+            created_at, _id = key
+            id_operator = f"{operator}e" if inclusive else operator
+            query = {
+                "$and": [
+                    filter,
+                    {
+                        "$or": [
+                            {"created_at": {operator: created_at}},
+                            {"created_at": created_at, "_id": {id_operator: _id}},
+                        ]
+                    },
+                ]
+            }
+
+        try:
+            cursor = self.client.find(
+                query,
+                projection=_projection(SUMMARY_FIELDS),
+                sort=[("created_at", direction), ("_id", direction)],
+                limit=size + 1,
+            )
+            documents = await cursor.to_list(length=size + 1)
+        except Exception:
+            logger.exception(f"Ошибка при получении страницы записей с параметрами {query}.")
+            raise
+
+        records = [self.to_model(doc, AnimalRecordSummary) for doc in documents[:size]]
+        more = len(documents) > size
+        if backward:
+            records.reverse()
+
+        # За ключом есть соседняя страница: хотя бы запись с ключом, а при `inclusive`
+        # записи обычно тоже есть, и пустая соседняя страница лишь сообщит об их конце
+        beyond_key = key is not None
+        return AnimalPage(
+            records=records,
+            has_before=more if backward else beyond_key,
+            has_after=beyond_key if backward else more,
+        )
+
+    async def get_window(
         self,
         filter: MongoDict,
         sort_field: str,
         target_id: str | None = None,
-    ) -> dict[str, AnimalRecordRead | None]:
-        """Получает данные товара для пагинации из MongoDB."""
+        size: int = 10,
+        keys_only: bool = False,
+    ) -> "AnimalWindow":
+        """
+        Получает окно из `size` записей до и после целевой.
+
+        Пагинация идёт по составному ключу (`sort_field`, `_id`), поэтому записи с одинаковым
+        значением поля сортировки не теряются. Целевой документ и окно вокруг него достаются
+        одной агрегацией: соседи подтягиваются через `$lookup` по той же коллекции. Из каждой
+        стороны берётся на одну запись больше, чтобы знать, есть ли записи за краем окна.
+
+        С `keys_only=True` для соседних записей достаются только `_id`.
+        """
         if target_id:
-            target_model = await self.get_one({"_id": ObjectId(target_id)})
-            if not target_model:
-                logger.error(f"Ошибка при получении документа {target_id}")
-                raise OperationFailure("Ошибка при получении документа.")
+            # Фильтр проверяется и у целевой записи, иначе через подделанный коллбек можно
+            # открыть чужую запись в личном списке
+            pipeline = [{"$match": {**filter, "_id": ObjectId(target_id)}}]
         else:
             # Если ID не указан, ищем самый первый товар по сортировке
-            cursor = self.client.find(filter).sort(sort_field, 1).limit(1)
-            target_data = await cursor.to_list(length=1)
-            if not target_data:
-                logger.error("Ошибка при получении документа с заданными параметрами")
-                raise OperationFailure("Ошибка при получении документа.")
-            target_model = AnimalRecordRead.model_validate(target_data[0])
-
-        prev_cursor = (
-            self.client.find(
-                {**filter, sort_field: {"$lt": target_model.model_dump(include={sort_field})[sort_field]}}
-            )
-            .sort(sort_field, -1)
-            .limit(1)
-        )
-        prev_data = await prev_cursor.to_list(length=1)
-        prev_model = AnimalRecordRead.model_validate(prev_data[0]) if prev_data else None
+            pipeline = [{"$match": filter}, {"$sort": {sort_field: 1, "_id": 1}}, {"$limit": 1}]
 
-        next_cursor = (
-            self.client.find(
-                {**filter, sort_field: {'$gt': target_model.model_dump(include={sort_field})[sort_field]}}
-            )
-            .sort(sort_field, 1)
-            .limit(1)
-        )
-        next_data = await next_cursor.to_list(length=1)
-        next_model = AnimalRecordRead.model_validate(next_data[0]) if next_data else None
+        projection = ("_id",) if keys_only else None
+        pipeline += [
+            self._neighbours_lookup('before', filter, sort_field, "$lt", -1, size + 1, projection),
+            self._neighbours_lookup('after', filter, sort_field, "$gt", 1, size + 1, projection),
+        ]
+
+        cursor = await resolve(self.client.aggregate(pipeline))
+        documents = await cursor.to_list(length=1)
+        if not documents:
+            logger.warning("Документ с заданными параметрами не найден.")
+            return AnimalWindow(filter=filter, records=[], has_before=False, has_after=False)
 
-        logger.success(
-            f"Документы получены успешно. Количество: "
-            f"{bool(prev_model) + bool(target_model) + bool(next_model)}."
+        target = documents[0]
+        before = target.pop('before')
+        after = target.pop('after')
+
+        neighbour_model = AnimalRecordKey if keys_only else AnimalRecordRead
+        records = [
+            *(self.to_model(doc, neighbour_model) for doc in reversed(before[:size])),
+            self.to_model(target),
+            *(self.to_model(doc, neighbour_model) for doc in after[:size]),
+        ]
+
+        logger.success(f"Документы получены успешно. Количество: {len(records)}.")
+
+        return AnimalWindow(
+            filter=filter,
+            records=records,
+            has_before=len(before) > size,
+            has_after=len(after) > size,
         )
 
+    def _neighbours_lookup(
+        self,
+        name: str,
+        filter: MongoDict,
+        sort_field: str,
+        operator: str,
+        direction: int,
+        limit: int,
+        fields: Sequence[str] | None = None,
+    ) -> MongoDict:
+        """
+        Стадия `$lookup`, добавляющая в документ ближайших соседей по ключу сортировки.
+
+        Диапазон по полю сортировки задан отдельным `$expr` с одним сравнением: такое
+        условие планировщик переводит в границы индекса (`sort_field`, `_id`), а `$or`
+        внутри `$expr` нет. Записи с тем же значением поля, но по другую сторону `_id`,
+        отсеиваются следующим `$match` уже внутри этих границ.
+        """
+        projection = [{"$project": _projection(fields)}] if fields else []
+        bound = {"$lt": "$lte", "$gt": "$gte"}[operator]
+
         return {
-            'prev': prev_model,
-            'target': target_model,
-            'next': next_model,
+            "$lookup": {
+                "from": self.collection,
+                "let": {"key": f"${sort_field}", "id": "$_id"},
+                "pipeline": [
+                    {"$match": filter},
+                    {"$match": {"$expr": {bound: [f"${sort_field}", "$$key"]}}},
+                    {
+                        "$match": {
+                            "$expr": {
+                                "$or": [
+                                    {"$ne": [f"${sort_field}", "$$key"]},
+                                    {operator: ["$_id", "$$id"]},
+                                ]
+                            }
+                        }
+                    },
+                    {"$sort": {sort_field: direction, "_id": direction}},
+                    {"$limit": limit},
+                    *projection,
+                ],
+                "as": name,
+            }
+        }
+
+
+# Поля записи, которые нужны для строки в списке
+SUMMARY_FIELDS = tuple(
+    field.alias or name for name, field in AnimalRecordSummary.model_fields.items()
+)
+
+
+@dataclass(slots=True)
+class AnimalPage:
+    """Страница списка записей о животных, отсортированная по (`created_at`, `_id`)."""
+
+    records: list[AnimalRecordSummary]
+    has_before: bool  # Есть ли предыдущая страница
+    has_after: bool  # Есть ли следующая страница
+
+
+@dataclass(slots=True)
+class AnimalWindow:
+    """Окно записей о животных, отсортированное по ключу пагинации."""
+
+    filter: MongoDict
+    records: list[AnimalRecordRead | AnimalRecordKey]
+    has_before: bool  # Есть ли записи до первой записи окна
+    has_after: bool  # Есть ли записи после последней записи окна
+
+    def around(
+        self,
+        record_id: str | None,
+    ) -> dict[str, AnimalRecordRead | AnimalRecordKey | None] | None:
+        """
+        Получить запись и её соседей без обращения к базе.
+
+        Без `record_id` берётся первая запись. Возвращает `None`, если записи нет в окне
+        или её сосед находится за краем окна.
+        """
+        if not self.records:
+            return None
+
+        if record_id is None:
+            if self.has_before:
+                return None
+            index = 0
+        else:
+            for index, record in enumerate(self.records):
+                if str(record.id) == record_id:
+                    break
+            else:
+                return None
+
+        if (index == 0 and self.has_before) or (index == len(self.records) - 1 and self.has_after):
+            return None
+
+        return {
+            'prev': self.records[index - 1] if index > 0 else None,
+            'target': self.records[index],
+            'next': self.records[index + 1] if index < len(self.records) - 1 else None,
         }
 
 
@@ -295,25 +957,274 @@ class InviteRepository(BaseRepository):
     collection = "invites"
     read_model = InviteRead
 
-    async def add_indexes(self) -> None:
+    indexes = (
+        IndexModel(
+            [('password', pymongo.ASCENDING)],
+            unique=True,
+            sparse=True,
+            name=f"UQ_{collection}_password",
+        ),
+        # Mongo сама удаляет приглашения после наступления `expires_at`
+        IndexModel(
+            [('expires_at', pymongo.ASCENDING)],
+            expireAfterSeconds=0,
+            name=f"TTL_{collection}_expires_at",
+        ),
+    )
+
+    async def expire(self, password: str) -> InviteRead | None:
+        """Пометить приглашение, как истёкшее."""
+        return await self.update_one({"password": password}, InviteUpdate())
+
+    async def redeem(self, password: str) -> InviteRead | None:
         """
-        Добавление индексов в таблицу.
+        Погасить действующее приглашение.
 
-        Добавляет уникальные индексы для поля `password`.
+        Проверка и пометка приглашения выполняются одним `find_one_and_update`, поэтому
+        одно приглашение не может быть использовано дважды. Условие на `expires_at` нужно,
+        так как Mongo удаляет истёкшие документы не сразу, а раз в минуту. Приглашения
+        без `expires_at`, созданные до его появления, считаются действующими.
         """
-        name = f"UQ_{self.collection}_password"
-        indexes = await self.client.index_information()
-        if indexes.get(name) is None:
-            await self.client.create_index(
-                [('password', pymongo.ASCENDING)],
-                unique=True,
-                sparse=True,
-                name=name,
+        try:
+            document = await self.client.find_one_and_update(
+                {
+                    "password": password,
+                    "is_expired": False,
+                    "expires_at": {"$not": {"$lte": get_utc_now()}},
+                },
+                {"$set": InviteUpdate().model_dump(exclude_none=True)},
+                return_document=ReturnDocument.BEFORE,
             )
-            logger.success(f"Индекс password в коллекции {self.collection} создан.")
-        else:
-            logger.info(f"Индекс password в коллекции {self.collection} уже существует.")
+        except Exception:
+            logger.exception(f"Ошибка при погашении приглашения в {self.client}.")
+            raise
 
-    async def expire(self, password: str) -> InviteRead | None:
-        """Пометить приглашение, как истёкшее."""
-        return await self.update_one({"password": password}, InviteUpdate())
+        if document is None:
+            logger.info("Действующее приглашение не найдено.")
+            return None
+
+        logger.success(f"Приглашение {document['_id']} погашено.")
+        return self.to_model(document)
+
+
+class AnimalTombstoneRepository(BaseRepository):
+    """
+    Репозиторий для отметок об удалении записей о животных.
+
+    Разностная выгрузка передаёт их получателям, чтобы те удалили записи у себя.
+    Отметки не удаляются: получатель может забирать выгрузку сколь угодно редко.
+    """
+
+    collection = "animal_tombstones"
+    read_model = AnimalTombstoneRead
+
+    indexes = (
+        IndexModel(
+            [('updated_at', pymongo.ASCENDING), ('_id', pymongo.ASCENDING)],
+            name=f"IX_{collection}_updated_at__id",
+        ),
+    )
+
+    async def add(self, record_id: ObjectId) -> None:
+        """Отметить запись удалённой. Повторная отметка сдвигает время удаления."""
+        now = get_utc_now()
+        try:
+            await self.client.update_one(
+                {"_id": record_id},
+                {"$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
+        except Exception:
+            logger.exception(f"Ошибка при отметке удаления записи {record_id}.")
+            raise
+
+    async def add_many(self, record_ids: Sequence[ObjectId]) -> None:
+        """Отметить записи удалёнными одним пакетом."""
+        now = get_utc_now()
+        result = await self.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": record_id},
+                    {"$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}},
+                    upsert=True,
+                )
+                for record_id in record_ids
+            ]
+        )
+        if not result.ok:
+            raise OperationFailure(f"Отметки об удалении записаны не все: {result.summary}")
+
+
+class ExportWatermarkRepository(BaseRepository):
+    """Репозиторий для отметок разностной выгрузки, по одной на получателя."""
+
+    collection = "export_watermarks"
+    read_model = ExportWatermarkRead
+
+    async def get(self, consumer: str) -> ExportWatermarkRead | None:
+        """Получить отметку получателя."""
+        return await self.get_one({"_id": consumer})
+
+    async def commit(
+        self,
+        consumer: str,
+        records: tuple[datetime.datetime, ObjectId] | None,
+        tombstones: tuple[datetime.datetime, ObjectId] | None,
+    ) -> None:
+        """Сдвинуть отметку получателя на ключи последних выгруженных документов."""
+        now = get_utc_now()
+        fields: dict[str, Any] = {"updated_at": now}
+        if records is not None:
+            fields["records_at"], fields["records_id"] = records
+        if tombstones is not None:
+            fields["tombstones_at"], fields["tombstones_id"] = tombstones
+
+        try:
+            await self.client.update_one(
+                {"_id": consumer},
+                {"$set": fields, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
+        except Exception:
+            logger.exception(f"Ошибка при сохранении отметки выгрузки {consumer}.")
+            raise
+
+        logger.success(f"Отметка выгрузки {consumer} сдвинута: {fields}.")
+
+
+class MigrationRepository(BaseRepository):
+    """Репозиторий для отметок о выполненных разовых миграциях данных."""
+
+    collection = "migrations"
+    read_model = MigrationRead
+
+    async def is_applied(self, name: str) -> bool:
+        """Проверить, выполнена ли миграция."""
+        return await self.get_one({"_id": name}) is not None
+
+    async def mark_applied(self, name: str) -> None:
+        """Отметить миграцию выполненной."""
+        now = get_utc_now()
+        try:
+            await self.client.update_one(
+                {"_id": name},
+                {"$set": {"updated_at": now}, "$setOnInsert": {"created_at": now}},
+                upsert=True,
+            )
+        except Exception:
+            logger.exception(f"Ошибка при отметке миграции {name}.")
+            raise
+
+        logger.success(f"Миграция {name} отмечена выполненной.")
+
+
+type StatKey = tuple[StatDimension, str]
+
+
+class StatsRepository(BaseRepository):
+    """
+    Репозиторий для счётчиков статистики по записям о животных.
+
+    Счётчики поддерживаются при каждой записи, поэтому статистика читается
+    из пары сотен маленьких документов, а не считается по всем записям.
+    """
+
+    collection = "stats"
+    read_model = StatRead
+
+    @staticmethod
+    def _id(key: StatKey) -> str:
+        dimension, value = key
+        return f"{dimension}:{value}"
+
+    async def get_all(self) -> list[StatRead]:
+        """Получить все счётчики."""
+        return [stat async for stat in self.get_bulk({})]
+
+    async def add(self, keys: Iterable[StatKey], count: int = 1) -> "BulkResult":
+        """Увеличить счётчики на `count` одним пакетом upsert."""
+        now = get_utc_now()
+        return await self.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": self._id(key)},
+                    {
+                        "$inc": {"count": count},
+                        "$set": {"updated_at": now},
+                        "$setOnInsert": {
+                            "dimension": key[0],
+                            "value": key[1],
+                            "created_at": now,
+                        },
+                    },
+                    upsert=True,
+                )
+                for key in keys
+            ],
+            ordered=False,
+        )
+
+    async def replace_all(self, counts: Mapping[StatKey, int]) -> "BulkResult":
+        """Заменить все счётчики новыми значениями и удалить те, которых в них нет."""
+        now = get_utc_now()
+        operations: list[WriteOperation] = [
+            ReplaceOne(
+                {"_id": self._id(key)},
+                {
+                    "dimension": key[0],
+                    "value": key[1],
+                    "count": count,
+                    "created_at": now,
+                    "updated_at": now,
+                },
+                upsert=True,
+            )
+            for key, count in counts.items()
+        ]
+        operations.append(DeleteMany({"_id": {"$nin": [self._id(key) for key in counts]}}))
+
+        return await self.bulk_write(operations)
+
+
+@dataclass(frozen=True, slots=True)
+class Repositories:
+    """
+    Набор репозиториев приложения.
+
+    Создаётся один раз при запуске и передаётся в хендлеры через `RepositoryMiddleware`
+    как `data["repos"]`.
+    """
+
+    users: UserRepository
+    invites: InviteRepository
+    animals: AnimalRecordRepository
+    stats: StatsRepository
+    tombstones: AnimalTombstoneRepository
+    watermarks: ExportWatermarkRepository
+    migrations: MigrationRepository
+
+    @classmethod
+    def from_db(cls, db: Database) -> "Repositories":
+        """Создать репозитории поверх базы данных."""
+        return cls(
+            users=UserRepository(db),
+            invites=InviteRepository(db),
+            animals=AnimalRecordRepository(db),
+            stats=StatsRepository(db),
+            tombstones=AnimalTombstoneRepository(db),
+            watermarks=ExportWatermarkRepository(db),
+            migrations=MigrationRepository(db),
+        )
+
+    def __iter__(self) -> Iterator[BaseRepository]:
+        return iter(
+            (
+                self.users,
+                self.invites,
+                self.animals,
+                self.stats,
+                self.tombstones,
+                self.watermarks,
+                self.migrations,
+            )
+        )
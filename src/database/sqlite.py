@@ -0,0 +1,640 @@
+import asyncio
+import datetime
+import itertools
+import sqlite3
+import struct
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import bson
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from .engine import (
+    DUPLICATE_KEY,
+    MISSING,
+    Document,
+    compile_expression,
+    get_path,
+    is_operator,
+    sort_items,
+    sort_key,
+)
+from .memory import CollectionState, MemoryClient, MemoryCollection, MemoryDatabase
+
+# --- Кодирование значений ---
+#
+# Значения индексируемых полей хранятся в отдельных столбцах так, что порядок байтов
+# совпадает с порядком BSON: первый байт задаёт тип, остальные сравниваются побайтово.
+# Документы и массивы в столбцы не раскладываются и помечаются байтом OPAQUE: такие
+# документы SQLite только отбирает, а проверяет их уже движок из `engine`.
+
+ABSENT = b'\x00'
+NULL = b'\x01'
+NUMBER = 0x02
+STRING = 0x03
+BINARY = 0x06
+OBJECT_ID = 0x07
+BOOLEAN = 0x08
+DATE = 0x09
+OPAQUE = b'\xff'
+
+_SIGN = 1 << 63
+_MASK = (1 << 64) - 1
+_MAX_SAFE_INTEGER = 1 << 53  # Целые больше этого не переводятся в double без потерь
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+_SQL_COMPARISONS = {'$eq': '=', '$ne': '<>', '$lt': '<', '$lte': '<=', '$gt': '>', '$gte': '>='}
+_FLIPPED = {'$eq': '$eq', '$ne': '$ne', '$lt': '$gt', '$lte': '$gte', '$gt': '$lt', '$gte': '$lte'}
+
+
+def encode(value: Any) -> bytes | None:
+    """
+    Значение поля в виде, сохраняющем порядок BSON.
+
+    Возвращает `None` для значений, которые нельзя сравнивать побайтово: документов,
+    массивов, регулярных выражений и слишком больших целых.
+    """
+    if value is MISSING:
+        return ABSENT
+    if value is None:
+        return NULL
+
+    match value:
+        case bool():
+            return bytes((BOOLEAN, value))
+        case int() | float():
+            return _encode_number(value)
+        case str():
+            return bytes((STRING,)) + value.encode()
+        case bytes():
+            return bytes((BINARY,)) + value
+        case bson.ObjectId():
+            return bytes((OBJECT_ID,)) + value.binary
+        case datetime.datetime():
+            return _encode_date(value)
+
+    return None
+
+
+def _encode_number(value: int | float) -> bytes | None:
+    if isinstance(value, int) and abs(value) > _MAX_SAFE_INTEGER:
+        return None
+
+    number = float(value)
+    if number != number:  # NaN
+        return None
+
+    (bits,) = struct.unpack('>Q', struct.pack('>d', number + 0.0))  # -0.0 -> 0.0
+    bits = bits ^ _MASK if bits & _SIGN else bits | _SIGN
+    return bytes((NUMBER,)) + bits.to_bytes(8, 'big')
+
+
+def _encode_date(value: datetime.datetime) -> bytes:
+    value = sort_key(value)[1]  # UTC без часового пояса, с точностью до миллисекунд
+    milliseconds = (value - _EPOCH) // datetime.timedelta(milliseconds=1)
+    return bytes((DATE,)) + ((milliseconds + _SIGN) & _MASK).to_bytes(8, 'big')
+
+
+def _column_value(document: Mapping, path: str) -> bytes:
+    return encode(get_path(document, path)) or OPAQUE
+
+
+def _key(_id: Any) -> bytes:
+    """Первичный ключ документа: закодированный `_id` или сам `_id` в BSON."""
+    return encode(_id) or OPAQUE + bson.encode({'_id': _id})
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+# --- Перевод фильтров в SQL ---
+
+# Условие WHERE, его параметры и признак того, что оно отбирает ровно те документы,
+# которые подходят под фильтр (а не больше)
+Clause = tuple[str, list[Any], bool]
+
+_ANYTHING: Clause = ('1', [], True)
+
+
+def _all_of(clauses: list[Clause | None]) -> Clause:
+    known = [clause for clause in clauses if clause is not None]
+    exact = len(known) == len(clauses) and all(clause[2] for clause in known)
+    if not known:
+        return ('1', [], exact)
+
+    return (
+        ' AND '.join(f"({sql})" for sql, _, _ in known),
+        [parameter for _, parameters, _ in known for parameter in parameters],
+        exact,
+    )
+
+
+def _any_of(clauses: list[Clause | None]) -> Clause | None:
+    if not clauses or any(clause is None for clause in clauses):
+        return None
+
+    return (
+        ' OR '.join(f"({sql})" for sql, _, _ in clauses),
+        [parameter for _, parameters, _ in clauses for parameter in parameters],
+        all(clause[2] for clause in clauses),
+    )
+
+
+def _field_reference(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith('$') and not value.startswith('$$')
+
+
+class _SqliteState(CollectionState):
+    """Состояние коллекции в SQLite: описание таблицы, загружаемое при первом обращении."""
+
+    def __init__(self):
+        super().__init__()
+        self.opened = False
+        self.columns: dict[str, str] = {}  # Поле -> столбец с его значением
+        self.opaque: Counter[str] = Counter()  # Поле -> число документов с OPAQUE
+
+
+class SqliteCollection(MemoryCollection):
+    """
+    Коллекция MongoDB в таблице SQLite.
+
+    Документы хранятся в BSON, а поля из индексов дополнительно раскладываются в
+    отдельные столбцы с индексами SQLite. Фильтры, сортировка и лимит по этим полям
+    выполняются в SQL, всё остальное (проекции, обновления, агрегация) делает движок
+    из `engine` над прочитанными документами. Уникальные ключи и истёкшие по TTL
+    документы тоже ищутся по столбцам индексов.
+
+    Все операции выполняются в единственном потоке клиента, каждая в своей транзакции.
+    Курсор читает первую пачку в транзакции запроса, а следующие из того же запроса SQLite
+    уже вне её, поэтому документы большой выборки не загружаются в память все сразу.
+    """
+
+    def __init__(self, database: "SqliteDatabase", name: str, *args: Any, **kwargs: Any):
+        super().__init__(database, name, *args, **kwargs)
+        if not isinstance(self._state, _SqliteState):
+            self._state = _SqliteState()
+        self.table = _quote(self.full_name)
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        return self.database.client.connection
+
+    async def _run[T](self, function: Callable[..., T], *args: Any) -> T:
+        return await self.database.client.execute(self._transaction, function, *args)
+
+    async def _fetch(self, results: Iterator[Document], length: int | None) -> list[Document]:
+        return await self.database.client.execute(lambda: list(itertools.islice(results, length)))
+
+    def _transaction[T](self, function: Callable[..., T], *args: Any) -> T:
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._open()
+            result = function(*args)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            # Описание таблицы в памяти могло разойтись с откатанной транзакцией
+            self._state.opened = False
+            raise
+
+        connection.execute('COMMIT')
+        return result
+
+    def _open(self) -> None:
+        """Создать таблицу, если её нет, и прочитать описание индексов."""
+        if self._state.opened:
+            return
+
+        connection = self._connection
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} '
+            f'("f._id" BLOB PRIMARY KEY, document BLOB NOT NULL) WITHOUT ROWID'
+        )
+
+        state = self._state
+        state.indexes = {
+            name: bson.decode(spec)
+            for name, spec in connection.execute(
+                'SELECT name, spec FROM _indexes WHERE namespace = ? ORDER BY rowid',
+                (self.full_name,),
+            )
+        }
+        state.columns = {
+            name.removeprefix('f.'): _quote(name)
+            for _, name, *_ in connection.execute(f'PRAGMA table_info({self.table})')
+            if name.startswith('f.')
+        }
+        state.opaque = Counter(
+            {
+                path: connection.execute(
+                    f'SELECT count(*) FROM {self.table} WHERE {column} >= ?', (OPAQUE,)
+                ).fetchone()[0]
+                for path, column in state.columns.items()
+            }
+        )
+        state.opened = True
+
+    def _decode(self, rows: Iterable[tuple[bytes]]) -> list[Document]:
+        return [bson.decode(document) for document, in rows]
+
+    # --- Примитивы хранения ---
+
+    # Через `$lookup` к коллекции обращаются и из транзакций других коллекций,
+    # поэтому чтения сами открывают таблицу
+
+    def _all(self) -> list[Document]:
+        self._open()
+        self._purge_expired()
+        return self._decode(self._connection.execute(f'SELECT document FROM {self.table}'))
+
+    def _get(self, _id: Any) -> Document | None:
+        self._open()
+        rows = self._decode(
+            self._connection.execute(
+                f'SELECT document FROM {self.table} WHERE "f._id" = ?', (_key(_id),)
+            )
+        )
+        return rows[0] if rows else None
+
+    def _scan(
+        self,
+        filter: Mapping | None,
+        sort: Any = None,
+        limit: int | None = None,
+        variables: Mapping | None = None,
+    ) -> Iterator[Document]:
+        self._open()
+        self._purge_expired()
+        where, parameters, exact = self._where(filter or {}, variables or {})
+        sql = f'SELECT document FROM {self.table} WHERE {where}'
+
+        # Лишние документы порядок не нарушат, а вот лимит без точного фильтра отсёк бы нужные
+        order = self._order_by(sort) if sort else None
+        if order:
+            sql += order
+            if limit and exact:
+                sql += ' LIMIT ?'
+                parameters = [*parameters, limit]
+
+        rows = self._connection.execute(sql, parameters)
+        return (bson.decode(document) for document, in rows)
+
+    def _ordered(self, sort: Any) -> bool:
+        return bool(self._order_by(sort))
+
+    def _put(self, document: Document, previous: Document | None = None) -> None:
+        self._check_unique(document, previous)
+        columns = ['document', *self._state.columns.values()]
+        values = [bson.encode(document), *self._row(document)]
+        self._connection.execute(
+            f'INSERT OR REPLACE INTO {self.table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join("?" * len(columns))})',
+            values,
+        )
+        if previous is not None:
+            self._count_opaque(previous, -1)
+        self._count_opaque(document, 1)
+
+    def _remove(self, document: Document) -> None:
+        self._connection.execute(
+            f'DELETE FROM {self.table} WHERE "f._id" = ?', (_key(document['_id']),)
+        )
+        self._count_opaque(document, -1)
+
+    def _clear(self) -> None:
+        self._connection.execute(f'DROP TABLE IF EXISTS {self.table}')
+        self._connection.execute('DELETE FROM _indexes WHERE namespace = ?', (self.full_name,))
+        self._state.opened = False
+
+    def _row(self, document: Mapping) -> list[bytes]:
+        return [
+            _key(document['_id']) if path == '_id' else _column_value(document, path)
+            for path in self._state.columns
+        ]
+
+    def _count_opaque(self, document: Mapping, sign: int) -> None:
+        for path, value in zip(self._state.columns, self._row(document)):
+            if value.startswith(OPAQUE):
+                self._state.opaque[path] += sign
+
+    # --- Индексы ---
+
+    def _check_unique(self, document: Document, previous: Document | None = None) -> None:
+        if previous is None and self._get(document['_id']) is not None:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_ "
+                f"dup key: {{ _id: {document['_id']!r} }}",
+                code=DUPLICATE_KEY,
+            )
+
+        for name, spec in self._state.indexes.items():
+            if not spec.get('unique'):
+                continue
+            index_key = self._index_key(spec, document)
+            if index_key is None:
+                continue
+
+            # Отбираем кандидатов по столбцам, а совпадение ключа проверяем как в Mongo
+            conditions, parameters = ['"f._id" <> ?'], [_key(document['_id'])]
+            for path in spec['key']:
+                value = encode(get_path(document, path))
+                if value is None:
+                    conditions.append(f'{self._state.columns[path]} >= ?')
+                    parameters.append(OPAQUE)
+                else:
+                    conditions.append(f'{self._state.columns[path]} = ?')
+                    parameters.append(value)
+
+            candidates = self._decode(
+                self._connection.execute(
+                    f'SELECT document FROM {self.table} WHERE {" AND ".join(conditions)}',
+                    parameters,
+                )
+            )
+            if any(self._index_key(spec, candidate) == index_key for candidate in candidates):
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} index: {name}",
+                    code=DUPLICATE_KEY,
+                )
+
+    def _build_index(self, spec: Document) -> None:
+        connection = self._connection
+        for path in spec['key']:
+            if path not in self._state.columns:
+                self._add_column(path)
+
+        if spec.get('unique'):
+            self._unique_entries(spec)
+
+        columns = ', '.join(
+            f"{self._state.columns[path]} {'DESC' if order == -1 else 'ASC'}"
+            for path, order in spec['key'].items()
+        )
+        connection.execute(
+            f'CREATE INDEX IF NOT EXISTS {_quote(f"{self.full_name}.{spec["name"]}")} '
+            f'ON {self.table} ({columns})'
+        )
+        connection.execute(
+            'INSERT OR REPLACE INTO _indexes (namespace, name, spec) VALUES (?, ?, ?)',
+            (self.full_name, spec['name'], bson.encode(spec)),
+        )
+        self._state.indexes[spec['name']] = spec
+
+    def _add_column(self, path: str) -> None:
+        """Добавить столбец для поля и заполнить его по уже записанным документам."""
+        column = _quote(f"f.{path}")
+        connection = self._connection
+        connection.execute(f'ALTER TABLE {self.table} ADD COLUMN {column} BLOB')
+
+        opaque = 0
+        for document in self._all():
+            value = _column_value(document, path)
+            opaque += value.startswith(OPAQUE)
+            connection.execute(
+                f'UPDATE {self.table} SET {column} = ? WHERE "f._id" = ?',
+                (value, _key(document['_id'])),
+            )
+
+        self._state.columns[path] = column
+        self._state.opaque[path] = opaque
+
+    def _expired(self, path: str, deadline: datetime.datetime) -> list[Document]:
+        return self._decode(
+            self._connection.execute(
+                f'SELECT document FROM {self.table} '
+                f'WHERE {self._state.columns[path]} BETWEEN ? AND ?',
+                (bytes((DATE,)), _encode_date(deadline)),
+            )
+        )
+
+    # --- Перевод запросов в SQL ---
+
+    def _where(self, filter: Mapping, variables: Mapping) -> Clause:
+        """Условие WHERE, отбирающее документы под фильтр или их надмножество."""
+        clauses = []
+        for key, condition in filter.items():
+            match key:
+                case '$and':
+                    clauses.append(_all_of([self._where(item, variables) for item in condition]))
+                case '$or':
+                    clauses.append(_any_of([self._where(item, variables) for item in condition]))
+                case '$expr':
+                    clauses.append(self._expression(condition, variables))
+                case _ if key.startswith('$'):
+                    clauses.append(None)
+                case _:
+                    clauses.append(self._field(key, condition))
+
+        return _all_of(clauses)
+
+    def _field(self, path: str, condition: Any) -> Clause | None:
+        column = self._state.columns.get(path)
+        if column is None:
+            return None
+
+        if is_operator(condition):
+            clause = _all_of(
+                [
+                    self._operator(column, name, argument)
+                    for name, argument in condition.items()
+                    if name != '$options'
+                ]
+            )
+        else:
+            clause = self._equals(column, condition)
+
+        return self._with_opaque(path, column, clause)
+
+    def _with_opaque(self, path: str, column: str, clause: Clause | None) -> Clause | None:
+        """Добавить к условию документы, значение поля в которых SQLite не сравнивает."""
+        if clause is None or not self._state.opaque[path]:
+            return clause
+
+        sql, parameters, _ = clause
+        return (f"({sql}) OR {column} >= ?", [*parameters, OPAQUE], False)
+
+    @staticmethod
+    def _equals(column: str, value: Any) -> Clause | None:
+        if value is None:
+            return (f"{column} IN (?, ?)", [ABSENT, NULL], True)
+
+        encoded = encode(value)
+        if encoded is None:
+            return None
+        return (f"{column} = ?", [encoded], True)
+
+    def _operator(self, column: str, name: str, argument: Any) -> Clause | None:
+        match name:
+            case '$eq':
+                return self._equals(column, argument)
+
+            case '$ne':
+                clause = self._equals(column, argument)
+                if clause is None:
+                    return None
+                return (f"NOT ({clause[0]})", clause[1], True)
+
+            case '$in' | '$nin':
+                values = [
+                    item
+                    for value in argument
+                    for item in ((ABSENT, NULL) if value is None else (encode(value),))
+                ]
+                if None in values:
+                    return None
+                if not values:
+                    return ('0', [], True) if name == '$in' else _ANYTHING
+                negation = 'NOT ' if name == '$nin' else ''
+                return (f"{column} {negation}IN ({', '.join('?' * len(values))})", values, True)
+
+            case '$lt' | '$lte' | '$gt' | '$gte':
+                encoded = encode(argument)
+                if argument is None or encoded is None:
+                    return None
+                # Как и Mongo, сравниваем только значения того же типа
+                rank = encoded[0]
+                return (
+                    f"{column} {_SQL_COMPARISONS[name]} ? AND {column} >= ? AND {column} < ?",
+                    [encoded, bytes((rank,)), bytes((rank + 1,))],
+                    True,
+                )
+
+            case '$exists':
+                return (f"{column} {'<>' if argument else '='} ?", [ABSENT], True)
+
+        return None
+
+    def _expression(self, expression: Any, variables: Mapping) -> Clause | None:
+        """Условие для сравнения поля с константой или переменной в `$expr`."""
+        if not is_operator(expression) or len(expression) != 1:
+            return None
+
+        ((name, arguments),) = expression.items()
+        if name in ('$and', '$or'):
+            clauses = [self._expression(item, variables) for item in arguments]
+            return _all_of(clauses) if name == '$and' else _any_of(clauses)
+        if name not in _SQL_COMPARISONS or len(arguments) != 2:
+            return None
+
+        left, right = arguments
+        if _field_reference(right) and not _field_reference(left):
+            left, right, name = right, left, _FLIPPED[name]
+        if not _field_reference(left) or _field_reference(right) or isinstance(right, Mapping):
+            return None
+
+        path = left[1:]
+        column = self._state.columns.get(path)
+        value = compile_expression(right)(None, variables)
+        encoded = encode(value)
+        # Отсутствующее поле и null в выражениях равны друг другу, а в столбцах различаются
+        if column is None or value is None or value is MISSING or encoded is None:
+            return None
+
+        clause = (f"{column} {_SQL_COMPARISONS[name]} ?", [encoded], True)
+        return self._with_opaque(path, column, clause)
+
+    def _order_by(self, sort: Any) -> str | None:
+        """ORDER BY для сортировки или `None`, если SQLite не может её выполнить."""
+        parts = []
+        for path, direction in sort_items(sort):
+            column = self._state.columns.get(path)
+            if column is None or self._state.opaque[path]:
+                return None
+            parts.append(f"{column} {'DESC' if direction < 0 else 'ASC'}")
+
+        return f" ORDER BY {', '.join(parts)}" if parts else ''
+
+
+class SqliteDatabase(MemoryDatabase):
+    """База данных MongoDB в файле SQLite: коллекции хранятся в таблицах `<база>.<коллекция>`."""
+
+    collection_class = SqliteCollection
+
+    async def list_collection_names(self, **kwargs: Any) -> list[str]:
+        prefix = f"{self.name}."
+        tables = await self.client.execute(
+            lambda: self.client.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND substr(name, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchall()
+        )
+        return [name.removeprefix(prefix) for name, in tables]
+
+    async def drop_collection(self, name: str, **kwargs: Any) -> None:
+        collection = self[name]
+        await collection._run(collection._clear)
+        self._collections.pop(name, None)
+
+
+class SqliteClient(MemoryClient):
+    """
+    Клиент MongoDB, который хранит данные в одном файле SQLite.
+
+    Для небольших установок, где отдельный сервер MongoDB обходится дороже самого бота.
+    Файл открывается в режиме WAL, а все обращения к нему идут через один выделенный
+    поток, поэтому одновременные операции выполняются по очереди и не блокируют
+    цикл событий. Change streams недоступны, как на standalone-сервере.
+
+    Использование:
+    client = SqliteClient('sqlite:///dogstats.sqlite3')
+    await client['dog_stats_db']['users'].find_one({"tg_id": 1})
+    """
+
+    database_class = SqliteDatabase
+
+    def __init__(self, host: str | None = None, **options: Any):
+        super().__init__(host, **options)
+        # sqlite:///относительный/путь или sqlite:////абсолютный/путь, как в SQLAlchemy
+        self.path = Path((host or 'data/dogstats.sqlite3').removeprefix('sqlite:///'))
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        self.connection = self.executor.submit(self._connect).result()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self.path)!r})"
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, autocommit=True, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode = WAL')
+        # В режиме WAL NORMAL не портит базу при сбое, а теряет только последние транзакции
+        connection.execute('PRAGMA synchronous = NORMAL')
+        connection.execute('PRAGMA busy_timeout = 5000')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS _indexes ('
+            'namespace TEXT NOT NULL, name TEXT NOT NULL, spec BLOB NOT NULL, '
+            'PRIMARY KEY (namespace, name))'
+        )
+        return connection
+
+    async def execute[T](self, function: Callable[..., T], *args: Any) -> T:
+        """Выполнить функцию в потоке SQLite."""
+        if self.connection is None:
+            raise OperationFailure(f"Соединение с {self.path} закрыто")
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def list_database_names(self, **kwargs: Any) -> list[str]:
+        tables = await self.execute(
+            lambda: self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%.%'"
+            ).fetchall()
+        )
+        return sorted({name.partition('.')[0] for name, in tables})
+
+    async def drop_database(self, name_or_database: str | MemoryDatabase, **kwargs: Any) -> None:
+        name = getattr(name_or_database, 'name', name_or_database)
+        database = self[name]
+        for collection in await database.list_collection_names():
+            await database.drop_collection(collection)
+        self._databases.pop(name, None)
+
+    async def close(self) -> None:
+        if self.connection is None:
+            return
+
+        connection, self.connection = self.connection, None
+        await asyncio.get_running_loop().run_in_executor(self.executor, connection.close)
+        self.executor.shutdown()
@@ -0,0 +1,187 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Callable, Iterable, NamedTuple
+
+from loguru import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+import settings
+from utils import get_utc_now
+
+from .client import Database, client, resolve
+from .repositories import AnimalRecordRepository, MongoDict, UserRepository
+
+# Коды ошибок MongoDB, означающие, что change streams недоступны в принципе
+# (standalone-сервер или хранилище без oplog).
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 136}
+
+
+class ChangeEvent(NamedTuple):
+    """Событие об изменении документа в коллекции."""
+
+    collection: str
+    operation: str  # insert, update, replace, delete или flush
+    document_id: Any | None = None
+    document: MongoDict | None = None
+    # Изменённые и удалённые поля при update из change stream, иначе None (неизвестно)
+    updated_fields: frozenset[str] | None = None
+
+
+Subscriber = Callable[[ChangeEvent], None]
+
+
+def _updated_fields(change: MongoDict) -> frozenset[str] | None:
+    """Поля верхнего уровня, которые затронуло обновление из change stream."""
+    description = change.get('updateDescription')
+    if change['operationType'] != 'update' or description is None:
+        return None
+
+    paths = [*description.get('updatedFields', {}), *description.get('removedFields', ())]
+    return frozenset(path.partition('.')[0] for path in paths)
+
+
+class ChangeWatcher:
+    """
+    Слушатель изменений в коллекциях для сброса локальных кэшей.
+
+    Использует change streams, а если они недоступны, опрашивает коллекции по полю
+    `updated_at`. Событие `flush` означает, что часть изменений могла быть пропущена
+    и кэш коллекции нужно очистить целиком.
+
+    Использование:
+    from database.watcher import watcher
+    watcher.subscribe('users', callback)
+    asyncio.create_task(watcher.run())
+    """
+
+    def __init__(self, db: Database, collections: Iterable[str], poll_interval: float):
+        self.db = db
+        self.collections = tuple(collections)
+        self.poll_interval = poll_interval
+        self._subscribers: dict[str, list[Subscriber]] = defaultdict(list)
+
+    def subscribe(self, collection: str, callback: Subscriber) -> None:
+        """Подписать локальный кэш на изменения в коллекции."""
+        self._subscribers[collection].append(callback)
+
+    def publish(self, event: ChangeEvent) -> None:
+        """Разослать событие подписчикам коллекции."""
+        for callback in self._subscribers[event.collection]:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception(f"Ошибка в подписчике {callback} на событие {event}.")
+
+    def flush(self) -> None:
+        """Сбросить кэши всех коллекций."""
+        for collection in self.collections:
+            self.publish(ChangeEvent(collection, 'flush'))
+
+    async def run(self) -> None:
+        """Запустить слушатель. Работает до отмены задачи."""
+        try:
+            await self._watch()
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAMS_UNSUPPORTED:
+                raise
+            logger.warning(
+                f"Change streams недоступны ({e.code}), "
+                f"переход на опрос коллекций раз в {self.poll_interval} с."
+            )
+
+        await self._poll()
+
+    async def _watch(self) -> None:
+        """Слушать изменения через change streams, переподключаясь при сетевых ошибках."""
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.collections)}}}]
+        resume_token = None
+
+        while True:
+            try:
+                stream = await resolve(
+                    self.db.watch(
+                        pipeline,
+                        full_document='updateLookup',
+                        resume_after=resume_token,
+                    )
+                )
+                async with stream:
+                    logger.success(f"Подписка на изменения {self.collections} запущена.")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.publish(
+                            ChangeEvent(
+                                collection=change['ns']['coll'],
+                                operation=change['operationType'],
+                                document_id=change.get('documentKey', {}).get('_id'),
+                                document=change.get('fullDocument'),
+                                updated_fields=_updated_fields(change),
+                            )
+                        )
+
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    raise
+                logger.exception("Ошибка в потоке изменений, переподключение.")
+                resume_token = None
+
+            except PyMongoError:
+                logger.exception("Потеряно соединение с потоком изменений, переподключение.")
+
+            # Пока поток был разорван, события могли потеряться
+            self.flush()
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll(self) -> None:
+        """Опрашивать коллекции по `updated_at`."""
+        # Драйвер возвращает даты без часового пояса (в UTC)
+        now = get_utc_now().replace(tzinfo=None)
+        watermarks = {collection: now for collection in self.collections}
+        seen: dict[str, set] = {collection: set() for collection in self.collections}
+        counts = {
+            collection: await self.db[collection].estimated_document_count()
+            for collection in self.collections
+        }
+
+        while True:
+            await asyncio.sleep(self.poll_interval)
+
+            for collection in self.collections:
+                try:
+                    created = 0
+                    since = watermarks[collection]
+                    cursor = self.db[collection].find(
+                        {"updated_at": {"$gte": watermarks[collection]}},
+                        sort=[("updated_at", 1)],
+                    )
+
+                    async for document in cursor:
+                        if document['_id'] in seen[collection]:
+                            continue
+
+                        if document['updated_at'] > watermarks[collection]:
+                            watermarks[collection] = document['updated_at']
+                            seen[collection].clear()
+                        seen[collection].add(document['_id'])
+
+                        if document.get('created_at', since) > since:
+                            created += 1
+
+                        self.publish(ChangeEvent(collection, 'update', document['_id'], document))
+
+                    # Удаления при опросе не видны, их выдаёт только уменьшение количества
+                    count = await self.db[collection].estimated_document_count()
+                    if count < counts[collection] + created:
+                        self.publish(ChangeEvent(collection, 'flush'))
+                    counts[collection] = count
+
+                except PyMongoError:
+                    logger.exception(f"Ошибка при опросе коллекции {collection}.")
+                    self.publish(ChangeEvent(collection, 'flush'))
+
+
+watcher = ChangeWatcher(
+    client.db,
+    (UserRepository.collection, AnimalRecordRepository.collection),
+    poll_interval=settings.db.watch_poll_interval,
+)
@@ -0,0 +1,242 @@
+import asyncio
+import csv
+import datetime
+import enum
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterable, Awaitable, Callable, Self
+
+from bson import ObjectId
+from openpyxl import Workbook
+
+from database.models import AnimalRecordRead, AnimalTombstoneRead, AnimalType, TgUserID
+
+type Batches = AsyncIterable[list[AnimalRecordRead]]
+type Rows = AsyncIterable[list[list[Any]]]  # Пачки строк с исходными значениями ячеек
+
+
+class ExportFormat(enum.StrEnum):
+    """Форматы выгрузки записей о животных."""
+
+    CSV = "csv"
+    XLSX = "xlsx"
+
+
+class DeltaOperation(enum.StrEnum):
+    """Что произошло с записью в разностной выгрузке."""
+
+    UPSERT = "Изменена"
+    DELETE = "Удалена"
+
+
+# Колонки выгрузки. Фото не выгружаются: их file_id имеют смысл только внутри Telegram
+EXPORT_FIELDS = (
+    "id",
+    "created_at",
+    "updated_at",
+    "created_by",
+    "created_by_name",
+    "animal_type",
+    "sex",
+    "breed",
+    "color",
+    "features",
+    "chip_id",
+    "is_sterilized",
+    "is_vaccinated",
+    "catch_date",
+    "catch_place",
+    "transfer_date",
+    "return_date",
+    "return_place",
+    "euthanasia_date",
+    "comment",
+)
+HEADERS = {
+    "id": "ID записи",
+    "created_at": "Дата создания записи",
+    "updated_at": "Дата изменения записи",
+    "created_by": "ID автора",
+}
+HEADER_ROW = [
+    HEADERS.get(name) or AnimalRecordRead.model_fields[name].title for name in EXPORT_FIELDS
+]
+DELTA_HEADER_ROW = ["Изменение", *HEADER_ROW]
+
+# С этих символов Excel начинает формулу, такие строки выгружаются как текст
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+DATE_RANGE = re.compile(r"(\d{2}\.\d{2}\.\d{4})(?:-(\d{2}\.\d{2}\.\d{4}))?")
+
+
+def _cell(value: Any, native: bool) -> Any:
+    """
+    Значение для ячейки. С `native` даты и числа остаются своего типа, как в XLSX,
+    а пустые ячейки не записываются вовсе.
+    """
+    match value:
+        case None:
+            return None if native else ""
+        case bool():
+            return "Да" if value else "Нет"
+        case datetime.datetime():
+            if value.tzinfo is not None:
+                value = value.astimezone(datetime.UTC).replace(tzinfo=None)
+            return value if native else f"{value:%d.%m.%Y %H:%M}"
+        case int() | float():
+            return value if native else str(value)
+        case ObjectId():
+            return str(value)
+        case str() if value.startswith(FORMULA_PREFIXES):
+            return f"'{value}"
+        case _:
+            return str(value)
+
+
+def _parse_date(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, "%d.%m.%Y").date()
+
+
+def record_row(record: AnimalRecordRead) -> list[Any]:
+    """Строка выгрузки с полями записи."""
+    return [getattr(record, name) for name in EXPORT_FIELDS]
+
+
+def tombstone_row(tombstone: AnimalTombstoneRead) -> list[Any]:
+    """Строка разностной выгрузки об удалении: `_id` записи и время удаления."""
+    row: list[Any] = [None] * len(DELTA_HEADER_ROW)
+    row[0] = DeltaOperation.DELETE
+    row[1 + EXPORT_FIELDS.index("id")] = tombstone.id
+    row[1 + EXPORT_FIELDS.index("updated_at")] = tombstone.updated_at
+    return row
+
+
+async def record_rows(batches: Batches) -> Rows:
+    """Пачки записей в пачки строк полной выгрузки."""
+    async for batch in batches:
+        yield [record_row(record) for record in batch]
+
+
+async def write_csv(rows: Rows, path: Path, header: list[str] = HEADER_ROW) -> int:
+    """
+    Записать строки в CSV по мере чтения пачек.
+
+    Разделитель `;` и BOM нужны, чтобы файл сразу открывался в Excel с русской локалью.
+    """
+    count = 0
+    with path.open("w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(header)
+
+        async for batch in rows:
+            cells = [[_cell(value, native=False) for value in row] for row in batch]
+            await asyncio.to_thread(writer.writerows, cells)
+            count += len(batch)
+
+    return count
+
+
+async def write_xlsx(rows: Rows, path: Path, header: list[str] = HEADER_ROW) -> int:
+    """
+    Записать строки в XLSX по мере чтения пачек.
+
+    Книга в режиме `write_only` сбрасывает строки во временный файл, поэтому память
+    не растёт с числом записей.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Животные")
+    sheet.append(header)
+
+    def append(cells: list[list[Any]]) -> None:
+        for row in cells:
+            sheet.append(row)
+
+    count = 0
+    async for batch in rows:
+        cells = [[_cell(value, native=True) for value in row] for row in batch]
+        await asyncio.to_thread(append, cells)
+        count += len(batch)
+
+    await asyncio.to_thread(workbook.save, path)
+    return count
+
+
+WRITERS: dict[ExportFormat, Callable[[Rows, Path, list[str]], Awaitable[int]]] = {
+    ExportFormat.CSV: write_csv,
+    ExportFormat.XLSX: write_xlsx,
+}
+
+
+@dataclass(slots=True)
+class ExportQuery:
+    """
+    Параметры выгрузки: формат, период по дате отлова, вид животного и автор.
+
+    С `delta` выгружаются только изменения после прошлой выгрузки, без фильтров.
+    """
+
+    format: ExportFormat = ExportFormat.XLSX
+    delta: bool = False
+    date_from: datetime.date | None = None
+    date_to: datetime.date | None = None
+    animal_type: AnimalType | None = None
+    created_by: TgUserID | None = None
+
+    @classmethod
+    def parse(cls, args: str | None) -> Self:
+        """
+        Разобрать аргументы команды в любом порядке.
+
+        Формат `csv` или `xlsx`, дата `ДД.ММ.ГГГГ` или период `ДД.ММ.ГГГГ-ДД.ММ.ГГГГ`,
+        вид животного и tg_id автора или `delta`. Неизвестный аргумент вызывает `ValueError`.
+        """
+        query = cls()
+        animal_types = {animal_type.lower(): animal_type for animal_type in AnimalType}
+
+        for arg in (args or "").split():
+            if arg.lower() in ExportFormat:
+                query.format = ExportFormat(arg.lower())
+            elif arg.lower() == "delta":
+                query.delta = True
+            elif arg.lower() in animal_types:
+                query.animal_type = animal_types[arg.lower()]
+            elif arg.isdigit():
+                query.created_by = int(arg)
+            elif dates := DATE_RANGE.fullmatch(arg):
+                start, end = dates.groups()
+                try:
+                    query.date_from = _parse_date(start)
+                    query.date_to = _parse_date(end) if end else query.date_from
+                except ValueError:
+                    raise ValueError(arg) from None
+            else:
+                raise ValueError(arg)
+
+        if query.date_from and query.date_to and query.date_from > query.date_to:
+            raise ValueError(f"{query.date_from:%d.%m.%Y}-{query.date_to:%d.%m.%Y}")
+
+        # Отметка разностной выгрузки одна на получателя и не зависит от фильтров
+        if query.delta and query.filter:
+            raise ValueError("delta нельзя сочетать с фильтрами")
+
+        return query
+
+    @property
+    def filter(self) -> dict[str, Any]:
+        """Фильтр Mongo по записям о животных. Конец периода входит в выгрузку."""
+        _filter: dict[str, Any] = {}
+
+        if self.date_from or self.date_to:
+            catch_date = _filter["catch_date"] = {}
+            if self.date_from:
+                catch_date["$gte"] = datetime.datetime.combine(self.date_from, datetime.time())
+            if self.date_to:
+                end = self.date_to + datetime.timedelta(days=1)
+                catch_date["$lt"] = datetime.datetime.combine(end, datetime.time())
+        if self.animal_type:
+            _filter["animal_type"] = self.animal_type.value
+        if self.created_by:
+            _filter["created_by"] = self.created_by
+
+        return _filter
@@ -2,14 +2,29 @@ import asyncio
 import sys
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.mongo import MongoStorage
 from loguru import logger
 
 import settings
-from bot.handlers import animals_router, roles_router, start_router
-from bot.logic import add_superadmins_from_venv, init_indexes
-from bot.middleware import LoggerMiddleware, UserRoleMiddleware
+from bot.handlers import (
+    animals_router,
+    export_router,
+    roles_router,
+    start_router,
+    stats_router,
+)
+from bot.logic import (
+    add_superadmins_from_venv,
+    backfill_animals_counts,
+    backfill_author_names,
+    backfill_stats,
+    init_indexes,
+    log_cache_stats,
+    run_in_background,
+)
+from bot.middleware import LoggerMiddleware, RepositoryMiddleware, UserRoleMiddleware
 from database import client
+from database.repositories import Repositories
+from database.watcher import watcher
 
 # Настройка логирования
 logger.remove()
@@ -20,16 +35,40 @@ logger.add(
 
 
 async def main():
+    # Прогрев пула соединений с базой данных
+    logger.info("Инициализирован процесс прогрева пула соединений с базой данных...")
+    await client.warm_up()
+
+    # Инициализация репозиториев
+    repos = Repositories.from_db(client.db)
+
     # Заполнение базы данных
     logger.info("Инициализирован процесс создания индексов в локальной базе данных...")
-    await init_indexes()
+    indexes_task = asyncio.create_task(init_indexes(repos))
     logger.info("Инициализирован процесс добавления суперадминов из venv...")
-    await add_superadmins_from_venv()
+    await add_superadmins_from_venv(repos)
+
+    logger.info("Инициализирован процесс заведения счётчиков животных у пользователей...")
+    await backfill_animals_counts(repos)
+
+    logger.info("Инициализирован процесс заполнения имён авторов в записях о животных...")
+    run_in_background(backfill_author_names(repos))
+
+    logger.info("Инициализирован процесс подсчёта статистики по записям о животных...")
+    run_in_background(backfill_stats(repos))
+
+    # Запуск слушателя изменений для сброса кэшей между репликами
+    watcher_task = None
+    if client.driver not in client.embedded:
+        logger.info("Инициализирован процесс подписки на изменения в базе данных...")
+        watcher_task = asyncio.create_task(watcher.run())
+
+    stats_task = asyncio.create_task(log_cache_stats(settings.cache.stats_log_interval))
 
     # Инициализация роутеров
     logger.info("Инициализирован процесс добавления роутеров...")
     dp = Dispatcher(
-        storage=MongoStorage(client.client),
+        storage=client.fsm_storage(),
     )
 
     dp.include_router(start_router)
@@ -41,8 +80,17 @@ async def main():
     dp.include_router(animals_router)
     logger.success(f'{animals_router} добавлен.')
 
+    dp.include_router(stats_router)
+    logger.success(f'{stats_router} добавлен.')
+
+    dp.include_router(export_router)
+    logger.success(f'{export_router} добавлен.')
+
     # Инициализация мидлварей
     logger.info("Инициализирован процесс добавления миддлваров...")
+    dp.update.outer_middleware(RepositoryMiddleware(repos))
+    logger.success(f'{RepositoryMiddleware} добавлен.')
+
     dp.update.outer_middleware(LoggerMiddleware())
     logger.success(f'{LoggerMiddleware} добавлен.')
 
@@ -57,9 +105,15 @@ async def main():
 
     # Запуск бота
     logger.success("Ожидание входящих сообщений...")
-    await dp.start_polling(
-        bot,
-    )
+    try:
+        await dp.start_polling(
+            bot,
+        )
+    finally:
+        if watcher_task is not None:
+            watcher_task.cancel()
+        indexes_task.cancel()
+        stats_task.cancel()
 
 
 if __name__ == '__main__':
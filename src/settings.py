@@ -1,5 +1,5 @@
 import datetime as dt
-from typing import ClassVar
+from typing import Any, ClassVar, Literal
 
 from pydantic import MongoDsn
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,11 +25,41 @@ class DatabaseSettings(BaseConfig):
 
     host: str = 'localhost'
     port: int = 27017
-    user: str
-    password: str
+    user: str | None = None
+    password: str | None = None
+
+    watch_poll_interval: float = 5
+    trusted_reads: bool = True
+    batch_size: int = 500
+    # Разностная выгрузка не берёт изменения моложе этого времени, с: записи, которые
+    # ещё в пути, получат updated_at чуть раньше момента выгрузки и иначе были бы пропущены
+    delta_export_lag: float = 5
+
+    # Драйвер MongoDB: motor, нативный асинхронный клиент PyMongo, хранилище в памяти
+    # процесса (без сервера, для бенчмарков и нагрузочных прогонов) или файл SQLite
+    # (без сервера, для небольших установок)
+    driver: Literal['motor', 'pymongo', 'memory', 'sqlite'] = 'motor'
+    sqlite_path: str = 'data/dogstats.sqlite3'
+
+    # Пул соединений и сетевые параметры драйвера
+    app_name: str = 'dogstats'
+    max_pool_size: int = 100
+    # Прогретые соединения и сжатие нужны серверу в отдельной сети, а локальной базе
+    # только мешают, поэтому по умолчанию выключены. Значения для боя: .env.example
+    min_pool_size: int = 0
+    max_idle_time_ms: int | None = 300_000
+    compressors: str = ''  # Через запятую: zstd,zlib,snappy
+    server_selection_timeout_ms: int = 5_000
+    connect_timeout_ms: int = 5_000
+    socket_timeout_ms: int | None = None
 
     @property
     def db_dsn(self) -> str:
+        if self.driver == 'memory':
+            return 'memory://'
+        if self.driver == 'sqlite':
+            return f'sqlite:///{self.sqlite_path}'
+
         return MongoDsn.build(
             scheme=self.scheme,
             username=self.user,
@@ -38,6 +68,23 @@ class DatabaseSettings(BaseConfig):
             port=self.port,
         ).unicode_string()
 
+    @property
+    def client_options(self) -> dict[str, Any]:
+        """Параметры подключения для клиента MongoDB."""
+        options = {
+            'appname': self.app_name,
+            'maxPoolSize': self.max_pool_size,
+            'minPoolSize': self.min_pool_size,
+            'maxIdleTimeMS': self.max_idle_time_ms,
+            'serverSelectionTimeoutMS': self.server_selection_timeout_ms,
+            'connectTimeoutMS': self.connect_timeout_ms,
+            'socketTimeoutMS': self.socket_timeout_ms,
+        }
+        if self.compressors:
+            options['compressors'] = self.compressors
+
+        return options
+
 
 class TelegramSettings(BaseConfig):
     """Настройки Telegram."""
@@ -47,8 +94,31 @@ class TelegramSettings(BaseConfig):
     bot_token: str
     bot_username: str
     admin_ids: list[int]
+    invite_ttl_hours: int = 72
+    animal_page_size: int = 10  # Записей на одной странице списка животных
+
+
+class CacheSettings(BaseConfig):
+    """Настройки локальных кэшей."""
+
+    model_config = SettingsConfigDict(env_prefix='cache_')
+
+    users_maxsize: int = 4096
+    users_ttl: float = 300
+
+    animal_window_size: int = 10
+    animal_windows_maxsize: int = 1024
+    animal_windows_ttl: float = 600
+
+    # Готовые карточки животных. Ключ включает updated_at, так что правки записи
+    # сбрасывают карточку сами, а TTL ограничивает устаревание имени автора
+    animal_cards_maxsize: int = 2048
+    animal_cards_ttl: float = 3600
+
+    stats_log_interval: float = 600  # Как часто выводить в лог счётчики кэшей, с
 
 
 db = DatabaseSettings()
 tg = TelegramSettings()
+cache = CacheSettings()
 TZINFO = dt.timezone(dt.timedelta(hours=+5))  # ! UTC+3 !
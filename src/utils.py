@@ -2,12 +2,30 @@ import datetime
 
 import settings
 
+# Даты в базе хранятся в UTC с точностью до миллисекунд и читаются без часового пояса
+EPOCH = datetime.datetime(1970, 1, 1)
+
 
 def get_utc_now() -> datetime.datetime:
     """Ленивая функция для получения текущего времени в UTC."""
     return datetime.datetime.now(datetime.UTC)
 
 
+def to_milliseconds(value: datetime.datetime) -> int:
+    """Дата из базы (UTC без часового пояса) в миллисекундах от начала эпохи."""
+    return (value - EPOCH) // datetime.timedelta(milliseconds=1)
+
+
+def from_milliseconds(value: int) -> datetime.datetime:
+    """Дата в том виде, в котором её возвращает база, из миллисекунд от начала эпохи."""
+    return EPOCH + datetime.timedelta(milliseconds=value)
+
+
+def get_invite_expiration() -> datetime.datetime:
+    """Ленивая функция для получения даты истечения нового приглашения."""
+    return get_utc_now() + datetime.timedelta(hours=settings.tg.invite_ttl_hours)
+
+
 def generate_invite_link(password: str) -> str:
     """Генерирует ссылку для приглашения."""
     return f"https://t.me/{settings.tg.bot_username}?start={password}"
@@ -0,0 +1,40 @@
+import asyncio
+import inspect
+import os
+
+# Настройки читаются при импорте `database`, поэтому задаются до импорта тестов
+os.environ['DB_DRIVER'] = 'memory'
+os.environ.setdefault('TG_BOT_TOKEN', 'test')
+os.environ.setdefault('TG_BOT_USERNAME', 'test')
+os.environ.setdefault('TG_ADMIN_IDS', '[]')
+
+import pytest  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from database.memory import MemoryClient  # noqa: E402
+from database.sqlite import SqliteClient  # noqa: E402
+
+logger.remove()
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem: pytest.Function) -> bool | None:
+    """Запуск асинхронных тестов в собственном цикле событий."""
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+    asyncio.run(pyfuncitem.obj(**arguments))
+    return True
+
+
+@pytest.fixture
+def memory_db():
+    return MemoryClient()['test_db']
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    client = SqliteClient(f'sqlite:///{tmp_path / "test.sqlite3"}')
+    yield client['test_db']
+    asyncio.run(client.close())
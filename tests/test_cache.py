@@ -0,0 +1,79 @@
+import pytest
+
+from cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('cache.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_invalidate_during_read_drops_write():
+    cache = TTLCache(maxsize=10)
+
+    generation = cache.generation('user')
+    cache.invalidate('user')  # Сброс пришёл, пока значение читалось из базы
+    assert not cache.set('user', 'старое', generation)
+    assert cache.get('user') == (False, None)
+
+    assert cache.set('user', 'новое', cache.generation('user'))
+    assert cache.get('user') == (True, 'новое')
+
+
+def test_clear_during_read_drops_write():
+    cache = TTLCache(maxsize=10)
+
+    generation = cache.generation('user')
+    cache.clear()
+
+    assert not cache.set('user', 'старое', generation)
+    assert 'user' not in cache
+
+
+def test_invalidate_after_generation_counter_evicted():
+    cache = TTLCache(maxsize=1)
+
+    generation = cache.generation('a')
+    cache.invalidate('a')
+    cache.invalidate('b')  # Вытесняет счётчик сбросов 'a'
+
+    assert not cache.set('a', 'старое', generation)
+
+
+def test_ttl_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('user', 'Иван')
+
+    clock[0] += 59
+    assert cache.get('user') == (True, 'Иван')
+
+    clock[0] += 2
+    assert cache.get('user') == (False, None)
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'a' становится самым свежим
+
+    cache.set('c', 3)
+
+    assert 'b' not in cache
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+
+
+def test_stats():
+    cache = TTLCache(maxsize=10)
+    assert cache.stats == {'size': 0, 'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+
+    cache.set('a', None)
+    assert cache.get('a') == (True, None)  # Закэшированный None тоже попадание
+    cache.get('a')
+    cache.get('b')
+
+    assert cache.stats == {'size': 1, 'hits': 2, 'misses': 1, 'hit_ratio': 0.667}
@@ -0,0 +1,24 @@
+import pytest
+
+from bot.callback_factories import AnimalRecordCallbackFactory
+from bot.keyboards.basic import build_cancel, build_skip_cancel
+
+
+def test_same_arguments_share_markup():
+    assert build_skip_cancel('input_comment') is build_skip_cancel(skip_callback='input_comment')
+    assert build_cancel() is build_cancel('cancel')
+
+
+def test_callback_data_arguments():
+    callback = AnimalRecordCallbackFactory(item_id='0123456789abcdef01234567')
+
+    markup = build_skip_cancel(skip_callback=callback)
+
+    assert markup.inline_keyboard[0][0].callback_data == callback.pack()
+    assert build_skip_cancel(callback.pack()) is markup
+    assert build_skip_cancel(AnimalRecordCallbackFactory(item_id=callback.item_id)) is markup
+
+
+def test_markup_is_frozen():
+    with pytest.raises(TypeError):
+        build_cancel().inline_keyboard.append([])
@@ -0,0 +1,399 @@
+import asyncio
+import csv
+import datetime
+
+import pytest
+from bson import ObjectId
+
+import settings
+from bot import logic
+from database.models import (
+    AnimalRecordCreate,
+    AnimalRecordUpdate,
+    AnimalType,
+    InviteCreate,
+    Sex,
+    UserCreate,
+    UserRole,
+)
+from database.repositories import Repositories
+from database.watcher import ChangeEvent
+from export import EXPORT_FIELDS, DeltaOperation, ExportFormat, ExportQuery, _cell
+from utils import get_utc_now
+
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+
+
+@pytest.fixture
+def repos(memory_db):
+    for cache in logic.caches.values():
+        cache.clear()
+    return Repositories.from_db(memory_db)
+
+
+def make_record(created_by: int, **fields) -> AnimalRecordCreate:
+    return AnimalRecordCreate(
+        animal_type=AnimalType.DOG,
+        sex=Sex.FEMALE,
+        breed='Дворняга',
+        color='Рыжий',
+        catch_date=NOW,
+        catch_place='55.7558, 37.6173',
+        created_by=created_by,
+        **fields,
+    )
+
+
+async def create_user(repos: Repositories, tg_id: int, name: str = 'Работник') -> None:
+    await repos.users.create_one(UserCreate(tg_id=tg_id, name=name, role=UserRole.CATCHER))
+
+
+async def test_author_rename_changes_card_key(repos):
+    await create_user(repos, 1, 'Иван')
+    record = await logic.add_animal_record(repos, make_record(1))
+    assert record.created_by_name == 'Иван'
+
+    await asyncio.sleep(0.002)  # updated_at хранится с точностью до миллисекунд
+    await repos.users.delete_one({'tg_id': 1})
+    await logic.refresh_author_names(repos, [1])
+
+    renamed = await repos.animals.get_one({'_id': record.id})
+    assert renamed.created_by_name == logic.DELETED_USER_NAME
+    assert renamed.updated_at > record.updated_at
+
+
+def test_users_change_keeps_animal_cards():
+    card = logic.AnimalCard(text='Карточка', media=())
+    logic.animal_cards.set(('id', NOW), card)
+
+    logic._on_users_change(ChangeEvent('users', 'update', 'id', {'tg_id': 1}))
+    logic._on_users_change(ChangeEvent('users', 'delete', 'id'))
+
+    assert logic.animal_cards.get(('id', NOW)) == (True, card)
+
+
+async def test_animals_count_follows_records(repos):
+    await create_user(repos, 1)
+    await logic.add_animal_record(repos, make_record(1))
+
+    assert await logic.get_animals_count(repos, 1) == 1
+    await logic.get_user(repos, 1)  # Пользователь со счётчиком попал в кэш
+
+    await logic.add_animal_record(repos, make_record(1))
+    assert await logic.get_animals_count(repos, 1) == 2
+
+
+async def create_legacy_user(repos: Repositories, tg_id: int) -> None:
+    """Пользователь, появившийся раньше счётчика животных."""
+    await repos.users.client.insert_one(
+        {'tg_id': tg_id, 'name': 'Старожил', 'role': UserRole.CATCHER.value}
+    )
+
+
+async def test_animals_count_survives_record_added_while_counting(repos, monkeypatch):
+    await create_legacy_user(repos, 1)
+    await repos.animals.create_one(make_record(1))
+    count_by_author = repos.animals.count_by_author
+
+    async def count_then_add(tg_id):
+        count = await count_by_author(tg_id)
+        # Запись добавляется между подсчётом и возвратом результата
+        await logic.add_animal_record(repos, make_record(tg_id))
+        return count
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repos.animals, 'count_by_author', count_then_add)
+        assert await logic.get_animals_count(repos, 1) == 1
+
+    assert await logic.get_animals_count(repos, 1) == 2
+
+
+async def test_backfill_animals_counts(repos):
+    await create_legacy_user(repos, 1)
+    await repos.animals.create_one(make_record(1))
+    await create_user(repos, 2)
+    await logic.add_animal_record(repos, make_record(2))
+
+    await logic.backfill_animals_counts(repos)
+    await logic.add_animal_record(repos, make_record(1))
+
+    assert await repos.migrations.is_applied(logic.ANIMALS_COUNT_MIGRATION)
+    for tg_id, count in ((1, 2), (2, 1)):
+        user = await repos.users.get_partial({'tg_id': tg_id}, ('animals_count',))
+        assert user['animals_count'] == count
+
+
+def test_counter_update_keeps_user_cache():
+    logic.user_cache.set(1, None)
+
+    counter = ChangeEvent('users', 'update', 'id', {'tg_id': 1}, frozenset({'animals_count'}))
+    logic._on_users_change(counter)
+    assert logic.user_cache.get(1) == (True, None)
+
+    rename = ChangeEvent('users', 'update', 'id', {'tg_id': 1}, frozenset({'name', 'updated_at'}))
+    logic._on_users_change(rename)
+    assert logic.user_cache.get(1) == (False, None)
+
+
+async def test_author_names_backfill_runs_once(repos, monkeypatch):
+    await create_user(repos, 1, 'Иван')
+    record = await repos.animals.create_one(make_record(1))
+    assert record.created_by_name is None
+
+    await logic.backfill_author_names(repos)
+    named = await repos.animals.get_one({'_id': record.id})
+    assert named.created_by_name == 'Иван'
+
+    async def fail():
+        raise AssertionError("Полный проход по записям при повторном запуске")
+
+    monkeypatch.setattr(repos.animals, 'get_unnamed_authors', fail)
+    await logic.backfill_author_names(repos)
+
+
+async def test_author_names_backfill_retries_after_error(repos, monkeypatch):
+    await create_user(repos, 1)
+    await repos.animals.create_one(make_record(1))
+
+    async def fail(*args):
+        raise RuntimeError("Сбой базы")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repos.animals, 'set_author_name', fail)
+        await logic.backfill_author_names(repos)
+    assert not await repos.migrations.is_applied(logic.AUTHOR_NAMES_MIGRATION)
+
+    await logic.backfill_author_names(repos)
+    assert await repos.migrations.is_applied(logic.AUTHOR_NAMES_MIGRATION)
+
+
+async def test_rebuild_stats_keeps_counters_on_read_error(repos, monkeypatch):
+    await create_user(repos, 1)
+    await create_user(repos, 2)
+    await repos.animals.create_one(make_record(1))
+    await repos.animals.create_one(make_record(2))
+    assert await logic.rebuild_stats(repos) == 2
+    before = await logic.get_stats(repos)
+
+    get_batches = repos.animals.get_batches
+
+    async def broken(*args, **kwargs):
+        async for batch in get_batches(*args, batch_size=1, **kwargs):
+            yield batch
+            raise ConnectionError("Соединение потеряно")
+
+    monkeypatch.setattr(repos.animals, 'get_batches', broken)
+    with pytest.raises(ConnectionError):
+        await logic.rebuild_stats(repos)
+
+    assert await logic.get_stats(repos) == before
+
+
+async def test_export_fails_on_read_error(repos, monkeypatch, tmp_path):
+    await create_user(repos, 1)
+    for _ in range(3):
+        await repos.animals.create_one(make_record(1))
+
+    get_batches = repos.animals.get_batches
+
+    async def broken(*args, **kwargs):
+        async for batch in get_batches(*args, batch_size=1, **kwargs):
+            yield batch
+            raise ConnectionError("Соединение потеряно")
+
+    monkeypatch.setattr(repos.animals, 'get_batches', broken)
+    with pytest.raises(ConnectionError):
+        await logic.export_animal_records(repos, ExportQuery(ExportFormat.CSV), tmp_path / 'a.csv')
+
+
+@pytest.mark.parametrize(
+    ('args', 'expected'),
+    [
+        (None, ExportQuery()),
+        ('CSV', ExportQuery(ExportFormat.CSV)),
+        ('delta csv', ExportQuery(ExportFormat.CSV, delta=True)),
+        (
+            'собака 01.05.2025 42',
+            ExportQuery(
+                date_from=datetime.date(2025, 5, 1),
+                date_to=datetime.date(2025, 5, 1),
+                animal_type=AnimalType.DOG,
+                created_by=42,
+            ),
+        ),
+        (
+            '01.05.2025-31.05.2025 xlsx',
+            ExportQuery(date_from=datetime.date(2025, 5, 1), date_to=datetime.date(2025, 5, 31)),
+        ),
+    ],
+)
+def test_export_query_parse(args, expected):
+    assert ExportQuery.parse(args) == expected
+
+
+@pytest.mark.parametrize(
+    'args', ['pdf', '31.02.2025', '31.05.2025-01.05.2025', 'delta собака', '2025-05-01']
+)
+def test_export_query_parse_rejects(args):
+    with pytest.raises(ValueError):
+        ExportQuery.parse(args)
+
+
+def test_export_query_filter_includes_end_date():
+    query = ExportQuery.parse('01.05.2025-31.05.2025 кошка')
+
+    assert query.filter == {
+        'catch_date': {
+            '$gte': datetime.datetime(2025, 5, 1),
+            '$lt': datetime.datetime(2025, 6, 1),
+        },
+        'animal_type': AnimalType.CAT.value,
+    }
+
+
+@pytest.mark.parametrize(
+    ('value', 'expected'),
+    [
+        ('=SUM(A1:A9)', "'=SUM(A1:A9)"),
+        ('+7 999 000-00-00', "'+7 999 000-00-00"),
+        ('-1', "'-1"),
+        ('@SUM(A1)', "'@SUM(A1)"),
+        ('\tтаб', "'\tтаб"),
+        ('Рыжий, 5 лет', 'Рыжий, 5 лет'),
+    ],
+)
+def test_cell_escapes_formulas(value, expected):
+    assert _cell(value, native=False) == expected
+    assert _cell(value, native=True) == expected
+
+
+def test_cell_values():
+    _id = ObjectId()
+
+    assert _cell(None, native=False) == ''
+    assert _cell(None, native=True) is None
+    assert _cell(True, native=False) == 'Да'
+    assert _cell(-5, native=False) == '-5'  # Числа не экранируются
+    assert _cell(-5, native=True) == -5
+    assert _cell(NOW, native=False) == '01.05.2025 12:30'
+    assert _cell(NOW, native=True) == NOW
+    assert _cell(_id, native=True) == str(_id)
+
+
+# --- Приглашения ---
+
+
+@pytest.mark.parametrize('db', ['memory_db', 'sqlite_db'])
+async def test_invite_redeemed_once(request, db):
+    repos = Repositories.from_db(request.getfixturevalue(db))
+    await repos.invites.add_indexes()
+    invite = await logic.create_invite(repos, UserRole.CATCHER, 'ivan')
+
+    results = await asyncio.gather(*(logic.check_invite(repos, invite.password) for _ in range(5)))
+
+    assert [result.id for result in results if result is not None] == [invite.id]
+    assert await logic.check_invite(repos, invite.password) is None
+
+
+async def test_expired_invite_rejected(repos):
+    invite = await repos.invites.create_one(
+        InviteCreate(
+            password='secret',
+            role=UserRole.CATCHER,
+            username='ivan',
+            expires_at=get_utc_now() - datetime.timedelta(seconds=1),
+        )
+    )
+
+    # TTL-монитор ещё не удалил приглашение, но погасить его уже нельзя
+    assert await repos.invites.get_one({'_id': invite.id}) is not None
+    assert await logic.check_invite(repos, 'secret') is None
+
+
+# --- Разностная выгрузка ---
+
+ID_COLUMN = 1 + EXPORT_FIELDS.index('id')
+
+
+@pytest.fixture
+def no_lag(monkeypatch):
+    monkeypatch.setattr(settings.db, 'delta_export_lag', 0)
+
+
+async def export_delta(repos, path, commit=True) -> list[tuple[str, str]]:
+    """Изменения из разностной выгрузки в CSV: (операция, _id записи)."""
+    delta = await logic.export_animal_delta(repos, 'consumer', ExportFormat.CSV, path)
+    with path.open(encoding='utf-8-sig', newline='') as file:
+        rows = list(csv.reader(file, delimiter=';'))[1:]
+    if commit:
+        await logic.commit_delta_export(repos, 'consumer', delta)
+    return [(row[0], row[ID_COLUMN]) for row in rows]
+
+
+def upserts(*records) -> list[tuple[str, str]]:
+    return [(DeltaOperation.UPSERT, str(record.id)) for record in records]
+
+
+async def test_delta_watermark_resumes_after_interrupted_export(repos, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.db, 'batch_size', 1)
+    records = [await repos.animals.create_one(make_record(1, updated_at=NOW)) for _ in range(3)]
+    get_changed = repos.animals.get_changed
+
+    async def broken(*args):
+        async for batch in get_changed(*args):
+            yield batch
+            raise ConnectionError("Соединение потеряно")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(repos.animals, 'get_changed', broken)
+        with pytest.raises(ConnectionError):
+            await export_delta(repos, tmp_path / 'broken.csv')
+
+    # Ни прерванная, ни неподтверждённая выгрузка отметку не сдвигают
+    assert await export_delta(repos, tmp_path / 'a.csv', commit=False) == upserts(*records)
+    assert await export_delta(repos, tmp_path / 'b.csv') == upserts(*records)
+    assert await export_delta(repos, tmp_path / 'c.csv') == []
+
+    later = NOW + datetime.timedelta(minutes=1)
+    await repos.animals.update_one({'_id': records[1].id}, AnimalRecordUpdate(updated_at=later))
+    assert await export_delta(repos, tmp_path / 'd.csv') == upserts(records[1])
+
+
+async def test_delta_holds_back_recent_changes(repos, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.db, 'delta_export_lag', 60)
+    now = get_utc_now()
+    old = await repos.animals.create_one(
+        make_record(1, updated_at=now - datetime.timedelta(seconds=120))
+    )
+    recent = await repos.animals.create_one(
+        make_record(1, updated_at=now - datetime.timedelta(seconds=10))
+    )
+
+    assert await export_delta(repos, tmp_path / 'a.csv') == upserts(old)
+
+    monkeypatch.setattr(settings.db, 'delta_export_lag', 0)
+    assert await export_delta(repos, tmp_path / 'b.csv') == upserts(recent)
+
+
+async def test_delta_breaks_updated_at_ties_by_id(repos, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.db, 'batch_size', 2)
+    first = [await repos.animals.create_one(make_record(1, updated_at=NOW)) for _ in range(5)]
+
+    assert await export_delta(repos, tmp_path / 'a.csv') == upserts(*first)
+
+    # Записи с тем же updated_at, но после отметки по _id, не теряются
+    rest = [await repos.animals.create_one(make_record(1, updated_at=NOW)) for _ in range(3)]
+    assert await export_delta(repos, tmp_path / 'b.csv') == upserts(*rest)
+
+
+async def test_delta_emits_tombstones_once(repos, tmp_path, no_lag):
+    records = [await repos.animals.create_one(make_record(1, updated_at=NOW)) for _ in range(2)]
+    assert await export_delta(repos, tmp_path / 'a.csv') == upserts(*records)
+
+    await repos.animals.delete_one({'_id': records[0].id})
+    await asyncio.sleep(0.002)  # Отметка должна стать старше момента выгрузки
+
+    assert await export_delta(repos, tmp_path / 'b.csv') == [
+        (DeltaOperation.DELETE, str(records[0].id))
+    ]
+    assert await export_delta(repos, tmp_path / 'c.csv') == []
@@ -0,0 +1,384 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+from loguru import logger
+from pymongo import IndexModel
+from pymongo.errors import CursorNotFound, DuplicateKeyError, OperationFailure
+
+from database import memory
+from database.engine import sort_documents
+from database.models import AnimalRecordCreate, AnimalRecordRead, AnimalType, Sex, UserRead
+from database.repositories import AnimalRecordRepository, InviteRepository, UserRepository
+
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+
+
+def ids(documents):
+    return [document['_id'] for document in documents]
+
+
+async def insert(collection, *documents):
+    await collection.insert_many([{'_id': i, **document} for i, document in enumerate(documents)])
+
+
+# --- Фильтры ---
+
+
+@pytest.mark.parametrize(
+    ('filter', 'expected'),
+    [
+        ({'name': 'Бим'}, [0]),
+        ({'tags': 'рыжий'}, [1]),  # Элемент массива
+        ({'tags': ['рыжий', 'большой']}, [1]),  # Весь массив
+        ({'name': None}, [3]),  # Нет поля
+        ({'age': {'$gt': 2}}, [1, 2]),
+        ({'age': {'$gte': 2, '$lt': 5}}, [0, 1]),
+        ({'age': {'$lt': 'x'}}, []),  # Числа со строками не сравниваются
+        ({'age': {'$ne': 2}}, [1, 2, 3]),
+        ({'age': {'$in': [2, 7]}}, [0, 2]),
+        ({'age': {'$nin': [2, 7]}}, [1, 3]),
+        ({'name': {'$exists': False}}, [3]),
+        ({'age': {'$not': {'$gt': 2}}}, [0, 3]),
+        ({'$or': [{'name': 'Бим'}, {'age': 7}]}, [0, 2]),
+        ({'$and': [{'age': {'$gt': 2}}, {'tags': 'рыжий'}]}, [1]),
+        ({'born': {'$lt': NOW}}, [0]),
+    ],
+)
+async def test_filter(memory_db, filter, expected):
+    await insert(
+        memory_db.dogs,
+        {'name': 'Бим', 'age': 2, 'born': NOW - datetime.timedelta(days=1)},
+        {'name': 'Рекс', 'age': 3, 'tags': ['рыжий', 'большой']},
+        {'name': 'Жучка', 'age': 7, 'born': NOW},
+        {'age': None},
+    )
+
+    assert ids(await memory_db.dogs.find(filter).to_list()) == expected
+
+
+async def test_unknown_operator(memory_db):
+    with pytest.raises(OperationFailure):
+        await memory_db.dogs.find({'name': {'$regex': 'Б'}}).to_list()
+
+
+# --- Сортировка ---
+
+
+async def test_sort_by_several_fields(memory_db):
+    await insert(memory_db.dogs, {'a': 1, 'b': 1}, {'a': 2, 'b': 1}, {'a': 1, 'b': 2}, {'a': 2})
+
+    documents = await memory_db.dogs.find({}, sort=[('a', 1), ('b', -1)]).to_list()
+
+    assert ids(documents) == [2, 0, 1, 3]
+
+
+async def test_sort_mixed_types(memory_db):
+    await insert(memory_db.dogs, {'a': 'x'}, {'a': 1}, {}, {'a': NOW}, {'a': None}, {'a': 2.5})
+
+    documents = await memory_db.dogs.find({}, sort=[('a', 1), ('_id', 1)]).to_list()
+
+    # null и отсутствующее поле, числа, строки, даты
+    assert ids(documents) == [2, 4, 1, 5, 0, 3]
+
+
+@pytest.mark.parametrize('limit', [None, 2])
+def test_sort_arrays(limit):
+    documents = [{'_id': 0, 'a': 'x'}, {'_id': 1, 'a': [1, 5]}, {'_id': 2, 'a': 3}]
+
+    # По возрастанию массив стоит на месте наименьшего элемента, по убыванию наибольшего
+    assert ids(sort_documents(documents, [('a', 1)], limit)) == [1, 2, 0][:limit]
+    assert ids(sort_documents(documents, [('a', -1)], limit)) == [0, 1, 2][:limit]
+
+
+def test_sort_empty_array_before_null():
+    documents = [{'_id': 0, 'a': None}, {'_id': 1, 'a': []}, {'_id': 2, 'a': [None]}]
+
+    assert ids(sort_documents(documents, [('a', 1), ('_id', 1)])) == [1, 0, 2]
+
+
+async def test_sort_with_limit(memory_db):
+    await insert(memory_db.dogs, *({'a': i % 4} for i in range(10)))
+
+    documents = await memory_db.dogs.find({}, sort=[('a', -1), ('_id', -1)], limit=3).to_list()
+
+    assert ids(documents) == [7, 3, 6]
+
+
+# --- Проекции ---
+
+
+@pytest.mark.parametrize(
+    ('projection', 'expected'),
+    [
+        ({'name': 1}, {'_id': 0, 'name': 'Бим'}),
+        ({'name': 1, '_id': 0}, {'name': 'Бим'}),
+        ({'place.city': 1}, {'_id': 0, 'place': {'city': 'Москва'}}),
+        ({'place': 0, 'age': 0}, {'_id': 0, 'name': 'Бим'}),
+        ({'_id': 0}, {'name': 'Бим', 'age': 2, 'place': {'city': 'Москва', 'street': 'Арбат'}}),
+    ],
+)
+async def test_projection(memory_db, projection, expected):
+    await insert(
+        memory_db.dogs, {'name': 'Бим', 'age': 2, 'place': {'city': 'Москва', 'street': 'Арбат'}}
+    )
+
+    assert await memory_db.dogs.find_one({}, projection) == expected
+
+
+async def test_mixed_projection(memory_db):
+    await insert(memory_db.dogs, {'name': 'Бим', 'age': 2})
+
+    with pytest.raises(OperationFailure):
+        await memory_db.dogs.find_one({}, {'name': 1, 'age': 0})
+
+
+# --- Пагинация ---
+
+
+@pytest.fixture
+def animals(memory_db):
+    return AnimalRecordRepository(memory_db)
+
+
+# --- Индексы ---
+
+
+async def test_unique_index(memory_db):
+    users = memory_db.users
+    await users.create_indexes(list(UserRepository.indexes))
+    await users.insert_many([{'tg_id': 1}, {'tg_id': 2}, {'name': 'Без tg_id'}, {'tg_id': None}])
+
+    with pytest.raises(DuplicateKeyError):
+        await users.insert_one({'tg_id': 1})
+    with pytest.raises(DuplicateKeyError):
+        await users.update_one({'tg_id': 2}, {'$set': {'tg_id': 1}})
+    # Индекс разреженный: документы без поля в него не попадают, а null попадает
+    await users.insert_one({'name': 'Тоже без tg_id'})
+    with pytest.raises(DuplicateKeyError):
+        await users.insert_one({'tg_id': None})
+
+    await users.update_one({'tg_id': 1}, {'$set': {'tg_id': 3}})
+    await users.delete_one({'tg_id': 2})
+    await users.insert_many([{'tg_id': 1}, {'tg_id': 2}])
+    assert await users.count_documents({'tg_id': {'$exists': True}}) == 4
+
+
+async def test_unique_index_over_duplicates(memory_db):
+    await memory_db.users.insert_many([{'tg_id': 1}, {'tg_id': 1}])
+
+    with pytest.raises(DuplicateKeyError):
+        await memory_db.users.create_indexes(list(UserRepository.indexes))
+
+
+async def test_ttl_index(memory_db, monkeypatch):
+    invites = memory_db.invites
+    await invites.create_indexes(list(InviteRepository.indexes))
+    await invites.insert_many(
+        [
+            {'password': 'old', 'expires_at': NOW},
+            {'password': 'new', 'expires_at': datetime.datetime(2100, 1, 1)},
+            {'password': 'open'},
+        ]
+    )
+    assert await invites.count_documents({}) == 3
+
+    monkeypatch.setattr(memory, 'TTL_MONITOR_INTERVAL', 0)
+    assert [invite['password'] async for invite in invites.find({})] == ['new', 'open']
+
+
+async def test_add_indexes_reports_drift(memory_db):
+    users = UserRepository(memory_db)
+    await memory_db.users.create_indexes(
+        [
+            IndexModel([('tg_id', 1)], name='UQ_users_tg_id'),  # Без unique и sparse
+            IndexModel([('name', 1)], name='IX_users_name'),
+        ]
+    )
+    warnings = []
+    handler = logger.add(lambda message: warnings.append(str(message)), level='WARNING')
+    try:
+        await users.add_indexes()
+    finally:
+        logger.remove(handler)
+
+    existing = await memory_db.users.index_information()
+    assert sorted(existing) == ['IX_users_name', 'IX_users_role', 'UQ_users_tg_id', '_id_']
+    # Расходящийся индекс не перестраивается, а только попадает в лог
+    assert 'unique' not in existing['UQ_users_tg_id']
+    assert len(warnings) == 2
+    assert 'UQ_users_tg_id' in warnings[0] and "'unique': (True, False)" in warnings[0]
+    assert "'sparse': (True, False)" in warnings[0]
+    assert 'IX_users_name' in warnings[1]
+
+
+async def test_add_indexes_is_idempotent(memory_db):
+    users = UserRepository(memory_db)
+    await users.add_indexes()
+    created = await memory_db.users.index_information()
+
+    warnings = []
+    handler = logger.add(lambda message: warnings.append(str(message)), level='WARNING')
+    try:
+        await users.add_indexes()
+    finally:
+        logger.remove(handler)
+
+    assert await memory_db.users.index_information() == created
+    assert warnings == []
+
+
+async def create_records(animals: AnimalRecordRepository, count: int) -> list:
+    # Половина записей с одинаковым created_at: страницы различают их по _id
+    records = [
+        AnimalRecordCreate(
+            animal_type=AnimalType.DOG if i % 3 else AnimalType.CAT,
+            sex=Sex.FEMALE,
+            breed='Дворняга',
+            color='Рыжий',
+            catch_date=NOW,
+            catch_place='55.7558, 37.6173',
+            created_by=1,
+            created_at=NOW + datetime.timedelta(minutes=i // 2),
+        )
+        for i in range(count)
+    ]
+    await animals.create_bulk(records)
+    return [record.id async for record in animals.get_bulk({})]
+
+
+async def test_pages_forward_and_backward(animals):
+    expected = await create_records(animals, 23)
+
+    pages, key = [], None
+    while True:
+        page = await animals.get_page({}, key, size=5)
+        pages.append(page)
+        if not page.has_after:
+            break
+        key = (page.records[-1].created_at, page.records[-1].id)
+
+    assert [record.id for page in pages for record in page.records] == expected
+    assert [len(page.records) for page in pages] == [5, 5, 5, 5, 3]
+
+    first = pages[-1].records[0]
+    page = await animals.get_page({}, (first.created_at, first.id), backward=True, size=5)
+    assert [record.id for record in page.records] == expected[15:20]
+    assert page.has_before and page.has_after
+
+
+async def test_pages_with_filter(animals):
+    await create_records(animals, 12)
+
+    page = await animals.get_page({'animal_type': AnimalType.CAT.value}, size=10)
+
+    assert len(page.records) == 4
+    assert not page.has_after
+
+
+async def test_batches(animals):
+    expected = await create_records(animals, 11)
+
+    batches = [batch async for batch in animals.get_batches({}, batch_size=4)]
+
+    assert [len(batch) for batch in batches] == [4, 4, 3]
+    assert [record.id for batch in batches for record in batch] == sorted(expected)
+
+
+@pytest.mark.parametrize('sort_field', [None, 'created_at'])
+async def test_batches_resume_after_cursor_expired(animals, monkeypatch, sort_field):
+    await create_records(animals, 11)
+    expected = [
+        record.id
+        for batch in [batch async for batch in animals.get_batches({}, 4, sort_field)]
+        for record in batch
+    ]
+    find = animals.client.find
+    queries = []
+
+    class ExpiringCursor:
+        """Курсор, который истекает на сервере после первой пачки."""
+
+        def __init__(self, cursor):
+            self.cursor = cursor
+            self.batches = 0
+
+        async def to_list(self, length):
+            if self.batches == 1 and len(queries) == 1:
+                raise CursorNotFound("cursor id not found", code=43)
+            self.batches += 1
+            return await self.cursor.to_list(length)
+
+    def expiring_find(query, *args, **kwargs):
+        queries.append(query)
+        return ExpiringCursor(find(query, *args, **kwargs))
+
+    monkeypatch.setattr(animals.client, 'find', expiring_find)
+    batches = [batch async for batch in animals.get_batches({}, 4, sort_field)]
+
+    assert [record.id for batch in batches for record in batch] == expected
+    assert [len(batch) for batch in batches] == [4, 4, 3]
+    assert len(queries) == 2
+
+
+async def test_window(animals):
+    expected = await create_records(animals, 9)
+
+    window = await animals.get_window({}, 'created_at', str(expected[4]), size=2)
+
+    assert [record.id for record in window.records] == expected[2:7]
+    assert window.has_before and window.has_after
+
+
+async def test_window_target_outside_filter(animals):
+    expected = await create_records(animals, 3)
+    await animals.client.update_one({'_id': expected[1]}, {'$set': {'created_by': 2}})
+
+    window = await animals.get_window({'created_by': 1}, 'created_at', str(expected[1]))
+    assert window.records == []
+
+    window = await animals.get_window({'created_by': 2}, 'created_at', str(expected[1]))
+    assert [record.id for record in window.records] == [expected[1]]
+
+
+async def test_deletes_leave_tombstones(animals):
+    expected = await create_records(animals, 5)
+
+    await animals.delete_one({'_id': expected[0]})
+    assert await animals.delete_bulk({'animal_type': AnimalType.DOG.value}) == 3
+    assert await animals.delete_bulk({'animal_type': AnimalType.DOG.value}) == 0
+
+    remaining = [record.id async for record in animals.get_bulk({})]
+    tombstones = [tombstone.id async for tombstone in animals.tombstones.get_bulk({})]
+    assert remaining == [expected[3]]
+    assert sorted(tombstones) == sorted(set(expected) - {expected[3]})
+
+
+# --- Доверенное чтение ---
+
+
+async def test_from_document_matches_validation(animals):
+    await create_records(animals, 3)
+
+    async for document in animals.client.find({}):
+        record = AnimalRecordRead.from_document(document)
+        assert record == AnimalRecordRead.model_validate(document)
+        assert record.id == document['_id']
+
+
+def test_from_document_fills_defaults():
+    document = {
+        '_id': ObjectId(),
+        'tg_id': 1,
+        'name': 'Иван',
+        'role': 'catcher',
+        'created_at': NOW,
+        'updated_at': NOW,
+    }
+
+    user = UserRead.from_document(document)
+
+    assert user == UserRead.model_validate(document)
+    assert user.animals_count is None
+    assert user.model_dump(by_alias=True)['_id'] == str(document['_id'])
+    assert '_id' in document  # Документ из базы не изменяется
@@ -0,0 +1,378 @@
+import datetime
+
+import bson
+import pytest
+from bson import ObjectId
+from pymongo import IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from database.engine import sort_key
+from database.models import AnimalRecordCreate, AnimalType, Sex, UserCreate, UserRole, UserUpdate
+from database.repositories import AnimalRecordRepository, UserRepository
+from database.sqlite import ABSENT, NULL, OPAQUE, encode
+
+NOW = datetime.datetime(2025, 5, 1, 12, 30)
+
+
+def ids(documents):
+    return [document['_id'] for document in documents]
+
+
+# --- Кодирование значений ---
+
+ORDERED_VALUES = [
+    None,
+    -1e300,
+    -(2**53),
+    -2.5,
+    -1,
+    0,
+    0.5,
+    1,
+    2**53,
+    1e300,
+    '',
+    'a',
+    'ab',
+    'b',
+    'Бим',
+    b'\x00',
+    b'\x01',
+    ObjectId('000000000000000000000000'),
+    ObjectId('ffffffffffffffffffffffff'),
+    False,
+    True,
+    datetime.datetime(1900, 1, 1),
+    datetime.datetime(1970, 1, 1),
+    NOW,
+    NOW + datetime.timedelta(milliseconds=1),
+]
+
+
+def test_encode_keeps_bson_order():
+    assert sorted(ORDERED_VALUES, key=sort_key) == ORDERED_VALUES
+    encoded = [encode(value) for value in ORDERED_VALUES]
+    assert encoded == sorted(encoded)
+    assert len(set(encoded)) == len(encoded)
+
+
+@pytest.mark.parametrize(
+    ('a', 'b'),
+    [
+        (1, 1.0),
+        (0.0, -0.0),
+        (NOW, NOW.replace(microsecond=999)),  # Mongo хранит миллисекунды
+        (NOW, NOW.replace(tzinfo=datetime.UTC)),
+    ],
+)
+def test_encode_equal_values(a, b):
+    assert encode(a) == encode(b)
+
+
+@pytest.mark.parametrize('value', [[1, 2], {'a': 1}, 2**53 + 1, float('nan')])
+def test_encode_not_comparable(value):
+    assert encode(value) is None
+
+
+def test_encode_missing_before_null():
+    assert ABSENT < NULL < encode(-1e300)
+    assert all(encode(value) < OPAQUE for value in ORDERED_VALUES)
+
+
+# --- Перевод запросов в SQL ---
+
+
+async def prepare(collection, *documents):
+    await collection.create_indexes([IndexModel([('a', 1)]), IndexModel([('b', 1), ('_id', 1)])])
+    if documents:
+        await collection.insert_many(
+            [{'_id': i, **document} for i, document in enumerate(documents)]
+        )
+
+
+async def where(collection, filter, variables=None):
+    return await collection._run(collection._where, filter, variables or {})
+
+
+async def order_by(collection, sort):
+    return await collection._run(collection._order_by, sort)
+
+
+@pytest.mark.parametrize(
+    ('filter', 'sql', 'parameters'),
+    [
+        ({'a': 1}, '("f.a" = ?)', [encode(1)]),
+        ({'a': None}, '("f.a" IN (?, ?))', [ABSENT, NULL]),
+        ({'a': {'$ne': 'x'}}, '((NOT ("f.a" = ?)))', [encode('x')]),
+        ({'a': {'$in': [1, None]}}, '(("f.a" IN (?, ?, ?)))', [encode(1), ABSENT, NULL]),
+        ({'a': {'$exists': False}}, '(("f.a" = ?))', [ABSENT]),
+        (
+            {'a': {'$gt': 2}},
+            '(("f.a" > ? AND "f.a" >= ? AND "f.a" < ?))',
+            [encode(2), b'\x02', b'\x03'],
+        ),
+        (
+            {'$or': [{'a': 1}, {'b': 'x'}]},
+            '((("f.a" = ?)) OR (("f.b" = ?)))',
+            [encode(1), encode('x')],
+        ),
+        ({'$expr': {'$lt': [5, '$a']}}, '("f.a" > ?)', [encode(5)]),
+    ],
+)
+async def test_where_pushed_down(sqlite_db, filter, sql, parameters):
+    await prepare(sqlite_db.dogs)
+
+    assert await where(sqlite_db.dogs, filter) == (sql, parameters, True)
+
+
+@pytest.mark.parametrize(
+    'filter',
+    [
+        {'c': 1},  # Нет столбца
+        {'a': [1, 2]},  # Массив не кодируется
+        {'a': 2**60},  # Целое не переводится в double без потерь
+        {'a': {'$in': [{'x': 1}]}},
+        {'a': {'$lt': None}},
+        {'$expr': {'$eq': ['$a', '$b']}},  # Сравнение двух полей
+        {'$or': [{'a': 1}, {'c': 1}]},
+    ],
+)
+async def test_where_not_pushed_down(sqlite_db, filter):
+    await prepare(sqlite_db.dogs)
+
+    _, _, exact = await where(sqlite_db.dogs, filter)
+
+    assert not exact
+
+
+async def test_where_with_opaque_values(sqlite_db):
+    # Поле с массивом SQLite не сравнивает: такие документы проверяет движок из memory
+    await prepare(sqlite_db.dogs, {'a': [1, 2]}, {'a': 3})
+
+    sql, parameters, exact = await where(sqlite_db.dogs, {'a': 1})
+
+    assert sql == '(("f.a" = ?) OR "f.a" >= ?)'
+    assert parameters == [encode(1), OPAQUE]
+    assert not exact
+    assert ids(await sqlite_db.dogs.find({'a': 1}).to_list()) == [0]
+
+
+async def test_where_variables(sqlite_db):
+    await prepare(sqlite_db.dogs)
+
+    clause = await where(sqlite_db.dogs, {'$expr': {'$eq': ['$b', '$$name']}}, {'name': 'x'})
+
+    assert clause == ('("f.b" = ?)', [encode('x')], True)
+
+
+@pytest.mark.parametrize(
+    ('sort', 'expected'),
+    [
+        ([('a', 1)], ' ORDER BY "f.a" ASC'),
+        ([('b', -1), ('_id', -1)], ' ORDER BY "f.b" DESC, "f._id" DESC'),
+        ([('c', 1)], None),
+        (None, ''),
+    ],
+)
+async def test_order_by(sqlite_db, sort, expected):
+    await prepare(sqlite_db.dogs)
+
+    assert await order_by(sqlite_db.dogs, sort) == expected
+
+
+async def test_order_by_opaque(sqlite_db):
+    await prepare(sqlite_db.dogs, {'a': [1, 2]})
+
+    assert await order_by(sqlite_db.dogs, [('a', 1)]) is None
+    assert await order_by(sqlite_db.dogs, [('b', 1)]) is not None
+
+
+# --- Совпадение с драйвером memory ---
+
+DOCUMENTS = [
+    {'a': 1, 'b': 'x'},
+    {'a': 2.5, 'b': 'y'},
+    {'a': [1, 5], 'b': 'x'},
+    {'a': None},
+    {'b': 'z'},
+    {'a': 2**60, 'b': 'y'},
+    {'a': 'строка', 'b': None},
+    {'a': NOW, 'b': 'x'},
+    {'a': {'c': 1}, 'b': 'z'},
+    {'a': -3, 'b': 'y'},
+]
+
+
+@pytest.mark.parametrize(
+    'filter',
+    [
+        {},
+        {'a': 1},
+        {'a': None},
+        {'a': 2**60},
+        {'a': {'$gt': 1}},
+        {'a': {'$lte': 2.5, '$gt': -5}},
+        {'a': {'$in': [5, 'строка']}},
+        {'a': {'$nin': [1, None]}},
+        {'a': {'$exists': True}, 'b': 'x'},
+        {'a': {'$ne': 1}},
+        {'a': {'$not': {'$gt': 0}}},
+        {'$or': [{'b': 'x'}, {'a': {'$lt': 0}}]},
+        {'b': {'$gte': 'y'}},
+    ],
+)
+@pytest.mark.parametrize(
+    ('sort', 'limit'),
+    [(None, 0), ([('b', 1), ('_id', 1)], 3), ([('a', -1), ('_id', 1)], 4)],
+)
+async def test_same_results_as_memory(memory_db, sqlite_db, filter, sort, limit):
+    for db in (memory_db, sqlite_db):
+        await prepare(db.dogs, *DOCUMENTS)
+
+    expected = await memory_db.dogs.find(filter, sort=sort, limit=limit).to_list()
+    actual = await sqlite_db.dogs.find(filter, sort=sort, limit=limit).to_list()
+
+    if sort:
+        assert actual == expected
+    else:
+        assert sorted(ids(actual)) == sorted(ids(expected))
+
+
+def make_record(i: int) -> AnimalRecordCreate:
+    return AnimalRecordCreate(
+        animal_type=AnimalType.DOG if i % 3 else AnimalType.CAT,
+        sex=Sex.FEMALE,
+        breed=f'Порода {i}',
+        color='Рыжий',
+        catch_date=NOW,
+        catch_place='55.7558, 37.6173',
+        created_by=i % 4 + 1,
+        created_at=NOW + datetime.timedelta(minutes=i // 2),
+        updated_at=NOW + datetime.timedelta(minutes=i % 5),
+    )
+
+
+async def animal_repositories(*dbs):
+    repositories = []
+    for db in dbs:
+        animals = AnimalRecordRepository(db)
+        await animals.add_indexes()
+        await animals.create_bulk([make_record(i) for i in range(25)])
+        repositories.append(animals)
+    return repositories
+
+
+@pytest.mark.parametrize('filter', [{}, {'animal_type': AnimalType.CAT.value}, {'created_by': 2}])
+async def test_keyset_pagination_as_memory(memory_db, sqlite_db, filter):
+    results = []
+    for animals in await animal_repositories(memory_db, sqlite_db):
+        pages, key = [], None
+        while True:
+            page = await animals.get_page(filter, key, size=4)
+            pages.append([record.breed for record in page.records])
+            if not page.has_after:
+                break
+            key = (page.records[-1].created_at, page.records[-1].id)
+
+        last = page.records[0]
+        back = await animals.get_page(filter, (last.created_at, last.id), backward=True, size=4)
+        results.append((pages, [record.breed for record in back.records]))
+
+    assert results[0] == results[1]
+    assert sum(len(page) for page in results[0][0]) > 0
+
+
+@pytest.mark.parametrize('filter', [{}, {'animal_type': AnimalType.DOG.value}])
+async def test_window_as_memory(memory_db, sqlite_db, filter):
+    results = []
+    for animals in await animal_repositories(memory_db, sqlite_db):
+        ordered = [
+            record.id
+            async for batch in animals.get_batches(filter, sort_field='created_at')
+            for record in batch
+        ]
+        windows = []
+        for index, record_id in enumerate(ordered):
+            window = await animals.get_window(filter, 'created_at', str(record_id), size=3)
+            records = [record.id for record in window.records]
+            # Соседи с тем же created_at различаются по _id и не теряются
+            assert records == ordered[max(index - 3, 0) : index + 4]
+            assert window.has_before == (index > 3)
+            assert window.has_after == (index + 4 < len(ordered))
+            windows.append([record.breed for record in window.records])
+        results.append(windows)
+
+    assert results[0] == results[1]
+
+
+async def test_delta_as_memory(memory_db, sqlite_db):
+    results = []
+    for animals in await animal_repositories(memory_db, sqlite_db):
+        first = [
+            record
+            async for batch in animals.get_changed(None, NOW + datetime.timedelta(minutes=3))
+            for record in batch
+        ]
+        last = first[-1]
+        rest = [
+            record
+            async for batch in animals.get_changed(
+                (last.updated_at, last.id), NOW + datetime.timedelta(hours=1)
+            )
+            for record in batch
+        ]
+        results.append(([record.breed for record in first], [record.breed for record in rest]))
+
+    assert results[0] == results[1]
+    assert len(results[0][0]) + len(results[0][1]) == 25
+
+
+async def test_role_queries_as_memory(memory_db, sqlite_db):
+    results = []
+    for db in (memory_db, sqlite_db):
+        users = UserRepository(db)
+        await users.add_indexes()
+        await users.create_bulk(
+            [
+                UserCreate(
+                    tg_id=i + 1,
+                    name=f'Работник {i + 1}',
+                    role=UserRole.ADMIN if i % 3 == 0 else UserRole.CATCHER,
+                )
+                for i in range(10)
+            ]
+        )
+        await users.update_one({'tg_id': 5}, UserUpdate(role=UserRole.ADMIN))
+        admins = sorted([user.tg_id async for user in await users.get_admins()])
+        roles = [await users.get_partial({'tg_id': tg_id}, ('role',)) for tg_id in range(1, 12)]
+        results.append((admins, roles))
+
+    assert results[0] == results[1]
+    assert results[0][0] == [1, 4, 5, 7, 10]
+
+
+@pytest.mark.parametrize('filter', [{}, {'tag': {'$in': ['a', 'b']}}])
+async def test_cursor_reads_in_batches(sqlite_db, monkeypatch, filter):
+    collection = sqlite_db['items']
+    await collection.insert_many([{'_id': i, 'tag': 'ab'[i % 2]} for i in range(500)])
+
+    decoded = 0
+    decode = bson.decode
+
+    def counting_decode(*args, **kwargs):
+        nonlocal decoded
+        decoded += 1
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(bson, 'decode', counting_decode)
+    cursor = collection.find(filter, sort=[('_id', 1)], batch_size=50)
+    first = await cursor.to_list(50)
+    assert decoded < 500
+
+    # Курсор переживает записи и их откат между пачками
+    await collection.insert_one({'_id': -1, 'tag': 'a'})
+    with pytest.raises(DuplicateKeyError):
+        await collection.insert_one({'_id': 0})
+    rest = [document async for document in cursor]
+
+    assert [document['_id'] for document in first + rest] == list(range(500))
@@ -0,0 +1,31 @@
+import pytest
+
+from database.watcher import _updated_fields
+
+
+@pytest.mark.parametrize(
+    ('change', 'expected'),
+    [
+        (
+            {
+                'operationType': 'update',
+                'updateDescription': {'updatedFields': {'animals_count': 3}, 'removedFields': []},
+            },
+            {'animals_count'},
+        ),
+        (
+            {
+                'operationType': 'update',
+                'updateDescription': {
+                    'updatedFields': {'profile.name': 'Иван', 'updated_at': None},
+                    'removedFields': ['role'],
+                },
+            },
+            {'profile', 'updated_at', 'role'},
+        ),
+        ({'operationType': 'replace'}, None),
+        ({'operationType': 'update'}, None),
+    ],
+)
+def test_updated_fields(change, expected):
+    assert _updated_fields(change) == (frozenset(expected) if expected is not None else None)